@@ -1,12 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, Dict, Any, List
+import asyncio
 import json
 import io
 import base64
 import numpy as np
 import sys
 import os
+import tempfile
+import time
+import zipfile
 
 # 添加模型路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -22,7 +27,10 @@ sys.path.append(text_model_dir)
 sys.path.append(image_model_dir)
 
 from text_model import TextModel
-from image_model import ImageModel
+from image_model import ImageModel, normalize_tasks, IMAGE_FALLBACK
+from rate_limiter import get_rate_limiter, BULK
+from models.wordcloud_schema import WordCloudRequest
+from services.wordcloud_service import WordCloudService, MASK_SHAPES, MEDIA_TYPES
 
 # 创建路由器
 router = APIRouter(
@@ -34,6 +42,13 @@ router = APIRouter(
 # 初始化模型
 text_model = TextModel()
 image_model = ImageModel()
+wordcloud_service = WordCloudService()
+
+# 批量图像分析: 同时分析的图像数 (可通过 options.concurrency 调低) 与单批上限
+BATCH_CONCURRENCY = int(os.environ.get("IMAGE_BATCH_CONCURRENCY", "4"))
+MAX_BATCH_IMAGES = int(os.environ.get("IMAGE_BATCH_MAX_IMAGES", "200"))
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif")
 
 @router.post("/text", summary="文本分析")
 async def analyze_text(
@@ -73,6 +88,25 @@ async def analyze_text(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文本分析失败: {str(e)}")
 
+def _image_options(analysis_options: Dict[str, Any]):
+    """从分析选项中取出 (任务列表, 近似重复距离, 截止时间)，无效时抛出 ValueError"""
+    tasks = normalize_tasks(analysis_options.get("tasks"))
+    max_distance = analysis_options.get("duplicate_distance")
+    if max_distance is not None:
+        try:
+            max_distance = int(max_distance)
+        except (TypeError, ValueError):
+            raise ValueError("duplicate_distance 必须是整数")
+    deadline_ms = analysis_options.get("deadline_ms")
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            raise ValueError("deadline_ms 必须是数字")
+        if deadline_ms <= 0:
+            raise ValueError("deadline_ms 必须大于 0")
+    return tasks, max_distance, deadline_ms
+
 @router.post("/image", summary="图像分析")
 async def analyze_image(
     image: UploadFile = File(..., description="要分析的图像文件"),
@@ -82,9 +116,12 @@ async def analyze_image(
     对上传的图像进行分析
     
     - **image**: 要分析的图像文件
-    - **options**: 可选的分析参数，JSON格式
+    - **options**: 可选的分析参数，JSON格式；tasks 为要执行的任务 ("analysis"、"ocr")，默认全部；
+      duplicate_distance 为复用近似重复图像结果的最大汉明距离 (默认不复用，包含 ocr 任务时从不复用)；
+      deadline_ms 为模型请求的截止时间，超时或熔断时返回后备结果 (带 fallback_reason)
     
     返回图像分析结果，包括对象识别、场景理解、OCR文字提取、图像分类
+    (只请求 "ocr" 时使用仅提取文字的提示词，结果只含 ocr_text)
     """
     try:
         # 检查文件类型
@@ -98,6 +135,10 @@ async def analyze_image(
                 analysis_options = json.loads(options)
             except json.JSONDecodeError:
                 raise HTTPException(status_code=400, detail="无效的JSON格式选项")
+        try:
+            tasks, max_distance, deadline_ms = _image_options(analysis_options)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # 读取图像数据
         image_data = await image.read()
@@ -112,7 +153,7 @@ async def analyze_image(
             image_model.load_model()
         
         # 执行图像分析
-        result = image_model.predict(temp_path)
+        result = image_model.predict(temp_path, tasks, max_distance, deadline_ms)
         
         # 添加元数据
         result["filename"] = image.filename
@@ -126,15 +167,197 @@ async def analyze_image(
         
         return JSONResponse(content=result)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"图像分析失败: {str(e)}")
 
+@router.post("/wordcloud", summary="词云渲染")
+async def render_wordcloud(payload: WordCloudRequest, request: Request):
+    """
+    根据词频表渲染词云图片
+    
+    - **frequencies**: 词频表 {词: 频次}；或 **dataset_id**: 之前请求返回的 X-Dataset-Id
+    - **shape / colormap / max_words / width / height / contour / format**: 渲染参数
+    
+    返回图片字节 (image/webp 或 image/png)，带 ETag；If-None-Match 命中时返回 304。
+    只传 dataset_id 而服务端未缓存该词频表时返回 404，客户端应重新发送 frequencies。
+    """
+    if not wordcloud_service.available:
+        raise HTTPException(status_code=503, detail="服务端未安装 wordcloud")
+    if payload.frequencies is None and not payload.dataset_id:
+        raise HTTPException(status_code=400, detail="需要提供 frequencies 或 dataset_id")
+    if payload.shape not in MASK_SHAPES:
+        raise HTTPException(status_code=400, detail=f"不支持的形状: {payload.shape}")
+    if payload.format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的图片格式: {payload.format}")
+    try:
+        payload.validate_frequencies()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    dataset_id, frequencies = wordcloud_service.resolve_dataset(payload.frequencies, payload.dataset_id)
+    options = payload.model_dump(exclude={"frequencies", "dataset_id"})
+    etag = wordcloud_service.etag(dataset_id, options)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "private, max-age=86400",
+        "X-Dataset-Id": dataset_id
+    }
+    
+    # 客户端已有同一张图片
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().strip('"') for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    image = wordcloud_service.cached(etag)
+    if image is None:
+        if frequencies is None:
+            raise HTTPException(status_code=404, detail="未找到该 dataset_id 对应的词频表，请发送 frequencies")
+        try:
+            # 渲染是 CPU 密集操作，放到线程池中避免阻塞事件循环
+            image = await run_in_threadpool(wordcloud_service.render, etag, frequencies, options)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"词云渲染失败: {str(e)}")
+    
+    return Response(content=image, media_type=MEDIA_TYPES[payload.format], headers=headers)
+
+def _is_zip(upload: UploadFile) -> bool:
+    return (upload.content_type in ("application/zip", "application/x-zip-compressed")
+            or (upload.filename or "").lower().endswith(".zip"))
+
+def _extract_zip(data: bytes, archive_name: str) -> List[Dict[str, Any]]:
+    """解压 zip 中的图像文件 (忽略目录、隐藏文件和超过大小限制的条目)"""
+    images = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            base = os.path.basename(name)
+            if info.is_dir() or not base or base.startswith(".") or "__MACOSX" in name:
+                continue
+            if not base.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > MAX_IMAGE_BYTES:
+                images.append({"filename": f"{archive_name}/{name}", "error": "文件过大"})
+                continue
+            images.append({"filename": f"{archive_name}/{name}", "data": archive.read(info)})
+    return images
+
+def _analyze_image_bytes(filename: str, data: bytes, tasks=None, max_distance=None,
+                         deadline_ms=None) -> Dict[str, Any]:
+    """写入唯一的临时文件后调用图像模型 (在线程池中执行，按批量优先级限流)"""
+    suffix = os.path.splitext(filename)[1] or ".jpg"
+    fd, temp_path = tempfile.mkstemp(prefix="batch_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if not image_model.model:
+            image_model.load_model()
+        return image_model.predict(temp_path, tasks, max_distance, deadline_ms, priority=BULK)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@router.post("/image/batch", summary="批量图像分析")
+async def analyze_image_batch(
+    images: List[UploadFile] = File(..., description="图像文件 (可多个)，或包含图像的 zip 压缩包"),
+    options: Optional[str] = Form(None, description="分析选项，JSON格式 (concurrency: 并发数)")
+):
+    """
+    批量分析多张图像 (多个文件或 zip 压缩包)
+    
+    - **images**: 图像文件或 zip 压缩包，可混合上传
+    - **options**: 可选的分析参数，JSON格式；concurrency 为同时分析的图像数 (不超过服务端上限)，
+      tasks、duplicate_distance、deadline_ms 同 /analyze/image
+    
+    以 NDJSON 流式返回: 每张图像分析完成后立即输出一行
+    {"index", "filename", "status": "ok" | "error", "result" | "error", "elapsed_ms"}，
+    最后一行为汇总 {"done": true, "total", "succeeded", "failed", "elapsed_ms"}
+    """
+    analysis_options = {}
+    if options:
+        try:
+            analysis_options = json.loads(options)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="无效的JSON格式选项")
+    try:
+        concurrency = int(analysis_options.get("concurrency", BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="concurrency 必须是整数")
+    concurrency = max(1, min(concurrency, BATCH_CONCURRENCY))
+    try:
+        tasks, max_distance, deadline_ms = _image_options(analysis_options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # 先读取全部上传内容 (响应开始流式输出后上传文件会被关闭)
+    items = []
+    for upload in images:
+        data = await upload.read()
+        if _is_zip(upload):
+            try:
+                items.extend(_extract_zip(data, upload.filename))
+            except zipfile.BadZipFile:
+                items.append({"filename": upload.filename, "error": "无效的 zip 文件"})
+        elif upload.content_type and upload.content_type.startswith("image/"):
+            items.append({"filename": upload.filename, "data": data})
+        else:
+            items.append({"filename": upload.filename, "error": "上传的文件不是有效的图像格式"})
+    if not items:
+        raise HTTPException(status_code=400, detail="没有可分析的图像")
+    if len(items) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"单批最多 {MAX_BATCH_IMAGES} 张图像，当前 {len(items)} 张")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def analyze(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        line = {"index": index, "filename": item["filename"]}
+        if "error" in item:
+            return dict(line, status="error", error=item["error"])
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await run_in_threadpool(
+                    _analyze_image_bytes, item["filename"], item["data"], tasks, max_distance, deadline_ms
+                )
+                result["file_size"] = len(item["data"])
+                line.update(status="ok", result=result)
+            except Exception as e:
+                line.update(status="error", error=f"图像分析失败: {str(e)}")
+            line["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return line
+    
+    async def stream():
+        start = time.perf_counter()
+        succeeded = 0
+        tasks = [asyncio.ensure_future(analyze(i, item)) for i, item in enumerate(items)]
+        try:
+            # 按完成顺序输出，客户端可以逐张显示
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                succeeded += line["status"] == "ok"
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+        summary = {
+            "done": True,
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get("/models", summary="获取可用模型信息")
 async def get_models_info():
     """
     获取可用的分析模型信息
     
-    返回所有可用模型的名称、版本和状态
+    返回所有可用模型的名称、版本和状态 (图像模型包含 DashScope 熔断器状态)，
+    以及 DashScope 限流器的排队深度与令牌余量
     """
     try:
         models_info = {
@@ -146,8 +369,12 @@ async def get_models_info():
             "image_model": {
                 "name": image_model.model_name,
                 "loaded": image_model.model is not None,
-                "description": "图像分析模型"
-            }
+                "description": "图像分析模型",
+                "backend": image_model.model,
+                "fallback": IMAGE_FALLBACK,
+                "circuit_breaker": image_model.breaker.snapshot()
+            },
+            "rate_limiter": get_rate_limiter().snapshot()
         }
         
         return JSONResponse(content=models_info)
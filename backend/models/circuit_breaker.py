@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 熔断器默认参数 (可通过环境变量调整)
+# 连续失败 (含慢调用) FAILURE_THRESHOLD 次后打开，RESET_TIMEOUT 秒后半开放行一个探测请求
+FAILURE_THRESHOLD = int(os.environ.get("DASHSCOPE_BREAKER_FAILURES", "5"))
+SLOW_CALL_MS = float(os.environ.get("DASHSCOPE_BREAKER_SLOW_MS", "15000"))
+RESET_TIMEOUT = float(os.environ.get("DASHSCOPE_BREAKER_RESET_S", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝调用"""
+
+class DeadlineExceeded(TimeoutError):
+    """调用未在截止时间内完成"""
+
+class CircuitBreaker:
+    """
+    熔断器: closed (正常) -> open (快速失败) -> half_open (放行一个探测请求)
+    探测成功则关闭，失败则重新打开；耗时超过 slow_call_ms 的成功调用按失败计
+    """
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 slow_call_ms: float = SLOW_CALL_MS, reset_timeout: float = RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_ms = slow_call_ms
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_error = None
+        self._counts = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次调用 (半开状态同一时间只放行一个探测请求)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._probing):
+                self._probing = state == HALF_OPEN
+                self._counts["calls"] += 1
+                return True
+            self._counts["rejected"] += 1
+            return False
+
+    def release(self):
+        """放行后没有实际发起调用 (如被限流) 时调用，归还半开状态的探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, latency_ms: float):
+        if latency_ms > self.slow_call_ms:
+            with self._lock:
+                self._counts["slow_calls"] += 1
+            self.record_failure(f"slow call: {latency_ms:.0f} ms")
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, reason: str):
+        with self._lock:
+            self._counts["failures"] += 1
+            self._failures += 1
+            self._last_error = reason
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态与计数 (用于 /analyze/models)"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return dict(
+                self._counts,
+                name=self.name,
+                state=state,
+                consecutive_failures=self._failures,
+                failure_threshold=self.failure_threshold,
+                slow_call_ms=self.slow_call_ms,
+                retry_in_s=retry_in,
+                last_error=self._last_error
+            )
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """按名称取进程内共享的熔断器 (同一服务的所有调用方共用一个)"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+# 截止时间 / 对冲请求使用的线程 (超时的调用在后台自然结束，调用方不再等待)
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="deadline")
+
+def call_with_deadline(fn: Callable[[], Any], deadline_s: float, hedge_after_s: Optional[float] = None,
+                       hedge_guard: Optional[Callable[[], bool]] = None) -> Tuple[Any, bool]:
+    """
+    在 deadline_s 秒内执行 fn，超时抛出 DeadlineExceeded
+    hedge_after_s: 第一次调用在此时间内未返回时再发起一次相同的调用，取先成功的结果
+    hedge_guard: 发起对冲前调用 (如获取限流配额)，返回 False 时不对冲
+    返回 (结果, 是否发起了对冲请求)；所有调用都失败时抛出最后一个异常
+    """
+    start = time.monotonic()
+    pending = {_executor.submit(fn)}
+    hedge_due = hedge_after_s is not None
+    hedged = False
+    error = None
+    while pending:
+        now = time.monotonic()
+        remaining = start + deadline_s - now
+        if remaining <= 0:
+            raise DeadlineExceeded(f"未在 {deadline_s:.1f}s 内完成")
+        timeout = remaining
+        if hedge_due:
+            timeout = min(remaining, max(0.0, start + hedge_after_s - now))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result(), hedged
+            error = future.exception()
+        if not done and hedge_due:
+            hedge_due = False
+            if hedge_guard is None or hedge_guard():
+                pending.add(_executor.submit(fn))
+                hedged = True
+    raise error
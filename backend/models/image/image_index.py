@@ -0,0 +1,98 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from image_utils import hamming, signature_diff, SIGNATURE_MAX_DIFF
+
+# 判定为近似重复的默认汉明距离 (64 位 dHash)，默认 -1 即不复用 (需显式开启)；索引保留的图像数
+DUPLICATE_DISTANCE = int(os.environ.get("IMAGE_DUPLICATE_DISTANCE", "-1"))
+INDEX_SIZE = int(os.environ.get("IMAGE_DUPLICATE_INDEX_SIZE", "2048"))
+
+class BKTree:
+    """
+    BK 树: 按与父节点的汉明距离组织子节点，
+    查询距离 d 以内的哈希时只需访问距离在 [dist-d, dist+d] 之间的子树
+    """
+
+    def __init__(self):
+        self.root = None  # [哈希, 键, {距离: 子节点}]
+
+    def add(self, value: int, key: Any):
+        if self.root is None:
+            self.root = [value, key, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, key, {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """返回 [(距离, 键)]，按距离从小到大排序"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[1]))
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda item: item[0])
+        return found
+
+class NearDuplicateIndex:
+    """
+    近似重复图像索引: 图像 id -> (dHash, 分析结果, 缩略图签名)，按 dHash 建 BK 树
+    dHash 只用于查找候选，候选必须通过缩略图签名比较才算近似重复
+    超过 capacity 时丢弃最早的图像并重建 BK 树 (BK 树不支持删除)
+    """
+
+    def __init__(self, capacity: int = INDEX_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, image_id: str, value: int, result: Dict[str, Any], signature: bytes):
+        with self._lock:
+            if image_id in self._entries:
+                # 同一图像的新结果覆盖旧结果 (哈希相同，树中已有节点)
+                self._entries[image_id] = (value, result, signature)
+                self._entries.move_to_end(image_id)
+                return
+            self._entries[image_id] = (value, result, signature)
+            self._tree.add(value, image_id)
+            if len(self._entries) > self.capacity * 1.1:
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                self._tree = BKTree()
+                for key, (entry_value, _, _) in self._entries.items():
+                    self._tree.add(entry_value, key)
+
+    def find(self, value: int, signature: bytes, max_distance: int = DUPLICATE_DISTANCE, tasks=None,
+             max_diff: int = SIGNATURE_MAX_DIFF) -> Optional[Tuple[int, str, Dict[str, Any]]]:
+        """
+        查找 dHash 距离 max_distance 以内、缩略图签名最大像素差不超过 max_diff、覆盖 tasks 的最近图像
+        返回 (距离, 图像 id, 分析结果)，没有则返回 None
+        """
+        with self._lock:
+            for distance, image_id in self._tree.search(value, max_distance):
+                entry = self._entries.get(image_id)
+                if entry is None:
+                    continue
+                _, result, entry_signature = entry
+                if tasks is not None and not set(tasks) <= set(result.get("tasks", ())):
+                    continue
+                if signature_diff(signature, entry_signature) <= max_diff:
+                    self._entries.move_to_end(image_id)
+                    return distance, image_id, result
+        return None
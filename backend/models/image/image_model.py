@@ -15,7 +15,12 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
 from base_model import BaseModel
+from image_utils import normalize_image, fingerprint
+from image_index import NearDuplicateIndex, DUPLICATE_DISTANCE
+from circuit_breaker import get_breaker, call_with_deadline
+from rate_limiter import get_rate_limiter, RateLimitExceeded, INTERACTIVE
 
 # 尝试导入 torch 和 transformers
 try:
@@ -27,6 +32,59 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     logger.warning("Transformers or Torch not found. Falling back to simulation.")
 
+# DashScope 调用: 单次请求的截止时间、对冲请求的发起时间 (0 表示不对冲)、连接超时
+DEADLINE_MS = float(os.environ.get("DASHSCOPE_DEADLINE_MS", "20000"))
+HEDGE_MS = float(os.environ.get("DASHSCOPE_HEDGE_MS", "0"))
+CONNECT_TIMEOUT = 3.05
+# DashScope 失败或熔断时的后备: "simulation" 或 "transformers" (本地模型，首次使用时加载)
+IMAGE_FALLBACK = os.environ.get("IMAGE_FALLBACK", "simulation")
+
+VL_MODEL = "qwen-vl-plus"
+# 限流时预估 token: 图像按 28×28 像素一个 token，另加提示词与预计输出长度
+IMAGE_PATCH = 28
+EXPECTED_OUTPUT_TOKENS = {"analysis": 500, "ocr": 300}
+
+IMAGE_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif", "BMP": "image/bmp"}
+
+# 分析任务 -> 结果字段；predict 只返回请求的任务对应的字段
+TASK_FIELDS = {
+    "analysis": ("objects", "scene", "classification"),
+    "ocr": ("ocr_text",)
+}
+ALL_TASKS = tuple(TASK_FIELDS)
+
+ANALYSIS_PROMPT = """
+请详细分析这张图片。
+请以纯JSON格式输出以下信息（不要包含markdown标记或其他文本）：
+{
+    "objects": ["object1", "object2"], 
+    "scene": "详细的场景描述",
+    "classification": "场景分类(如:户外/室内/办公/自然)",
+    "ocr_text": "图片中的所有文字内容"
+}
+对象列表只要主要物体。
+"""
+
+# 只需要文字时使用更短的提示词，模型输出也更短
+OCR_PROMPT = """
+请提取这张图片中的所有文字内容。
+请以纯JSON格式输出（不要包含markdown标记或其他文本）：
+{"ocr_text": "图片中的所有文字内容，没有文字时为\"无文字\""}
+"""
+
+def normalize_tasks(tasks=None):
+    """校验并规范化任务列表 (None 表示全部任务)，返回按 ALL_TASKS 排序的元组"""
+    if tasks is None:
+        return ALL_TASKS
+    if isinstance(tasks, str):
+        tasks = [tasks]
+    if not tasks:
+        raise ValueError("至少需要一个分析任务")
+    unknown = set(tasks) - set(ALL_TASKS)
+    if unknown:
+        raise ValueError(f"未知的分析任务: {sorted(unknown)}，可选: {list(ALL_TASKS)}")
+    return tuple(task for task in ALL_TASKS if task in tasks)
+
 class ImageModel(BaseModel):
     """
     图像分析模型接口 (优先使用 DashScope Qwen-VL，后备 PyTorch/Transformers)
@@ -38,6 +96,10 @@ class ImageModel(BaseModel):
         self.pipelines = {}
         self.device = -1 # CPU by default
         self.api_key = os.environ.get("DASHSCOPE_API_KEY", "sk-6285b3701d014538b142e05637c14b5b")
+        # 已分析图像的感知哈希索引: 缩放 / 重新压缩后再次上传的图像直接复用结果
+        self.duplicate_index = NearDuplicateIndex()
+        # DashScope 视觉接口的熔断器 (进程内所有 ImageModel 共用)
+        self.breaker = get_breaker("dashscope-vl")
         
         # 模拟数据池 (作为后备)
         self.object_pool = ["person", "car", "dog", "cat", "tree", "building"]
@@ -56,54 +118,123 @@ class ImageModel(BaseModel):
             return
 
         # 2. 尝试本地模型
-        if TRANSFORMERS_AVAILABLE:
-            try:
-                # 检查是否有 GPU
-                if torch.cuda.is_available():
-                    self.device = 0
-                    logger.info("Using CUDA GPU")
-                elif torch.backends.mps.is_available():
-                    # Mac M1/M2 support
-                    self.device = "mps" 
-                    logger.info("Using MPS (Apple Silicon)")
-                else:
-                    logger.info("Using CPU")
-
-                logger.info("Loading Image Classification model...")
-                self.pipelines['classify'] = pipeline("image-classification", model="google/vit-base-patch16-224", device=self.device)
-                
-                logger.info("Loading Object Detection model...")
-                self.pipelines['detect'] = pipeline("object-detection", model="facebook/detr-resnet-50", device=self.device)
-                
-                logger.info("Loading Image Captioning model (Scene Understanding)...")
-                self.pipelines['caption'] = pipeline("image-to-text", model="nlpconnect/vit-gpt2-image-captioning", device=self.device)
-                
-                self.model = "Transformers Pipelines"
-                logger.info("All models loaded successfully.")
-                return
-            except Exception as e:
-                logger.error(f"Error loading real models: {e}")
-                logger.info("Falling back to simulation mode.")
+        if self._load_pipelines():
+            self.model = "Transformers Pipelines"
+            return
         
         self.model = "Simulation Mode"
 
-    def predict(self, image_path: str) -> Dict[str, Any]:
+    def _load_pipelines(self) -> bool:
+        """加载本地 Transformers 模型 (已加载或加载成功时返回 True)"""
+        if self.pipelines:
+            return True
+        if not TRANSFORMERS_AVAILABLE:
+            return False
+        try:
+            # 检查是否有 GPU
+            if torch.cuda.is_available():
+                self.device = 0
+                logger.info("Using CUDA GPU")
+            elif torch.backends.mps.is_available():
+                # Mac M1/M2 support
+                self.device = "mps" 
+                logger.info("Using MPS (Apple Silicon)")
+            else:
+                logger.info("Using CPU")
+
+            logger.info("Loading Image Classification model...")
+            self.pipelines['classify'] = pipeline("image-classification", model="google/vit-base-patch16-224", device=self.device)
+            
+            logger.info("Loading Object Detection model...")
+            self.pipelines['detect'] = pipeline("object-detection", model="facebook/detr-resnet-50", device=self.device)
+            
+            logger.info("Loading Image Captioning model (Scene Understanding)...")
+            self.pipelines['caption'] = pipeline("image-to-text", model="nlpconnect/vit-gpt2-image-captioning", device=self.device)
+            
+            logger.info("All models loaded successfully.")
+            return True
+        except Exception as e:
+            self.pipelines = {}
+            logger.error(f"Error loading real models: {e}")
+            logger.info("Falling back to simulation mode.")
+            return False
+
+    def _fallback(self, image_path: str, tasks, reason: str) -> Dict[str, Any]:
+        """DashScope 不可用时按 IMAGE_FALLBACK 使用本地模型或模拟结果 (结果带 fallback_reason)"""
+        if IMAGE_FALLBACK == "transformers" and self._load_pipelines():
+            result = self._predict_real(image_path, tasks)
+        else:
+            result = self._predict_simulated(image_path, reason)
+        result.setdefault("fallback_reason", reason)
+        return result
+
+    def predict(self, image_path: str, tasks: List[str] = None, max_distance: int = None,
+                deadline_ms: float = None, priority: str = INTERACTIVE) -> Dict[str, Any]:
         """
         图像分析预测
+        tasks: 要执行的任务 (见 TASK_FIELDS)，默认全部；结果中的 "tasks" 字段记录实际执行的任务
+        max_distance: 感知哈希汉明距离在此以内、且缩略图签名一致的已分析图像视为近似重复，直接复用其结果
+                      (默认 DUPLICATE_DISTANCE 即 -1，负数表示不复用)；复用时结果带 near_duplicate 字段
+                      包含 ocr 任务时从不复用 (布局相同、文字不同的截图无法可靠区分)
+        deadline_ms: DashScope 请求的截止时间 (默认 DEADLINE_MS，含限流排队时间)，超时即使用后备结果
+        priority: 限流优先级，单张交互分析用 "interactive"，批量分析用 "bulk"
         """
+        tasks = normalize_tasks(tasks)
+        if max_distance is None:
+            max_distance = DUPLICATE_DISTANCE
         if not self.model:
             self.load_model()
+
+        with open(image_path, "rb") as f:
+            data = f.read()
+        image_id = hashlib.sha1(data).hexdigest()
+        try:
+            perceptual_hash, signature = fingerprint(data)
+        except Exception as e:
+            logger.warning(f"Perceptual hash failed: {e}")
+            perceptual_hash = signature = None
+
+        if perceptual_hash is not None and max_distance >= 0 and "ocr" not in tasks:
+            match = self.duplicate_index.find(perceptual_hash, signature, max_distance, tasks)
+            if match is not None:
+                distance, source_id, cached = match
+                result = self._select_tasks(cached, tasks)
+                result.pop("request_stats", None)
+                result["image_id"] = image_id
+                result["perceptual_hash"] = f"{perceptual_hash:016x}"
+                result["near_duplicate"] = {"distance": distance, "source": source_id}
+                return result
         
         # 分发预测逻辑
         if self.model == "DashScope API":
-            return self._predict_dashscope(image_path)
+            result = self._predict_dashscope(image_path, tasks, deadline_ms or DEADLINE_MS, priority)
         elif self.model == "Transformers Pipelines":
-            return self._predict_real(image_path)
+            result = self._predict_real(image_path, tasks)
         else:
-            return self._predict_simulated(image_path)
+            result = self._predict_simulated(image_path)
+        result = self._select_tasks(result, tasks)
+        result["image_id"] = image_id
+        if perceptual_hash is not None:
+            result["perceptual_hash"] = f"{perceptual_hash:016x}"
+            if "fallback_reason" not in result:
+                # API 调用失败时的模拟结果不入索引，下次仍会重试 (保存副本，调用方会修改返回的结果)
+                self.duplicate_index.add(image_id, perceptual_hash, dict(result), signature)
+        return result
+
+    @staticmethod
+    def _select_tasks(result: Dict[str, Any], tasks) -> Dict[str, Any]:
+        """去掉未请求任务的字段 (其余字段如 request_stats 保留)"""
+        dropped = {field for task in ALL_TASKS if task not in tasks for field in TASK_FIELDS[task]}
+        selected = {key: value for key, value in result.items() if key not in dropped}
+        selected["tasks"] = list(tasks)
+        return selected
 
-    def _predict_dashscope(self, image_path: str) -> Dict[str, Any]:
-        """使用 DashScope Qwen-VL API 进行综合分析"""
+    def _predict_dashscope(self, image_path: str, tasks=ALL_TASKS, deadline_ms: float = DEADLINE_MS,
+                           priority: str = INTERACTIVE) -> Dict[str, Any]:
+        """
+        使用 DashScope Qwen-VL API 进行综合分析
+        请求先经过共享限流器排队，再经过熔断器: 连续失败或慢调用后打开，打开期间直接使用后备结果
+        """
         try:
             url = "https://dashscope.aliyuncs.com/api/v1/services/aigc/multimodal-generation/generation"
             headers = {
@@ -112,30 +243,22 @@ class ImageModel(BaseModel):
                 # "X-DashScope-WorkSpace": "modal" # Removed to allow default workspace access
             }
             
-            # 读取并编码图像
+            # 读取图像，按策略缩小、重新编码后再 base64 编码 (大图可减少一个数量级的请求体积)
             with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+                image_bytes, image_stats = self.preprocess(image_file.read())
+            encoded_string = base64.b64encode(image_bytes).decode('utf-8')
+            mime_type = IMAGE_MIME_TYPES.get(image_stats["format"], "image/jpeg")
                 
-            prompt = """
-            请详细分析这张图片。
-            请以纯JSON格式输出以下信息（不要包含markdown标记或其他文本）：
-            {
-                "objects": ["object1", "object2"], 
-                "scene": "详细的场景描述",
-                "classification": "场景分类(如:户外/室内/办公/自然)",
-                "ocr_text": "图片中的所有文字内容"
-            }
-            对象列表只要主要物体。
-            """
+            prompt = ANALYSIS_PROMPT if "analysis" in tasks else OCR_PROMPT
             
             data = {
-                "model": "qwen-vl-plus",
+                "model": VL_MODEL,
                 "input": {
                     "messages": [
                         {
                             "role": "user",
                             "content": [
-                                {"image": f"data:image/jpeg;base64,{encoded_string}"},
+                                {"image": f"data:{mime_type};base64,{encoded_string}"},
                                 {"text": prompt}
                             ]
                         }
@@ -146,15 +269,67 @@ class ImageModel(BaseModel):
                 }
             }
             
-            response = requests.post(url, headers=headers, json=data)
+            body = json.dumps(data)
+            width, height = image_stats["size"]
+            estimated = (-(-width // IMAGE_PATCH) * -(-height // IMAGE_PATCH) + len(prompt)
+                         + EXPECTED_OUTPUT_TOKENS["analysis" if "analysis" in tasks else "ocr"])
+            # 先检查熔断器: 熔断时不占用限流配额
+            if not self.breaker.allow():
+                return self._fallback(image_path, tasks, f"DashScope circuit breaker {self.breaker.state}")
+            limiter = get_rate_limiter()
+            try:
+                queued_s = limiter.acquire(VL_MODEL, estimated, priority, timeout=deadline_ms / 1000)
+            except RateLimitExceeded as e:
+                self.breaker.release()
+                return self._fallback(image_path, tasks, f"DashScope rate limited: {e}")
+
+            def acquire_hedge():
+                # 对冲请求同样消耗配额；没有可立即使用的配额时不对冲
+                try:
+                    limiter.acquire(VL_MODEL, estimated, priority, timeout=0)
+                    return True
+                except RateLimitExceeded:
+                    return False
+
+            deadline_s = max(0.1, deadline_ms / 1000 - queued_s)
+            api_start = time.perf_counter()
+            try:
+                response, hedged = call_with_deadline(
+                    lambda: requests.post(url, headers=headers, data=body, timeout=(CONNECT_TIMEOUT, deadline_s)),
+                    deadline_s,
+                    HEDGE_MS / 1000 if HEDGE_MS else None,
+                    acquire_hedge
+                )
+            except Exception as e:
+                self.breaker.record_failure(f"{type(e).__name__}: {e}")
+                raise
+            api_latency_ms = (time.perf_counter() - api_start) * 1000
+            if response.status_code == 200:
+                self.breaker.record_success(api_latency_ms)
+            else:
+                self.breaker.record_failure(f"HTTP {response.status_code}")
+            request_stats = {
+                "image_bytes_original": image_stats["original_bytes"],
+                "image_bytes_sent": image_stats["bytes"],
+                "payload_bytes": len(body),
+                "image_size": image_stats["size"],
+                "preprocess_ms": image_stats["elapsed_ms"],
+                "api_latency_ms": round(api_latency_ms, 1),
+                "rate_limit_wait_ms": round(queued_s * 1000, 1),
+                "hedged": hedged
+            }
+            logger.info(f"DashScope request: {request_stats}")
             
             if response.status_code == 200:
                 res_data = response.json()
+                usage = res_data.get("usage") or {}
+                if "input_tokens" in usage:
+                    limiter.settle(VL_MODEL, estimated, usage["input_tokens"] + usage.get("output_tokens", 0))
                 try:
                     content = res_data['output']['choices'][0]['message']['content'][0]['text']
                 except (KeyError, IndexError):
                      logger.error(f"Unexpected response structure: {res_data}")
-                     return self._predict_simulated(image_path)
+                     return self._fallback(image_path, tasks, "Unexpected DashScope response structure")
 
                 # 清理和解析 JSON
                 try:
@@ -191,36 +366,41 @@ class ImageModel(BaseModel):
                         "objects": objects_formatted,
                         "scene": parsed.get("scene", "无法描述场景"),
                         "classification": classification,
-                        "ocr_text": parsed.get("ocr_text", "无文字")
+                        "ocr_text": parsed.get("ocr_text", "无文字"),
+                        "request_stats": request_stats
                     }
                     
                 except json.JSONDecodeError:
                     logger.error(f"JSON Parse Error. Content: {content}")
+                    if "analysis" not in tasks:
+                        # 只提取文字时直接把原始内容作为文字结果
+                        return {"ocr_text": content, "request_stats": request_stats}
                     # 降级：将原始内容作为场景描述
                     return {
                         "objects": [{"name": "detected", "confidence": 0.9}],
                         "scene": content,
                         "classification": {"General": 0.9},
-                        "ocr_text": "解析失败，请看场景描述"
+                        "ocr_text": "解析失败，请看场景描述",
+                        "request_stats": request_stats
                     }
             else:
                 error_msg = f"DashScope API failed: {response.status_code} - {response.text}"
                 logger.error(error_msg)
                 # 如果 API 失败，尝试本地或模拟
-                if TRANSFORMERS_AVAILABLE:
-                    # self.load_model() # Avoid recursive reload loop issues
-                    return self._predict_simulated(image_path, error_msg)
-                return self._predict_simulated(image_path, error_msg)
+                return self._fallback(image_path, tasks, error_msg)
                 
         except Exception as e:
             error_msg = f"Error in DashScope prediction: {str(e)}"
             logger.error(error_msg)
-            return self._predict_simulated(image_path, error_msg)
+            return self._fallback(image_path, tasks, error_msg)
 
-    def _predict_real(self, image_path: str) -> Dict[str, Any]:
+    def _predict_real(self, image_path: str, tasks=ALL_TASKS) -> Dict[str, Any]:
         """使用真实模型进行预测"""
         try:
             results = {}
+            if "analysis" not in tasks:
+                results['ocr_text'] = "本地模型未启用 OCR 功能 (需安装 tesseract)"
+                return results
             
             # 1. 图像分类
             cls_res = self.pipelines['classify'](image_path)
@@ -266,15 +446,22 @@ class ImageModel(BaseModel):
         if error_info:
             ocr_msg += f"\n\n[调试信息] API调用失败原因: {error_info}"
 
-        return {
+        result = {
             "objects": self._sim_objects(),
             "scene": random.choice(self.scene_pool),
             "ocr_text": ocr_msg,
             "classification": self._sim_classification()
         }
+        if error_info:
+            result["fallback_reason"] = error_info
+        return result
 
     def preprocess(self, input_data: Any) -> Any:
-        return input_data
+        """图像字节 -> (规范化后的图像字节, 统计信息)，策略见 image_utils.normalize_image"""
+        if isinstance(input_data, str):
+            with open(input_data, "rb") as f:
+                input_data = f.read()
+        return normalize_image(input_data)
 
     def postprocess(self, output_data: Any) -> Dict[str, Any]:
         return output_data
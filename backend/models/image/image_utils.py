@@ -0,0 +1,106 @@
+import io
+import os
+import time
+from typing import Any, Dict, Tuple
+
+from PIL import Image, ImageChops, ImageOps
+
+# 发送给视觉模型前的图像规范化策略 (前端上传前与后端调用模型前使用同一策略)
+# 最长边超过 MAX_DIMENSION 时等比缩小，统一重新编码为 JPEG
+MAX_DIMENSION = int(os.environ.get("IMAGE_MAX_DIMENSION", "1568"))
+JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+
+EXIF_ORIENTATION = 0x0112
+
+def normalize_image(data: bytes, max_dimension: int = MAX_DIMENSION,
+                    quality: int = JPEG_QUALITY) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    按策略规范化图像: 按 EXIF 方向旋正、缩小到最长边不超过 max_dimension、转为 JPEG
+    JPEG 使用 draft 模式在解码时直接按 1/2、1/4、1/8 缩小，大图无需完整解码
+    已满足策略的 JPEG (尺寸不超限、无需旋转) 原样返回
+    返回 (图像字节, 统计信息)
+    """
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(data))
+    source_format = image.format
+    original_size = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    scale = min(1.0, max_dimension / max(original_size))
+
+    def stats(output, size, resized):
+        return {
+            "original_bytes": len(data),
+            "bytes": len(output),
+            "original_size": list(original_size),
+            "size": list(size),
+            "format": "JPEG" if output is not data else source_format,
+            "resized": resized,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    if source_format == "JPEG" and scale == 1.0 and orientation == 1:
+        return data, stats(data, original_size, False)
+
+    if source_format == "JPEG" and scale < 1.0:
+        # 解码时缩小 (结果仍不小于目标尺寸，之后再精确缩放)
+        image.draft("RGB", (int(original_size[0] * scale), int(original_size[1] * scale)))
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # 透明背景铺白 (JPEG 不支持透明通道)
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    image = image.convert("RGB")
+    if max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality, optimize=True)
+    output = buf.getvalue()
+    if scale == 1.0 and orientation == 1 and len(output) >= len(data):
+        # 小图重新编码反而更大 (如简单的 PNG 截图)，保留原图
+        return data, stats(data, original_size, False)
+    return output, stats(output, image.size, scale < 1.0)
+
+# 感知哈希 (dHash): 灰度缩小到 (HASH_SIZE+1)×HASH_SIZE，比较水平相邻像素的明暗
+# 缩放、重新压缩后的同一张图像哈希几乎不变 (汉明距离很小)；
+# 但布局相同、文字不同的截图哈希也可能完全相同，只能用于查找候选，复用前需用缩略图签名确认
+HASH_SIZE = 8
+# 确认用的灰度缩略图边长与允许的最大像素差 (重新压缩 / 缩放的副本通常在 10 以内，文字不同时远大于此)
+SIGNATURE_SIZE = 64
+SIGNATURE_MAX_DIFF = int(os.environ.get("IMAGE_SIGNATURE_MAX_DIFF", "24"))
+
+def _gray(data: bytes, draft_size: int) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    if image.format == "JPEG":
+        image.draft("L", (draft_size, draft_size))
+    return ImageOps.exif_transpose(image).convert("L")
+
+def _dhash(gray: Image.Image, hash_size: int) -> int:
+    pixels = list(gray.resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def dhash(data: bytes, hash_size: int = HASH_SIZE) -> int:
+    """计算图像的 dHash，返回 hash_size*hash_size 位整数"""
+    return _dhash(_gray(data, hash_size * 8), hash_size)
+
+def fingerprint(data: bytes) -> Tuple[int, bytes]:
+    """一次解码同时得到 (dHash, 灰度缩略图签名)"""
+    gray = _gray(data, SIGNATURE_SIZE * 2)
+    signature = gray.resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.LANCZOS).tobytes()
+    return _dhash(gray, HASH_SIZE), signature
+
+def signature_diff(a: bytes, b: bytes) -> int:
+    """两个缩略图签名的最大像素差 (0-255)"""
+    size = (SIGNATURE_SIZE, SIGNATURE_SIZE)
+    difference = ImageChops.difference(Image.frombytes("L", size, a), Image.frombytes("L", size, b))
+    return difference.getextrema()[1]
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
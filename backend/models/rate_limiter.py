@@ -0,0 +1,237 @@
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+# 每个模型的默认预算: 每秒请求数 (qps) 与每分钟 token 数 (tpm)
+# 可通过 DASHSCOPE_RATE_LIMITS 按模型覆盖，如 {"qwen-vl-plus": {"qps": 2, "tpm": 60000}}
+DEFAULT_LIMITS = {"qps": 5, "tpm": 100000}
+MODEL_LIMITS = json.loads(os.environ.get("DASHSCOPE_RATE_LIMITS", "{}"))
+# 设置后各进程通过同一个 SQLite 文件共享令牌桶 (前端与后端同机部署时)
+# 注意只共享配额: 优先级排队只在进程内生效，不同进程的请求之间不保证交互优先
+RATE_LIMIT_DB = os.environ.get("DASHSCOPE_RATE_LIMIT_DB")
+# 批量请求只能使用超出此比例的容量，剩余部分留给交互请求
+# (单次请求本身接近桶容量时保留量相应减少，保证批量请求总能在桶满时获得配额)
+BULK_RESERVE = float(os.environ.get("DASHSCOPE_BULK_RESERVE", "0.2"))
+
+# 优先级: 数值越小越先获得令牌
+INTERACTIVE, BULK = "interactive", "bulk"
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}
+
+class RateLimitExceeded(TimeoutError):
+    """未能在超时时间内获得令牌"""
+
+def _budget(model: str):
+    """返回 [(桶名, 容量, 每秒补充量)]: 请求数桶与 token 桶"""
+    limits = dict(DEFAULT_LIMITS, **MODEL_LIMITS.get(model, {}))
+    qps = float(limits["qps"])
+    tpm = float(limits["tpm"])
+    return [(f"{model}:requests", max(1.0, qps), qps), (f"{model}:tokens", tpm, tpm / 60)]
+
+def _wait_time(buckets, levels, amounts, reserve):
+    """当前余量下需要等待的秒数 (0 表示可以立即扣除)"""
+    wait = 0.0
+    for (_, capacity, rate), level, amount in zip(buckets, levels, amounts):
+        kept = min(reserve * capacity, capacity - amount)
+        deficit = amount + kept - level
+        if deficit > 0:
+            wait = max(wait, deficit / rate)
+    return wait
+
+class MemoryBuckets:
+    """进程内令牌桶"""
+
+    def __init__(self):
+        self._levels = {}  # 桶名 -> (令牌数, 更新时间)
+        self._lock = threading.Lock()
+
+    def _level(self, name, capacity, rate, now):
+        tokens, updated = self._levels.get(name, (capacity, now))
+        return min(capacity, tokens + (now - updated) * rate)
+
+    def take(self, buckets, amounts, reserve):
+        """
+        同时从多个桶取令牌: 全部足够时扣除并返回 0，否则不扣除，返回需要等待的秒数
+        reserve 为必须保留的容量比例 (批量请求)
+        """
+        with self._lock:
+            now = time.monotonic()
+            levels = [self._level(name, capacity, rate, now) for name, capacity, rate in buckets]
+            wait = _wait_time(buckets, levels, amounts, reserve)
+            if wait == 0:
+                for (name, _, _), level, amount in zip(buckets, levels, amounts):
+                    self._levels[name] = (level - amount, now)
+            return wait
+
+    def adjust(self, bucket, amount):
+        """按实际用量修正 (amount 为正表示多用，可以透支)"""
+        name, capacity, rate = bucket
+        with self._lock:
+            now = time.monotonic()
+            self._levels[name] = (self._level(name, capacity, rate, now) - amount, now)
+
+    def levels(self, buckets):
+        with self._lock:
+            now = time.monotonic()
+            return {name: round(self._level(name, capacity, rate, now), 1) for name, capacity, rate in buckets}
+
+class SQLiteBuckets(MemoryBuckets):
+    """跨进程令牌桶: 状态保存在 SQLite 中，在 IMMEDIATE 事务内补充并扣除"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _transaction(self, buckets, update):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            levels = []
+            for name, capacity, rate in buckets:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                levels.append(min(capacity, tokens + max(0.0, now - updated) * rate))
+            result, new_levels = update(levels)
+            if new_levels is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    [(name, level, now) for (name, _, _), level in zip(buckets, new_levels)]
+                )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def take(self, buckets, amounts, reserve):
+        def update(levels):
+            wait = _wait_time(buckets, levels, amounts, reserve)
+            if wait > 0:
+                return wait, None
+            return 0.0, [level - amount for level, amount in zip(levels, amounts)]
+        return self._transaction(buckets, update)
+
+    def adjust(self, bucket, amount):
+        self._transaction([bucket], lambda levels: (None, [levels[0] - amount]))
+
+    def levels(self, buckets):
+        levels = self._transaction(buckets, lambda levels: (levels, None))
+        return {name: round(level, 1) for (name, _, _), level in zip(buckets, levels)}
+
+class RateLimiter:
+    """
+    DashScope 请求限流: 每个模型一个请求数桶和一个 token 桶
+    等待中的请求按 (优先级, 到达顺序) 排队，只有队首可以取令牌，交互请求总是排在批量请求之前
+    排队只在本进程内进行；令牌桶读写 (可能是 SQLite) 在锁外执行，不阻塞其他线程入队
+    """
+
+    def __init__(self, db_path: str = None):
+        self._buckets = SQLiteBuckets(db_path) if db_path else MemoryBuckets()
+        self._cond = threading.Condition()
+        self._queues = {}    # 模型 -> [(优先级, 序号)]
+        self._metrics = {}   # 模型 -> 计数
+        self._seq = itertools.count()
+
+    def _model_metrics(self, model):
+        if model not in self._metrics:
+            self._metrics[model] = {
+                "acquired": 0, "timeouts": 0, "wait_ms_total": 0.0, "max_queue_depth": 0,
+                "tokens_estimated": 0, "tokens_used": 0
+            }
+        return self._metrics[model]
+
+    def acquire(self, model: str, tokens: int = 0, priority: str = INTERACTIVE, timeout: float = None) -> float:
+        """
+        获取一次请求和 tokens 个 token 的配额，返回等待的秒数
+        超过 timeout 仍未获得时抛出 RateLimitExceeded
+        """
+        buckets = _budget(model)
+        # 超过桶容量的预估按容量计 (否则永远无法满足)，实际用量之后由 settle 修正
+        amounts = [1, min(float(tokens), buckets[1][1])]
+        reserve = BULK_RESERVE if priority == BULK else 0.0
+        ticket = (PRIORITIES[priority], next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            queue = self._queues.setdefault(model, [])
+            metrics = self._model_metrics(model)
+            heapq.heappush(queue, ticket)
+            metrics["max_queue_depth"] = max(metrics["max_queue_depth"], len(queue))
+            self._cond.notify_all()
+        try:
+            while True:
+                with self._cond:
+                    is_head = queue[0] == ticket
+                wait = self._buckets.take(buckets, amounts, reserve) if is_head else None
+                with self._cond:
+                    if wait == 0:
+                        waited = time.monotonic() - start
+                        metrics["acquired"] += 1
+                        metrics["wait_ms_total"] += waited * 1000
+                        metrics["tokens_estimated"] += int(amounts[1])
+                        return waited
+                    if timeout is not None:
+                        remaining = start + timeout - time.monotonic()
+                        if remaining <= 0:
+                            metrics["timeouts"] += 1
+                            raise RateLimitExceeded(f"{model} 限流等待超过 {timeout:.2f}s")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    if is_head == (queue[0] == ticket):
+                        # 队首变化 (有人入队或离开) 时会被唤醒重新检查；
+                        # 在锁外取令牌期间队首已经变化时直接重新检查，避免错过通知
+                        self._cond.wait(wait)
+        finally:
+            with self._cond:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+
+    def settle(self, model: str, estimated: int, used: int):
+        """请求完成后按实际 token 用量修正 token 桶"""
+        if used is None:
+            return
+        bucket = _budget(model)[1]
+        self._buckets.adjust(bucket, used - min(float(estimated), bucket[1]))
+        with self._cond:
+            self._model_metrics(model)["tokens_used"] += int(used)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各模型的排队深度 (按优先级，仅本进程)、累计计数与令牌余量"""
+        with self._cond:
+            models = {}
+            for model, metrics in self._metrics.items():
+                queue = self._queues.get(model, [])
+                waiting = {name: sum(1 for p, _ in queue if p == level) for name, level in PRIORITIES.items()}
+                models[model] = dict(
+                    metrics,
+                    wait_ms_total=round(metrics["wait_ms_total"], 1),
+                    queue_depth=waiting,
+                    limits=dict(DEFAULT_LIMITS, **MODEL_LIMITS.get(model, {}))
+                )
+        for model, info in models.items():
+            info["levels"] = self._buckets.levels(_budget(model))
+        return {"shared": RATE_LIMIT_DB is not None, "bulk_reserve": BULK_RESERVE, "models": models}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器 (设置 DASHSCOPE_RATE_LIMIT_DB 时跨进程共享令牌桶)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(RATE_LIMIT_DB)
+        return _limiter
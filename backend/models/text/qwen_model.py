@@ -10,11 +10,29 @@ except ImportError:
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from base_model import BaseModel
+from rate_limiter import get_rate_limiter, RateLimitExceeded, INTERACTIVE
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 限流时按 token 数预估配额: 输入按每字符 1 个 token 粗略估计，另加预计输出长度
+EXPECTED_OUTPUT_TOKENS = 500
+# 等待限流配额的最长时间 (秒)，超时返回错误而不是一直阻塞
+RATE_LIMIT_TIMEOUT = float(os.getenv("DASHSCOPE_RATE_LIMIT_TIMEOUT", "30"))
+
+def _usage_tokens(usage):
+    """从 DashScope 返回的 usage 中取总 token 数"""
+    if not usage:
+        return None
+    try:
+        total = usage["total_tokens"] if "total_tokens" in usage else None
+        if total is None:
+            total = usage["input_tokens"] + usage["output_tokens"]
+        return int(total)
+    except (KeyError, TypeError):
+        return None
+
 class QwenModel(BaseModel):
     """
     通义千问大模型接口
@@ -39,9 +57,10 @@ class QwenModel(BaseModel):
         """
         pass
     
-    def predict(self, input_data: str, history: List[Dict] = None) -> Dict[str, Any]:
+    def predict(self, input_data: str, history: List[Dict] = None, priority: str = INTERACTIVE) -> Dict[str, Any]:
         """
         调用 Qwen API 进行预测/对话
+        priority: 限流优先级，对话等交互请求用 "interactive"，批量生成用 "bulk"
         """
         if not dashscope:
              return {
@@ -63,12 +82,27 @@ class QwenModel(BaseModel):
             
             messages.append({'role': 'user', 'content': input_data})
 
+            # 所有 DashScope 调用共用限流器，避免批量生成把交互请求挤成 429
+            limiter = get_rate_limiter()
+            estimated = sum(len(m['content']) for m in messages) + EXPECTED_OUTPUT_TOKENS
+            try:
+                limiter.acquire(self.model_name, estimated, priority, timeout=RATE_LIMIT_TIMEOUT)
+            except RateLimitExceeded as e:
+                logger.warning(f"Qwen request rate limited: {e}")
+                return {
+                    "status": "error",
+                    "code": "RateLimited",
+                    "message": str(e),
+                    "text": "请求过多，请稍后再试。"
+                }
+
             response = dashscope.Generation.call(
                 model=self.model_name,
                 messages=messages,
                 result_format='message',  # set the result to be "message" format.
             )
 
+            limiter.settle(self.model_name, estimated, _usage_tokens(getattr(response, "usage", None)))
             if response.status_code == HTTPStatus.OK:
                 return {
                     "status": "success",
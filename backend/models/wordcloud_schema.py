@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict
+
+class WordCloudRequest(BaseModel):
+    """词云渲染请求: 词频表 (frequencies) 或已上传过的词频表 id (dataset_id) 二选一"""
+    frequencies: Optional[Dict[str, float]] = Field(default=None, description="词频表 {词: 频次}")
+    dataset_id: Optional[str] = Field(default=None, description="之前请求返回的 X-Dataset-Id")
+    shape: str = Field(default="矩形", description="形状: 矩形 / 圆形 / 椭圆")
+    colormap: str = Field(default="viridis", description="matplotlib 配色名称")
+    max_words: int = Field(default=100, ge=1, le=1000)
+    width: int = Field(default=800, ge=50, le=2000)
+    height: int = Field(default=600, ge=50, le=2000)
+    contour: bool = Field(default=False, description="有形状时是否绘制轮廓")
+    format: str = Field(default="webp", description="图片格式: webp / png")
+
+
+    def validate_frequencies(self):
+        """检查词频表 (路由中调用，不满足时抛出 ValueError，由路由返回 400)"""
+        if self.frequencies is None:
+            return
+        if not self.frequencies:
+            raise ValueError("词频表为空")
+        # 全部为 0 时词云无法按频次缩放字号 (渲染时会除以 0)
+        if not any(count > 0 for count in self.frequencies.values()):
+            raise ValueError("词频表中至少需要一个大于 0 的频次")
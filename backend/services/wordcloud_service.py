@@ -0,0 +1,128 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from wordcloud import WordCloud
+except ImportError:
+    WordCloud = None
+
+# 中文字体 (需支持中文)，可通过环境变量指定
+FONT_PATH = os.environ.get("WORDCLOUD_FONT", "simhei.ttf")
+MEDIA_TYPES = {"webp": "image/webp", "png": "image/png"}
+WEBP_QUALITY = 90
+IMAGE_CACHE_SIZE = 128
+DATASET_CACHE_SIZE = 64
+
+def frequency_id(frequencies):
+    """词频表的内容哈希 (与前端 utils/wordcloud_client.py 的计算方式一致)"""
+    items = sorted((word, float(count)) for word, count in frequencies.items())
+    canonical = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+# -----------------------------------------------------------------------------
+# 形状蒙版 (与前端 utils/wordcloud_masks.py 一致: 255 的位置不放置词语)
+# -----------------------------------------------------------------------------
+def _grid(size):
+    rows, cols = np.ogrid[:size, :size]
+    center = size // 2
+    return rows - center, cols - center
+
+def _circle_mask(size):
+    rows, cols = _grid(size)
+    radius = size * 350 // 800
+    return rows ** 2 + cols ** 2 > radius ** 2
+
+def _ellipse_mask(size):
+    rows, cols = _grid(size)
+    return (rows / (size / 2)) ** 2 + (cols / (size * 250 / 800)) ** 2 > 1
+
+MASK_SHAPES = {"矩形": None, "圆形": _circle_mask, "椭圆": _ellipse_mask}
+
+@lru_cache(maxsize=16)
+def shape_mask(shape, size):
+    builder = MASK_SHAPES.get(shape)
+    if builder is None:
+        return None
+    mask = np.where(builder(size), 255, 0).astype(np.uint8)
+    mask.setflags(write=False)
+    return mask
+
+class WordCloudService:
+    """
+    词云渲染服务: 渲染结果按 (词频表 id, 渲染参数) 缓存，
+    缓存键同时作为 ETag；词频表按 id 保存，之后的请求只需传 dataset_id
+    """
+
+    def __init__(self):
+        self._images = OrderedDict()     # etag -> 图片字节
+        self._datasets = OrderedDict()   # dataset_id -> 词频表
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return WordCloud is not None
+
+    def _remember(self, store, key, value, limit):
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > limit:
+                store.popitem(last=False)
+
+    def _lookup(self, store, key):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def resolve_dataset(self, frequencies=None, dataset_id=None):
+        """返回 (dataset_id, 词频表)；只传 dataset_id 且未缓存时词频表为 None"""
+        if frequencies is not None:
+            dataset_id = frequency_id(frequencies)
+            self._remember(self._datasets, dataset_id, frequencies, DATASET_CACHE_SIZE)
+            return dataset_id, frequencies
+        return dataset_id, self._lookup(self._datasets, dataset_id)
+
+    @staticmethod
+    def etag(dataset_id, options):
+        canonical = json.dumps([dataset_id, options], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def cached(self, etag):
+        return self._lookup(self._images, etag)
+
+    def render(self, etag, frequencies, options):
+        """渲染并缓存 (CPU 密集，应在线程池中调用)"""
+        image = self.cached(etag)
+        if image is not None:
+            return image
+        mask = None
+        if options["shape"] in MASK_SHAPES and MASK_SHAPES[options["shape"]] is not None:
+            mask = shape_mask(options["shape"], max(options["width"], options["height"]))
+        cloud = WordCloud(
+            font_path=FONT_PATH,
+            background_color="white",
+            width=options["width"],
+            height=options["height"],
+            max_words=options["max_words"],
+            mask=mask,
+            contour_width=1 if options["contour"] and mask is not None else 0,
+            contour_color="steelblue",
+            colormap=options["colormap"]
+        ).generate_from_frequencies(frequencies)
+        buf = io.BytesIO()
+        if options["format"] == "webp":
+            cloud.to_image().save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            cloud.to_image().save(buf, format="PNG", optimize=True)
+        image = buf.getvalue()
+        self._remember(self._images, etag, image, IMAGE_CACHE_SIZE)
+        return image
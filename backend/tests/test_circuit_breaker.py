@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'models'))
+from circuit_breaker import CircuitBreaker, call_with_deadline, HALF_OPEN
+from rate_limiter import RateLimiter, RateLimitExceeded
+
+
+def _slow_then_fast():
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        time.sleep(0.3 if len(calls) == 1 else 0.01)
+        return len(calls)
+    return fn, calls
+
+
+def test_hedge_runs_when_guard_allows():
+    fn, calls = _slow_then_fast()
+    result, hedged = call_with_deadline(fn, 2.0, 0.05, lambda: True)
+    assert hedged and result == 2 and len(calls) == 2
+
+
+def test_hedge_skipped_without_quota():
+    limiter = RateLimiter()
+    for _ in range(5):  # 默认 qps=5: 取空请求数桶
+        limiter.acquire("m", 0)
+
+    def guard():
+        try:
+            limiter.acquire("m", 0, timeout=0)
+            return True
+        except RateLimitExceeded:
+            return False
+
+    fn, calls = _slow_then_fast()
+    result, hedged = call_with_deadline(fn, 2.0, 0.05, guard)
+    assert not hedged and result == 1 and len(calls) == 1
+
+
+def test_release_returns_half_open_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure("boom")
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
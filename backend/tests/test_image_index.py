@@ -0,0 +1,71 @@
+import io
+import os
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'models', 'image'))
+from image_utils import fingerprint, hamming
+from image_index import NearDuplicateIndex, DUPLICATE_DISTANCE
+from image_model import ImageModel
+
+
+def _screenshot(lines, fmt="PNG", size=(1080, 1920), **save_args):
+    """布局相同 (标题栏、卡片、按钮) 的订单截图，只有文字不同"""
+    image = Image.new("RGB", (1080, 1920), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1080, 160), fill=(255, 80, 0))
+    font = ImageFont.load_default(size=44)
+    for i, line in enumerate(lines):
+        top = 240 + i * 220
+        draw.rectangle((40, top, 1040, top + 180), outline=(200, 200, 200), width=4)
+        draw.text((80, top + 60), line, fill="black", font=font)
+    draw.rectangle((40, 1760, 1040, 1880), fill=(255, 80, 0))
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **save_args)
+    return buffer.getvalue()
+
+
+ORDER_A = ["Order 1024  Paid", "USB-C cable x2  39.90", "Ships in 24 hours"]
+ORDER_B = ["Order 7731  Refunded", "Wi-Fi router x1  259.00", "Refund in 3 days"]
+
+
+def test_reuse_is_opt_in():
+    assert DUPLICATE_DISTANCE < 0
+
+
+def test_same_layout_different_text_is_not_reused():
+    hash_a, signature_a = fingerprint(_screenshot(ORDER_A))
+    hash_b, signature_b = fingerprint(_screenshot(ORDER_B))
+    # dHash 无法区分这两张截图，只能靠签名确认拒绝
+    assert hamming(hash_a, hash_b) <= 5
+
+    index = NearDuplicateIndex()
+    index.add("a", hash_a, {"tasks": ["analysis"]}, signature_a)
+    assert index.find(hash_b, signature_b, max_distance=10, tasks=["analysis"]) is None
+
+
+def test_recompressed_copy_is_reused():
+    hash_a, signature_a = fingerprint(_screenshot(ORDER_A))
+    copy = _screenshot(ORDER_A, fmt="JPEG", size=(540, 960), quality=60)
+    hash_copy, signature_copy = fingerprint(copy)
+
+    index = NearDuplicateIndex()
+    index.add("a", hash_a, {"tasks": ["analysis"]}, signature_a)
+    match = index.find(hash_copy, signature_copy, max_distance=5, tasks=["analysis"])
+    assert match is not None and match[1] == "a"
+    # 已有结果不覆盖请求的任务时不复用
+    assert index.find(hash_copy, signature_copy, max_distance=5, tasks=["analysis", "ocr"]) is None
+
+
+def test_ocr_is_never_reused(tmp_path):
+    path = tmp_path / "order.png"
+    path.write_bytes(_screenshot(ORDER_A))
+    value, signature = fingerprint(path.read_bytes())
+    model = ImageModel()
+    model.duplicate_index.add("other", value, {"tasks": ["analysis", "ocr"], "ocr_text": "Order 7731"}, signature)
+
+    assert "near_duplicate" in model.predict(str(path), tasks=["analysis"], max_distance=5)
+    assert "near_duplicate" not in model.predict(str(path), tasks=["ocr"], max_distance=5)
@@ -0,0 +1,124 @@
+"""
+文本分析互动视图的负载与首图耗时基准
+
+对比:
+  - 旧方式: 所有图表一次性构建并序列化进同一个 HTML
+  - 新方式: 只下发元数据 + 初始可见的三张卡片，其余卡片转到可见位置时再按需构建
+并列出每张卡片以 JSON 数值列表 / base64 二进制数组下发时的负载大小
+
+用法:
+  cd frontend
+  python benchmarks/carousel_payload.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# (frontend/benchmarks) -> (frontend)
+frontend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (frontend_dir, os.path.join(frontend_dir, 'utils')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from components.comment_analysis import (  # noqa: E402
+    CHART_ORDER, CHART_TITLES, build_chart_map, build_ui_frame,
+    initial_visible_keys, _figure_payload, _layout_token
+)
+from utils.aggregates import DatasetAggregates  # noqa: E402
+from utils.data_processor import compute_row_hashes  # noqa: E402
+from utils.doc_term import DocTermMatrix  # noqa: E402
+from utils.plotly_assets import _decode, _is_binary, payload_size, templates_for  # noqa: E402
+from utils.synthetic_reviews import generate_reviews  # noqa: E402
+from utils.tokenizer import TokenCache  # noqa: E402
+
+CATEGORIES = ["Cable", "Charger", "Headphones", "Smartwatch", "Mobile", "Laptop", "Speaker", "Camera"]
+SENTIMENT_LABELS = {'positive': "正面", 'negative': "负面", 'neutral': "中性"}
+# 各情感的 sentiment_score 取值区间
+SCORE_RANGES = {'positive': (0.05, 1.0), 'negative': (-1.0, -0.05), 'neutral': (-0.05, 0.05)}
+
+def make_dataset(rows, seed=0):
+    """由合成评论生成与 process_uploaded_data 输出结构一致的数据"""
+    reviews = generate_reviews(rows, seed=seed, english_share=0.7, categories=CATEGORIES, days=730)
+    rng = np.random.default_rng(seed)
+    sentiment = reviews['sentiment'].astype(str).to_numpy()
+    low = np.select([sentiment == s for s in SCORE_RANGES], [r[0] for r in SCORE_RANGES.values()])
+    high = np.select([sentiment == s for s in SCORE_RANGES], [r[1] for r in SCORE_RANGES.values()])
+    df = pd.DataFrame({
+        'product_name': rng.choice(["A", "B", "C", "D"], rows),
+        'product_category': reviews['category'],
+        'rating': reviews['rating'].astype(np.float32),
+        'review_content': reviews['comment'],
+        'sentiment_score': rng.uniform(low, high).astype(np.float32),
+        'sentiment_label': pd.Series(sentiment).map(SENTIMENT_LABELS).to_numpy(),
+        'date': reviews['date']
+    })
+    df['row_hash'] = compute_row_hashes(df)
+    return df
+
+def _as_lists(obj):
+    """把二进制数组还原为普通列表 (plotly.py 6+ 的 to_json 默认输出二进制)"""
+    if isinstance(obj, dict):
+        if _is_binary(obj):
+            return _decode(obj)
+        return {key: _as_lists(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_as_lists(item) for item in obj]
+    return obj
+
+def json_list_size(fig_dict):
+    """数值数组按普通 JSON 列表序列化时 data 部分的字节数 (编码前的基线)"""
+    return payload_size(_as_lists(fig_dict['data']))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    ui_df = build_ui_frame(make_dataset(args.rows))
+    token_cache = TokenCache()
+    token_cache.add(ui_df['row_hash'], ui_df['comment'])
+    aggregates = DatasetAggregates.from_frame(ui_df)
+    doc_term = DocTermMatrix.from_token_cache(token_cache, ui_df['row_hash'], ui_df.index)
+    print(f"数据准备 ({args.rows:,} 行, 分词 + 聚合): {time.perf_counter() - t0:.2f}s")
+
+    # 旧方式: 所有图表构建 + 序列化后才能显示第一张
+    component_map = build_chart_map(ui_df, aggregates.cube, doc_term)
+    t0 = time.perf_counter()
+    all_figures = {key: _figure_payload(component_map[key]()) for key in CHART_ORDER}
+    blob = json.dumps({'figures': all_figures, 'templates': templates_for(all_figures)})
+    eager_time = time.perf_counter() - t0
+    eager_bytes = len(blob.encode("utf-8"))
+
+    # 新方式: 元数据 + 初始可见卡片 (使用新的回调，避免复用上面的中间结果)
+    component_map = build_chart_map(ui_df, aggregates.cube, doc_term)
+    t0 = time.perf_counter()
+    initial = {key: _figure_payload(component_map[key]()) for key in initial_visible_keys(CHART_ORDER)}
+    initial_args = {
+        'token': _layout_token(("benchmark", args.rows)),
+        'order': CHART_ORDER,
+        'titles': CHART_TITLES,
+        'figures': initial,
+        'templates': templates_for(initial)
+    }
+    lazy_bytes = payload_size(initial_args)
+    lazy_time = time.perf_counter() - t0
+
+    print()
+    print(f"{'方式':<12}{'首屏负载':>14}{'首图耗时':>12}")
+    print(f"{'一次性 HTML':<12}{eager_bytes / 1024:>11.1f} KB{eager_time * 1000:>10.1f} ms")
+    print(f"{'按需加载':<12}{lazy_bytes / 1024:>11.1f} KB{lazy_time * 1000:>10.1f} ms")
+    print()
+    print("各卡片负载 (data 部分: JSON 列表 -> 二进制, 以及整张卡片):")
+    for key in CHART_ORDER:
+        data_bytes = payload_size(all_figures[key]['data'])
+        print(f"  {key:<18}{json_list_size(all_figures[key]) / 1024:>8.1f} KB ->{data_bytes / 1024:>7.1f} KB"
+              f"   卡片 {payload_size(all_figures[key]) / 1024:>6.1f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+多进程分词吞吐量基准
+
+在 1 / 2 / 4 / 8 个进程下对同一批合成中英文评论分词，报告耗时与每秒处理的评论数，
+并校验多进程结果与单进程逐条分词完全一致 (顺序不变)。
+进程池创建 (含每个进程加载 jieba 词典) 的耗时单独列出。
+
+用法:
+  cd frontend
+  python benchmarks/tokenize_throughput.py --rows 200000
+  python benchmarks/tokenize_throughput.py --input data/bench/reviews.parquet --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+# (frontend/benchmarks) -> (frontend)
+frontend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (frontend_dir, os.path.join(frontend_dir, 'utils')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from utils.synthetic_reviews import generate_reviews  # noqa: E402
+from utils.tokenize_service import TokenizeService  # noqa: E402
+from utils.tokenizer import process_text  # noqa: E402
+
+def load_texts(rows, path=None, seed=0):
+    """评论文本: 读取合成评论 Parquet 的前 rows 行，未指定文件时直接生成 (中英文各半)"""
+    if path:
+        return pd.read_parquet(path, columns=['comment'])['comment'].head(rows).tolist()
+    return generate_reviews(rows, seed=seed, english_share=0.5)['comment'].tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--input", help="synthetic_reviews.py 生成的 Parquet 文件")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    texts = load_texts(args.rows, args.input)
+    print(f"{args.rows:,} 条评论, CPU 核数 {os.cpu_count()}, 每块 {args.chunk_size} 条")
+    print()
+    print(f"{'进程数':<8}{'启动':>10}{'分词':>10}{'评论/秒':>12}{'加速比':>8}")
+
+    baseline = None
+    expected = None
+    for workers in args.workers:
+        with TokenizeService(process_text, workers=workers, chunk_size=args.chunk_size) as service:
+            t0 = time.perf_counter()
+            service.warm_up()
+            startup = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            result = service.tokenize(texts)
+            elapsed = time.perf_counter() - t0
+
+        if expected is None:
+            expected = result
+        elif result != expected:
+            raise SystemExit(f"{workers} 个进程的分词结果与单进程不一致")
+        baseline = baseline or elapsed
+        print(f"{workers:<10}{startup:>9.2f}s{elapsed:>9.2f}s{args.rows / elapsed:>12,.0f}{baseline / elapsed:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import jieba
-import re
-from collections import Counter
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import sys
 import os
 import json
-from streamlit.components.v1 import html
+import hashlib
+from collections import OrderedDict
+import streamlit.components.v1 as components
 import datetime
 
 # 添加 utils 路径
@@ -30,325 +29,263 @@ except ImportError:
     QwenModel = None
 
 try:
-    from utils.data_processor import process_uploaded_data, generate_response
+    from utils.data_processor import (
+        process_uploaded_data, generate_response, compact_frame,
+        append_uploaded_data, compute_row_hashes, dataset_fingerprint
+    )
+    from utils.data_loader import read_uploaded_file
+    from utils.aggregates import DatasetAggregates
+    from utils.tokenizer import TokenCache
+    from utils.doc_term import DocTermMatrix
+    from utils.search_index import SearchIndex, parse_query
+    from utils import history_store
     from utils.layout import render_header
+    from utils.plotly_assets import encode_arrays, ensure_plotly_bundle, extract_template, templates_for
 except ImportError:
     st.error("无法导入数据处理模块，请检查路径。")
     def process_uploaded_data(df): return df
     def generate_response(label, text, category): return "无法生成"
+    def compact_frame(df): return df, None
+    def read_uploaded_file(f): return pd.read_csv(f) if f.name.endswith('.csv') else pd.read_excel(f)
     def render_header(title, subtitle=None): st.title(title)
+    def encode_arrays(obj): return obj
+    def extract_template(fig_dict): return fig_dict
+    def templates_for(figures): return {}
+    def ensure_plotly_bundle(static_dir): return None
+
+# 轮播图表组件 (前端代码位于 components/chart_carousel)
+CAROUSEL_DIR = os.path.join(current_dir, "chart_carousel")
+_chart_carousel = components.declare_component("chart_carousel", path=CAROUSEL_DIR)
+# 组件目录下的本地 plotly.js (文件名带版本号)，不可用时前端回退到 CDN
+PLOTLY_SRC = ensure_plotly_bundle(CAROUSEL_DIR)
+
+# 每个布局最多保留的 (数据集, 筛选条件) 组合数
+LAYOUT_CACHE_SIZE = 8
 
-def render_interactive_layout(section_id, component_map, initial_order):
+def _figure_payload(fig):
+    """将 Plotly Figure 转换为适配卡片布局的 dict"""
+    fig_dict = json.loads(fig.to_json())
+    # Clean up layout for CSS card
+    if 'layout' in fig_dict:
+        fig_dict['layout'].pop('width', None)
+        fig_dict['layout'].pop('height', None)
+        fig_dict['layout']['autosize'] = True
+        # 保留图表原有边距设置，确保标签不被遮挡
+        if 'margin' not in fig_dict['layout']:
+            fig_dict['layout']['margin'] = dict(l=120, r=40, t=60, b=130)
+        else:
+            # 如果已有边距设置，确保最小值
+            margin = fig_dict['layout']['margin']
+            margin['l'] = max(margin.get('l', 0), 120)
+            margin['r'] = max(margin.get('r', 0), 40)
+            margin['t'] = max(margin.get('t', 0), 60)
+            margin['b'] = max(margin.get('b', 0), 130)
+        fig_dict['layout']['paper_bgcolor'] = 'rgba(0,0,0,0)'
+    # 数值数组以 base64 二进制下发，由前端解码为 TypedArray；布局模板单独下发
+    encode_arrays(fig_dict.get('data', []))
+    return extract_template(fig_dict)
+
+def _layout_cache(section_id, cache_key):
     """
-    使用 HTML+CSS+JS 实现的客户端真·悬浮交互布局 (支持 N 个图表轮播)
-    特性：点击左侧/右侧触发轮换，带平滑动画，无需后端重绘。
+    获取布局缓存条目 (session 内按 (数据集指纹, 筛选条件) LRU 缓存)
+    条目结构: {'figures': {图表key: fig_dict}, 'sent': 已响应的客户端请求}
     """
-    # 1. 准备数据: 执行回调并将 Plotly Figure 转换为 JSON
-    chart_data = {}
-    valid_keys = []
-    
-    # Use initial_order as the source of truth for the sequence
-    for key in initial_order:
-        if key in component_map:
+    caches = st.session_state.setdefault(f'{section_id}_layout_cache', OrderedDict())
+    entry = caches.get(cache_key)
+    if entry is None:
+        entry = {'figures': {}, 'sent': None}
+        caches[cache_key] = entry
+        while len(caches) > LAYOUT_CACHE_SIZE:
+            caches.popitem(last=False)
+    else:
+        caches.move_to_end(cache_key)
+    return entry
+
+def _layout_token(cache_key):
+    """把缓存键压缩为客户端使用的短 token"""
+    return hashlib.md5(repr(cache_key).encode("utf-8")).hexdigest()[:16]
+
+def _build_figures(entry, component_map, keys):
+    """按需构建图表 (已构建的直接复用)，返回 {key: fig_dict}"""
+    result = {}
+    for key in keys:
+        if key not in component_map:
+            continue
+        if key not in entry['figures']:
             try:
                 fig = component_map[key]()
-                if fig:
-                    fig_dict = json.loads(fig.to_json())
-                    # Clean up layout for CSS card
-                    if 'layout' in fig_dict:
-                        fig_dict['layout'].pop('width', None)
-                        fig_dict['layout'].pop('height', None)
-                        fig_dict['layout']['autosize'] = True
-                        # 保留图表原有边距设置，确保标签不被遮挡
-                        if 'margin' not in fig_dict['layout']:
-                            fig_dict['layout']['margin'] = dict(l=120, r=40, t=60, b=130)
-                        else:
-                            # 如果已有边距设置，确保最小值
-                            margin = fig_dict['layout']['margin']
-                            margin['l'] = max(margin.get('l', 0), 120)
-                            margin['r'] = max(margin.get('r', 0), 40)
-                            margin['t'] = max(margin.get('t', 0), 60)
-                            margin['b'] = max(margin.get('b', 0), 130)
-                        fig_dict['layout']['paper_bgcolor'] = 'rgba(0,0,0,0)'
-                    
-                    chart_data[key] = fig_dict
-                    if key not in valid_keys:
-                        valid_keys.append(key)
+                entry['figures'][key] = _figure_payload(fig) if fig else None
             except Exception as e:
                 print(f"Error rendering {key}: {e}")
+                entry['figures'][key] = None
+        if entry['figures'][key] is not None:
+            result[key] = entry['figures'][key]
+    return result
 
-    chart_data_js = json.dumps(chart_data)
-    order_list_js = json.dumps(valid_keys)
+def initial_visible_keys(order):
+    """轮播初始可见的卡片: 中间、左侧、右侧"""
+    if not order:
+        return []
+    return list(dict.fromkeys([order[0], order[-1], order[1 % len(order)]]))
 
-    html_code = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <script src="https://cdn.plot.ly/plotly-2.24.1.min.js"></script>
-        <style>
-            body {{
-                margin: 0;
-                padding: 10px;
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-                background: transparent;
-                overflow: hidden;
-            }}
-            .container {{
-                position: relative;
-                width: 100%;
-                height: 800px; /* 大幅增加高度以确保下方数据完全显示 */
-                perspective: 1200px;
-                display: flex;
-                justify-content: center;
-                align-items: flex-start; /* 改为顶部对齐，避免垂直居中导致的截断 */
-                padding-top: 20px; /* 减少顶部填充以提供更多下方空间 */
-            }}
-            
-            /* 卡片基础样式 */
-            .chart-card {{
-                position: absolute;
-                background: white;
-                border: 1px solid #e5e7eb;
-                border-radius: 12px;
-                box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-                transition: all 0.6s cubic-bezier(0.25, 0.8, 0.25, 1);
-                overflow: hidden;
-                box-sizing: border-box;
-                display: block;
-                /* Default to hidden state to prevent flash */
-                opacity: 0;
-                transform: scale(0.8) translateY(50px);
-                z-index: 0;
-                pointer-events: none;
-            }}
-            
-            /* 状态类 - 通过JS切换 */
-            
-            /* Center / Top Card */
-            .chart-card.pos-top {{
-                opacity: 1;
-                width: 55%; 
-                height: 650px; /* 大幅增加高度以确保下方数据完全显示 */
-                transform: translateX(-50%) scale(1); /* 添加水平居中变换 */
-                z-index: 20;
-                left: 50%; /* 改为50%以实现精确水平居中 */
-                top: 0; /* 改为顶部对齐 */
-                box-shadow: 0 25px 50px -12px rgba(0, 0, 0, 0.25);
-                border: 2px solid #3b82f6;
-                pointer-events: auto;
-            }}
-
-            /* Left Background Card */
-            .chart-card.pos-left {{
-                opacity: 0.7;
-                width: 45%;
-                height: 650px; /* 大幅增加高度以确保下方数据完全显示 */
-                transform: translateX(-110%) scale(0.9) perspective(1000px) rotateY(15deg); /* 调整水平变换以匹配新的居中方式 */
-                z-index: 10;
-                left: 50%; /* 改为50%以实现精确水平居中 */
-                top: 20px; /* 改为顶部对齐 */
-                filter: brightness(0.95);
-                pointer-events: none; /* Let clicks pass through to layer */
-            }}
+def render_interactive_layout(section_id, component_map, initial_order, cache_key=None, titles=None):
+    """
+    客户端悬浮交互布局 (支持 N 个图表轮播，点击左侧/右侧或方向键轮换)
+    首次只下发图表元数据和初始可见的三张卡片；其余卡片转到可见位置时由前端组件请求，
+    服务端按需构建并下发，前端按 token 缓存已收到的图表。
+    cache_key: 数据集指纹与筛选条件，相同时直接复用已序列化的图表
+    """
+    entry = _layout_cache(section_id, cache_key)
+    token = _layout_token(cache_key)
+    order = [key for key in dict.fromkeys(initial_order) if key in component_map]
 
-            /* Right Background Card */
-            .chart-card.pos-right {{
-                opacity: 0.7;
-                width: 45%;
-                height: 650px; /* 大幅增加高度以确保下方数据完全显示 */
-                transform: translateX(10%) scale(0.9) perspective(1000px) rotateY(-15deg); /* 调整水平变换以匹配新的居中方式 */
-                z-index: 10;
-                left: 50%; /* 改为50%以实现精确水平居中 */
-                top: 20px; /* 改为顶部对齐 */
-                filter: brightness(0.95);
-                pointer-events: none;
-            }}
-            
-            /* Hidden Card */
-            .chart-card.hidden {{
-                opacity: 0;
-                transform: translateY(50px) scale(0.8);
-                z-index: 0;
-                pointer-events: none;
-                display: none; /* remove from layout flow entirely if needed */
-            }}
+    # 前端组件上一次发回的请求: {token, request_id, want}
+    request = st.session_state.get(f'{section_id}_carousel')
+    if entry['sent'] is None:
+        # 新的数据集/筛选条件: 下发初始可见的卡片
+        wanted = initial_visible_keys(order)
+        entry['sent'] = 'initial'
+    elif request and request.get('token') == token and request.get('request_id') != entry['sent']:
+        wanted = request.get('want', [])
+        entry['sent'] = request.get('request_id')
+    else:
+        wanted = []
 
-            .plot-container {{
-                width: 100%;
-                height: 100%;
-                padding: 20px;     /* 增加内边距以确保图表标签有足够空间 */
-                box-sizing: border-box;
-                overflow-wrap: break-word;
-                word-break: break-all;
-                max-height: 100%;
-                white-space: normal;
-            }}
+    figures = _build_figures(entry, component_map, wanted)
+    # 构建失败或为空的图表不出现在轮播中
+    order = [key for key in order if entry['figures'].get(key, True) is not None]
 
-            /* 交互层 - 用于捕捉点击 */
-            .nav-area {{
-                position: absolute;
-                top: 0;
-                height: 100%;
-                width: 30%;
-                z-index: 30;
-                cursor: pointer;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                transition: background 0.3s;
-            }}
-            
-            .nav-left {{
-                left: 0;
-            }}
-            
-            .nav-right {{
-                right: 0;
-            }}
-            
-            .nav-area:hover {{
-                background: rgba(0,0,0,0.02);
-            }}
-            
-            /* Chevron Arrows */
-            .arrow {{
-                font-size: 40px;
-                color: rgba(0,0,0,0.2);
-                font-weight: bold;
-                transition: color 0.3s;
-            }}
-            .nav-area:hover .arrow {{
-                color: rgba(59, 130, 246, 0.6);
-            }}
+    _chart_carousel(
+        token=token,
+        plotly_src=PLOTLY_SRC,
+        order=order,
+        titles=titles or {},
+        figures=figures,
+        templates=templates_for(figures),
+        key=f'{section_id}_carousel',
+        default=None
+    )
 
-        </style>
-    </head>
-    <body>
-        <div class="container" id="container">
-            <!-- Navigation Areas -->
-            <div class="nav-area nav-left" id="btnLeft">
-                <div class="arrow">‹</div>
-            </div>
-            <div class="nav-area nav-right" id="btnRight">
-                <div class="arrow">›</div>
-            </div>
-        </div>
 
-        <script>
-            const chartData = {chart_data_js};
-            const orderList = {order_list_js}; // All available keys
-            let activeIndex = 0; 
-            
-            const container = document.getElementById('container');
-            const cardElements = {{}};
-            const plots = {{}};
+SENTIMENT_MAP = {"正面": "positive", "负面": "negative", "中性": "neutral"}
+SENTIMENT_DTYPE = pd.CategoricalDtype(['positive', 'negative', 'neutral'])
+# 情感对应的 (主色, 背景色, 中文名)
+SENTIMENT_STYLES = {
+    'positive': ("#00CC96", "rgba(0, 204, 150, 0.1)", "正面"),
+    'negative': ("#EF553B", "rgba(239, 85, 59, 0.1)", "负面"),
+    'neutral': ("#636EFA", "rgba(99, 110, 250, 0.1)", "中性")
+}
+SEARCH_PAGE_SIZES = [10, 20, 50, 100]
 
-            // Initialize all cards
-            orderList.forEach(key => {{
-                if (!chartData[key]) return;
-                
-                const card = document.createElement('div');
-                card.id = 'card-' + key;
-                card.className = 'chart-card hidden'; 
-                
-                const plotDiv = document.createElement('div');
-                plotDiv.className = 'plot-container';
-                card.appendChild(plotDiv);
-                
-                // Add title overlay if needed, or rely on plotly title
-                
-                container.appendChild(card);
-                cardElements[key] = card;
-                
-                // Render Plotly
-                const spec = chartData[key];
-                const config = {{displayModeBar: false, responsive: true, staticPlot: true}}; 
-                
-                Plotly.newPlot(plotDiv, spec.data, spec.layout, config).then(gd => {{
-                    plots[key] = gd;
-                }});
-            }});
+# 文本分析互动视图的图表顺序与标题 (标题用于卡片加载占位)
+CHART_ORDER = ['pie_chart', 'bar_chart', 'summary_plot', 'cat_count_bar', 'cat_sentiment_bar', 'cat_treemap', 'rating_line', 'sentiment_line', 'monthly_plot', 'word_bar', 'word_treemap', 'sentiment_bar']
+CHART_TITLES = {
+    'pie_chart': '情感分布',
+    'bar_chart': '评分分布',
+    'summary_plot': '情感摘要',
+    'cat_count_bar': '各产品分类评论数量',
+    'cat_sentiment_bar': '各产品分类情感分布',
+    'cat_treemap': '分类统计详情',
+    'rating_line': '月度平均评分',
+    'sentiment_line': '月度正面评论比例',
+    'monthly_plot': '月度综合指标',
+    'word_bar': '高频词汇分布',
+    'word_treemap': '高频词汇',
+    'sentiment_bar': '情感关键词对比'
+}
 
-            function updateLayout() {{
-                const total = orderList.length;
-                if (total === 0) return;
-                
-                // Calculate indices
-                const centerIdx = activeIndex;
-                const leftIdx = (activeIndex - 1 + total) % total;
-                const rightIdx = (activeIndex + 1) % total;
-                
-                const centerKey = orderList[centerIdx];
-                const leftKey = orderList[leftIdx];
-                const rightKey = orderList[rightIdx];
-                
-                // Reset/Assign classes
-                // We iterate all to ensure ones that should be hidden get 'hidden' class
-                orderList.forEach(key => {{
-                    const el = cardElements[key];
-                    if (!el) return;
-                    
-                    // Remove all pos classes first
-                    el.classList.remove('pos-top', 'pos-left', 'pos-right', 'hidden');
-                    
-                    if (key === centerKey) {{
-                        el.classList.add('pos-top');
-                        el.style.display = 'block';
-                    }} else if (key === leftKey) {{
-                        el.classList.add('pos-left');
-                        el.style.display = 'block';
-                    }} else if (key === rightKey) {{
-                        el.classList.add('pos-right');
-                        el.style.display = 'block';
-                    }} else {{
-                        el.classList.add('hidden');
-                        // Optional: delay display:none to allow transition out? 
-                        // For simplicity, we keep display:block but opacity:0 from css
-                        // Actually, 'hidden' class sets display:none or opacity:0
-                    }}
-                }});
-                
-                // Trigger resize for the visible ones to ensure they fit their new container size
-                // (Center is larger than sides)
-                setTimeout(() => {{
-                    [centerKey, leftKey, rightKey].forEach(k => {{
-                        if (plots[k]) Plotly.Plots.resize(plots[k]);
-                    }});
-                }}, 605); // slightly after transition
-            }}
+def set_comment_data(df):
+    """
+    压缩分析数据并保存到 session (同时记录压缩前后的内存占用)
+    """
+    df, report = compact_frame(df)
+    if 'row_hash' not in df.columns:
+        df['row_hash'] = compute_row_hashes(df)
+    
+    if 'date' not in df.columns:
+        # Mock dates (只生成一次，避免每次重绘都重新随机)
+        mock_dates = pd.date_range(start='2023-01-01', periods=len(df), freq='h')
+        mock_dates_list = list(mock_dates)
+        np.random.shuffle(mock_dates_list)
+        df['date'] = mock_dates_list
+    
+    st.session_state['custom_comment_data'] = df
+    st.session_state['memory_report'] = report
+    st.session_state['ca_fingerprint'] = dataset_fingerprint(df)
+    return df
 
-            function moveNext() {{
-                activeIndex = (activeIndex + 1) % orderList.length;
-                updateLayout();
-            }}
-            
-            function movePrev() {{
-                activeIndex = (activeIndex - 1 + orderList.length) % orderList.length;
-                updateLayout();
-            }}
+def get_token_cache(ui_df):
+    """
+    获取分词缓存 (按数据集指纹校验，只对尚未分词的行调用 jieba)
+    缓存保存在 session 中，跨重绘、筛选和页面切换复用。
+    """
+    fingerprint = st.session_state.get('ca_fingerprint')
+    cache_fingerprint, cache = st.session_state.get('ca_token_cache', (None, None))
+    if cache is None:
+        cache = TokenCache()
+    if cache_fingerprint != fingerprint:
+        # 追加数据时旧行全部保留；切换数据集时释放不再使用的行
+        cache.retain(ui_df['row_hash'])
+        cache.add(ui_df['row_hash'], ui_df['comment'])
+        st.session_state['ca_token_cache'] = (fingerprint, cache)
+    return cache
 
-            // Event Listeners
-            document.getElementById('btnRight').addEventListener('click', moveNext);
-            document.getElementById('btnLeft').addEventListener('click', movePrev);
-            
-            // Keyboard nav
-            document.addEventListener('keydown', (e) => {{
-                if (e.key === 'ArrowRight') moveNext();
-                if (e.key === 'ArrowLeft') movePrev();
-            }});
+def get_search_index(ui_df):
+    """
+    获取评论检索索引 (按数据集指纹缓存，首次搜索时基于分词缓存构建)
+    """
+    fingerprint = st.session_state.get('ca_fingerprint')
+    cached = st.session_state.get('ca_search_index')
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, SearchIndex(ui_df, get_token_cache(ui_df)))
+        st.session_state['ca_search_index'] = cached
+    return cached[1]
 
-            // Initial render
-            // Small delay to ensure container is ready
-            setTimeout(updateLayout, 100);
+def get_dataset_aggregates(ui_df):
+    """
+    获取整个数据集的聚合结果 (按数据集指纹缓存，数据不变时不重复计算)
+    """
+    fingerprint = st.session_state.get('ca_fingerprint')
+    cached = st.session_state.get('ca_aggregates')
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, DatasetAggregates.from_frame(ui_df))
+        st.session_state['ca_aggregates'] = cached
+    return cached[1]
 
-        </script>
-    </body>
-    </html>
+def get_doc_term(ui_df):
     """
-    
-    html(html_code, height=820, scrolling=False)  # 增加高度以匹配容器高度800px + 额外空间
+    获取文档-词稀疏矩阵 (按数据集指纹缓存，由分词缓存直接构建，不重新分词)
+    追加数据时只为新增行构建矩阵并拼接到已有矩阵下方
+    """
+    fingerprint = st.session_state.get('ca_fingerprint')
+    cached = st.session_state.get('ca_doc_term')
+    if cached is None or cached[0] != fingerprint:
+        token_cache = get_token_cache(ui_df)
+        if cached is None:
+            doc_term = DocTermMatrix.from_token_cache(token_cache, ui_df['row_hash'], ui_df.index)
+        else:
+            doc_term = cached[1].extend(token_cache, ui_df['row_hash'], ui_df.index)
+        cached = (fingerprint, doc_term)
+        st.session_state['ca_doc_term'] = cached
+    return cached[1]
 
+def build_ui_frame(processed_df):
+    """
+    构造 UI 用的 DF (直接引用原始列，不复制数据)
+    """
+    sentiment = processed_df['sentiment_label'].map(SENTIMENT_MAP).astype(SENTIMENT_DTYPE).fillna('neutral')
+    data = {
+        'id': np.arange(1, len(processed_df) + 1, dtype=np.int32),
+        'comment': processed_df['review_content'],
+        'sentiment': sentiment,
+        'rating': processed_df['rating'],
+        'score': processed_df['sentiment_score'] if 'sentiment_score' in processed_df.columns else np.zeros(len(processed_df), dtype=np.float32),
+        'category': processed_df['product_category'],
+        'solution': processed_df['solution'] if 'solution' in processed_df.columns else None,
+        'date': processed_df['date'],
+        'row_hash': processed_df['row_hash']
+    }
+    return pd.DataFrame(data, index=processed_df.index, copy=False)
 
 def render_sidebar():
     """
@@ -361,26 +298,14 @@ def render_sidebar():
     
     # 1. 数据管理
     with st.sidebar.expander("数据管理", expanded=False):
-        # 定义历史保留文件路径
-        frontend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        data_dir = os.path.join(frontend_dir, 'data')
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-            
-        history_dir = os.path.join(data_dir, 'history')
-        if not os.path.exists(history_dir):
-            os.makedirs(history_dir)
-            
-        history_file_path = os.path.join(data_dir, 'user_upload_history.csv')
-        
         # 自动加载历史
         if 'custom_comment_data' not in st.session_state and not st.session_state.get('data_cleared', False):
-            if os.path.exists(history_file_path):
-                try:
-                    loaded_df = pd.read_csv(history_file_path)
-                    st.session_state['custom_comment_data'] = loaded_df
-                except Exception as e:
-                    print(f"Failed to load history: {e}")
+            try:
+                loaded_df = history_store.load_current()
+                if loaded_df is not None:
+                    set_comment_data(loaded_df)
+            except Exception as e:
+                print(f"Failed to load history: {e}")
 
         if 'uploader_key' not in st.session_state:
             st.session_state['uploader_key'] = 0
@@ -388,10 +313,7 @@ def render_sidebar():
         def reset_data():
             if 'custom_comment_data' in st.session_state:
                 try:
-                    df_to_save = st.session_state['custom_comment_data']
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    history_save_path = os.path.join(history_dir, f"analysis_{timestamp}.csv")
-                    df_to_save.to_csv(history_save_path, index=False)
+                    history_store.archive_snapshot(st.session_state['custom_comment_data'])
                 except Exception as e:
                     print(f"Error archiving history: {e}")
                 del st.session_state['custom_comment_data']
@@ -399,16 +321,19 @@ def render_sidebar():
             if 'viewing_history' in st.session_state:
                 st.session_state['viewing_history'] = False
             
-            if os.path.exists(history_file_path):
-                try:
-                    os.remove(history_file_path)
-                except Exception as e:
-                    print(f"Error removing temp history file: {e}")
+            try:
+                history_store.clear_current()
+            except Exception as e:
+                print(f"Error removing temp history file: {e}")
 
             st.session_state['uploader_key'] += 1
             st.session_state['data_cleared'] = True
             
         st.markdown("#### 上传新数据")
+        append_mode = False
+        if 'custom_comment_data' in st.session_state and not st.session_state.get('viewing_history', False):
+            append_mode = st.checkbox("追加到当前数据集 (跳过已存在的评论)", key="ca_append_mode")
+        
         uploaded_file = st.file_uploader(
             "选择文件 (CSV/XLSX)", 
             type=['csv', 'xlsx'], 
@@ -420,103 +345,100 @@ def render_sidebar():
             if st.button("处理并分析", use_container_width=True):
                 with st.spinner("正在处理数据..."):
                     try:
-                        if uploaded_file.name.endswith('.csv'):
-                            raw_df = pd.read_csv(uploaded_file)
-                        else:
-                            raw_df = pd.read_excel(uploaded_file)
+                        raw_df = read_uploaded_file(uploaded_file)
                         
-                        processed_df = process_uploaded_data(raw_df)
-                        st.session_state['custom_comment_data'] = processed_df
-                        st.session_state['viewing_history'] = False
+                        if append_mode:
+                            # 增量模式: 只处理新增行，并在现有聚合结果上累加
+                            existing_df = st.session_state['custom_comment_data']
+                            aggregates = get_dataset_aggregates(build_ui_frame(existing_df))
+                            combined_df, new_rows = append_uploaded_data(existing_df, raw_df)
+                            if new_rows.empty:
+                                processed_df = None
+                            else:
+                                processed_df = set_comment_data(combined_df)
+                                aggregates.update(build_ui_frame(processed_df.iloc[len(existing_df):]))
+                                st.session_state['ca_aggregates'] = (st.session_state['ca_fingerprint'], aggregates)
+                        else:
+                            processed_df = set_comment_data(process_uploaded_data(raw_df))
                         
-                        try:
-                            processed_df.to_csv(history_file_path, index=False)
-                        except Exception as e:
-                            st.warning(f"无法保存历史记录: {e}")
+                        if processed_df is None:
+                            st.info("没有新增评论，所有行均已存在于当前数据集中。")
+                        else:
+                            st.session_state['viewing_history'] = False
+                            
+                            try:
+                                history_store.save_current(processed_df)
+                            except Exception as e:
+                                st.warning(f"无法保存历史记录: {e}")
 
-                        st.session_state['data_cleared'] = False
-                        st.success("数据处理完成！")
-                        st.rerun()
+                            st.session_state['data_cleared'] = False
+                            st.success("数据处理完成！")
+                            st.rerun()
                     except Exception as e:
                         st.error(f"处理失败: {e}")
         
         if st.button("🗑️ 重置所有数据", on_click=reset_data, use_container_width=True):
             pass
+        
+        memory_report = st.session_state.get('memory_report')
+        if memory_report and 'custom_comment_data' in st.session_state:
+            st.caption(
+                f"会话内存: {memory_report['before'] / 1024**2:.2f} MB → "
+                f"{memory_report['after'] / 1024**2:.2f} MB"
+            )
             
-    # 2. 历史记录
-    if os.path.exists(history_dir):
-        history_files = [f for f in os.listdir(history_dir) if f.endswith('.csv')]
-        if history_files:
-            with st.sidebar.expander("历史记录", expanded=False):
-                if st.button("清空历史", key="clear_all_history", use_container_width=True):
-                    for f in history_files:
-                        try:
-                            os.remove(os.path.join(history_dir, f))
-                        except Exception as e:
-                            print(f"Failed to delete {f}: {e}")
-                    if st.session_state.get('viewing_history', False):
-                        if 'custom_comment_data' in st.session_state:
-                            del st.session_state['custom_comment_data']
-                        st.session_state['viewing_history'] = False
-                        st.session_state['data_cleared'] = True
-                    st.success("历史记录已清空")
-                    st.rerun()
+    # 2. 历史记录 (仅读取 manifest，不解析快照内容)
+    snapshots = history_store.list_snapshots()
+    if snapshots:
+        with st.sidebar.expander("历史记录", expanded=False):
+            if st.button("清空历史", key="clear_all_history", use_container_width=True):
+                history_store.clear_snapshots()
+                if st.session_state.get('viewing_history', False):
+                    if 'custom_comment_data' in st.session_state:
+                        del st.session_state['custom_comment_data']
+                    st.session_state['viewing_history'] = False
+                    st.session_state['data_cleared'] = True
+                st.success("历史记录已清空")
+                st.rerun()
 
-                history_files.sort(reverse=True)
-                for f in history_files:
-                    try:
-                        ts_part = f.replace("analysis_", "").replace(".csv", "")
-                        dt = datetime.datetime.strptime(ts_part, "%Y%m%d_%H%M%S")
-                        display_time = dt.strftime("%Y-%m-%d %H:%M")
-                        
-                        if st.button(f"{display_time}", key=f"hist_{f}", use_container_width=True):
-                            st.session_state.ai_assistant_open = False # 防止AI助手自动弹出
-                            with st.spinner(f"加载 {display_time}..."):
-                                try:
-                                    loaded_df = pd.read_csv(os.path.join(history_dir, f))
-                                    st.session_state['custom_comment_data'] = loaded_df
-                                    # 不要覆盖当前的工作数据，否则退出历史查看后无法找回
-                                    # loaded_df.to_csv(history_file_path, index=False) 
-                                    st.session_state['data_cleared'] = False
-                                    st.session_state['viewing_history'] = True
-                                    st.rerun()
-                                except Exception as load_err:
-                                    st.error(f"加载失败: {load_err}")
-                    except:
-                        continue
+            sentiment_order = ["正面", "负面", "中性"]
+            for snapshot_id, entry in snapshots:
+                try:
+                    dt = datetime.datetime.fromisoformat(entry["created"])
+                    display_time = dt.strftime("%Y-%m-%d %H:%M")
+                    distribution = entry.get("sentiment_distribution", {})
+                    dist_text = " / ".join(f"{k} {distribution[k]}" for k in sentiment_order if k in distribution)
+                    avg_rating = entry.get("avg_rating")
+                    help_text = f"{entry['rows']:,} 条评论"
+                    if avg_rating is not None:
+                        help_text += f" | 平均评分 {avg_rating:.2f}"
+                    if dist_text:
+                        help_text += f" | {dist_text}"
+                    
+                    if st.button(f"{display_time} ({entry['rows']:,}条)", key=f"hist_{snapshot_id}", help=help_text, use_container_width=True):
+                        st.session_state.ai_assistant_open = False # 防止AI助手自动弹出
+                        with st.spinner(f"加载 {display_time}..."):
+                            try:
+                                set_comment_data(history_store.load_snapshot(snapshot_id))
+                                # 不要覆盖当前的工作数据，否则退出历史查看后无法找回
+                                st.session_state['data_cleared'] = False
+                                st.session_state['viewing_history'] = True
+                                st.rerun()
+                            except Exception as load_err:
+                                st.error(f"加载失败: {load_err}")
+                except Exception:
+                    continue
 
     # 3. 数据准备 (Dataframe Construction)
     df = None
     if 'custom_comment_data' in st.session_state:
-        processed_df = st.session_state['custom_comment_data']
-        sentiment_map = {"正面": "positive", "负面": "negative", "中性": "neutral"}
-        
-        # 构造 UI 用的 DF
-        data = {
-            'id': range(1, len(processed_df) + 1),
-            'comment': processed_df['review_content'],
-            'sentiment': processed_df['sentiment_label'].map(sentiment_map).fillna('neutral'),
-            'rating': processed_df['rating'],
-            'category': processed_df['product_category'],
-            'solution': processed_df.get('solution', [None]*len(processed_df))
-        }
-        
-        # Date 处理
-        if 'date' in processed_df.columns:
-             data['date'] = pd.to_datetime(processed_df['date'])
-        else:
-             # Mock dates
-             mock_dates = pd.date_range(start='2023-01-01', periods=len(processed_df), freq='H')
-             if len(mock_dates) < len(processed_df):
-                 mock_dates = np.random.choice(mock_dates, len(processed_df))
-             mock_dates_list = list(mock_dates)
-             np.random.shuffle(mock_dates_list)
-             data['date'] = mock_dates_list
-             
-        df = pd.DataFrame(data)
+        df = build_ui_frame(st.session_state['custom_comment_data'])
+        get_doc_term(df)
     
     # 4. 筛选器
     filtered_df = None
+    cube = None
+    filter_state = None
     if df is not None:
         with st.sidebar.expander("数据筛选", expanded=True):
             st.caption("情感类型")
@@ -544,146 +466,33 @@ def render_sidebar():
                 label_visibility="collapsed"
             )
             
-            # Apply
-            filtered_df = df[
+            # Apply (全选时直接复用视图，避免复制)
+            mask = (
                 (df['sentiment'].isin(sentiment_filter)) &
                 (df['rating'].between(rating_filter[0], rating_filter[1])) &
                 (df['category'].isin(category_filter))
-            ].copy()
+            )
+            filtered_df = df if mask.all() else df[mask]
+        
+        # 图表统一从聚合立方体切片得到；关键词统计由文档-词矩阵按行集合求和
+        filter_state = (tuple(sorted(map(str, sentiment_filter))), tuple(rating_filter), tuple(sorted(map(str, category_filter))))
+        cube = get_dataset_aggregates(df).cube.slice(sentiment_filter, rating_filter, category_filter)
             
     # Save to session (vital for show_comment_analysis)
     st.session_state['ca_filtered_df'] = filtered_df
+    st.session_state['ca_cube'] = cube
+    st.session_state['ca_filter_state'] = filter_state
     return filtered_df
 
 
-def show_comment_analysis(backend_url=None):
+def build_chart_map(filtered_df, cube, doc_term):
     """
-    显示评论分析页面 (内容区域)
+    构造文本分析视图的图表回调 {图表key: 返回 Plotly Figure 的函数}
+    cube: 筛选后的聚合立方体; doc_term: 整个数据集的文档-词矩阵
     """
-    render_header("评论分析", "深度挖掘用户评论中的情感与观点")
-    
-    # 检查是否处于"查看历史"模式
-    is_viewing_history = st.session_state.get('viewing_history', False)
-    
-    if is_viewing_history:
-        if st.button("🔙 退出历史查看", type="primary"):
-            if 'custom_comment_data' in st.session_state:
-                del st.session_state['custom_comment_data']
-            st.session_state['viewing_history'] = False
-            # 设置为 False 以便 render_sidebar 中的自动加载逻辑生效，重新加载 default history file
-            st.session_state['data_cleared'] = False
-            st.rerun()
-
-    # 从 Session State 获取筛选后的数据
-    filtered_df = st.session_state.get('ca_filtered_df', None)
-    
-    if filtered_df is None:
-        st.info("👋 欢迎使用评论分析！\n\n请在左侧侧边栏上传您的 CSV/XLSX 评论数据文件以开始分析。")
-        return
-    
-    # 显示数据概览
-    st.markdown("### 数据概览")
-    
-    # 添加简洁居中样式
-    st.markdown("""
-    <style>
-    .dashboard-container {
-        display: grid;
-        grid-template-columns: repeat(4, 1fr);
-        gap: 1rem;
-        margin-bottom: 2rem;
-    }
-    
-    .dashboard-card {
-        background: white;
-        border: 1px solid #e5e7eb;
-        border-radius: 8px;
-        padding: 2rem 1rem;
-        text-align: center;
-        color: #1f2937;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-        transition: all 0.3s ease;
-        min-height: 140px;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-        align-items: center;
-    }
-    
-    .dashboard-card:hover {
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        border-color: #3b82f6;
-    }
-    
-    .card-number {
-        font-size: 2rem;
-        font-weight: 600;
-        margin-bottom: 0.5rem;
-        color: #1f2937;
-    }
-    
-    .card-label {
-        font-size: 0.9rem;
-        font-weight: 500;
-        color: #6b7280;
-    }
-    
-    /* 动画效果 */
-    @keyframes fadeInUp {
-        from {
-            opacity: 0;
-            transform: translateY(20px);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .dashboard-card {
-        animation: fadeInUp 0.4s ease-out;
-    }
-    
-    .dashboard-card:nth-child(1) { animation-delay: 0.1s; }
-    .dashboard-card:nth-child(2) { animation-delay: 0.2s; }
-    .dashboard-card:nth-child(3) { animation-delay: 0.3s; }
-    .dashboard-card:nth-child(4) { animation-delay: 0.4s; }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    # 计算数据
-    total_comments = len(filtered_df)
-    avg_rating = filtered_df['rating'].mean()
-    positive_pct = (filtered_df['sentiment'] == 'positive').sum() / len(filtered_df) * 100
-    negative_pct = (filtered_df['sentiment'] == 'negative').sum() / len(filtered_df) * 100
-    
-    # 创建简洁的仪表盘卡片
-    st.markdown(f"""
-    <div class="dashboard-container">
-        <div class="dashboard-card">
-            <div class="card-number">{total_comments:,}</div>
-            <div class="card-label">总评论数</div>
-        </div>
-        <div class="dashboard-card">
-            <div class="card-number">{avg_rating:.2f}</div>
-            <div class="card-label">平均评分</div>
-        </div>
-        <div class="dashboard-card">
-            <div class="card-number">{positive_pct:.1f}%</div>
-            <div class="card-label">正面评论比例</div>
-        </div>
-        <div class="dashboard-card">
-            <div class="card-number">{negative_pct:.1f}%</div>
-            <div class="card-label">负面评论比例</div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    
-    # 新增：定义各个图表的渲染函数
     def render_sentiment_pie():
-        sentiment_counts = filtered_df['sentiment'].value_counts().reset_index()
+        sentiment_counts = cube.counts('sentiment').sort_values(ascending=False)
+        sentiment_counts = sentiment_counts.reset_index()
         sentiment_counts.columns = ['sentiment', 'count']
         
         fig_pie = px.pie(
@@ -733,7 +542,7 @@ def show_comment_analysis(backend_url=None):
 
     def render_rating_bar():
         # 评分分布：使用更鲜艳的颜色，避免 Viridis 默认的深紫色/黑色
-        rating_counts = filtered_df['rating'].value_counts().sort_index()
+        rating_counts = cube.counts('rating').sort_index()
         fig_bar = px.bar(
             x=rating_counts.index,
             y=rating_counts.values,
@@ -748,10 +557,8 @@ def show_comment_analysis(backend_url=None):
         return fig_bar
     
     def render_sentiment_summary_bubble():
-        sentiment_summary = filtered_df.groupby('sentiment').agg({
-            'rating': 'mean',
-            'id': 'count'
-        }).rename(columns={'rating': '平均评分', 'id': '评论数'}).reset_index()
+        sentiment_summary = cube.by('sentiment')[['sentiment', 'avg_rating', 'count']].rename(
+            columns={'avg_rating': '平均评分', 'count': '评论数'})
         
         fig = px.scatter(
             sentiment_summary,
@@ -780,7 +587,7 @@ def show_comment_analysis(backend_url=None):
     
     # 类别分析定义
     def render_category_count_bar():
-        category_counts = filtered_df['category'].value_counts()
+        category_counts = cube.counts('category').sort_values(ascending=False)
         fig_cat_count = px.bar(
             x=category_counts.index,
             y=category_counts.values,
@@ -793,12 +600,7 @@ def show_comment_analysis(backend_url=None):
         return fig_cat_count
 
     def render_category_sentiment_bar():
-        category_sentiment = filtered_df.groupby(['category', 'sentiment']).size().unstack().fillna(0)
-        cat_sentiment_long = category_sentiment.reset_index().melt(
-            id_vars='category',
-            var_name='sentiment',
-            value_name='count'
-        )
+        cat_sentiment_long = cube.by(['category', 'sentiment'])[['category', 'sentiment', 'count']]
         color_map = {'positive': '#00CC96', 'negative': '#EF553B', 'neutral': '#636EFA'}
         fig_cat_sentiment = px.bar(
             cat_sentiment_long,
@@ -826,10 +628,9 @@ def show_comment_analysis(backend_url=None):
         return fig_cat_sentiment
 
     def render_category_treemap():
-        cat_summary = filtered_df.groupby('category').agg({
-            'rating': 'mean',
-            'id': 'count'
-        }).rename(columns={'rating': '平均评分', 'id': '评论总数'}).reset_index()
+        cat_summary = cube.by('category')[['category', 'avg_rating', 'count']].rename(
+            columns={'avg_rating': '平均评分', 'count': '评论总数'})
+        cat_summary['category'] = cat_summary['category'].astype(object)
         
         fig = px.treemap(
             cat_summary,
@@ -854,19 +655,19 @@ def show_comment_analysis(backend_url=None):
         return fig
 
     
+    # 图表依赖的中间数据按需计算 (布局缓存命中时完全跳过)
+    lazy_data = {}
+
     # 时间趋势分析定义
     # 按月份聚合数据 (预处理)
-    filtered_df['month'] = filtered_df['date'].dt.to_period('M')
-    monthly_data = filtered_df.groupby('month').agg({
-        'rating': 'mean',
-        'sentiment': lambda x: (x == 'positive').sum() / len(x) * 100,
-        'id': 'count'
-    }).reset_index().rename(columns={'id': 'count'})
-    monthly_data['month'] = monthly_data['month'].dt.to_timestamp()
+    def get_monthly_data():
+        if 'monthly' not in lazy_data:
+            lazy_data['monthly'] = cube.monthly_trend()
+        return lazy_data['monthly']
 
     def render_rating_trend_line():
         fig_rating_trend = px.line(
-            monthly_data,
+            get_monthly_data(),
             x='month',
             y='rating',
             title="月度平均评分",
@@ -880,7 +681,7 @@ def show_comment_analysis(backend_url=None):
         
     def render_sentiment_trend_line():
         fig_sentiment_trend = px.line(
-            monthly_data,
+            get_monthly_data(),
             x='month',
             y='sentiment',
             title="月度正面评论比例(%)",
@@ -894,7 +695,7 @@ def show_comment_analysis(backend_url=None):
 
 
     def render_monthly_kpi_card():
-        display_monthly = monthly_data.copy()
+        display_monthly = get_monthly_data().copy()
         display_monthly['month_str'] = display_monthly['month'].dt.strftime('%Y-%m')
         
         fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.1)
@@ -908,70 +709,28 @@ def show_comment_analysis(backend_url=None):
 
 
     # 高频词分析定义
-    
-    # 文本处理逻辑 (保留原函数逻辑)
-    def process_text(text):
-        if not isinstance(text, str):
-            return []
-        stop_words = {
-            '我', '你', '他', '仅', 'i', 'you', 'also', 'be', 'after',
-            '的', '了', '在', '是', '有', '和', '就', '不', '人', '都', 
-            '一', '一个', '上', '也', '很', '到', '说', '要', '去', '会', 
-            '着', '没有', '看', '好', '自己', '这', '非常', '感觉', '觉得', 
-            '比较', '这个', '那个', '我们', '你们', '他们', '它', '只是', '但是',
-            'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 
-            'to', 'of', 'in', 'on', 'at', 'for', 'with', 'it', 'this', 'that', 
-            'my', 'your', 'his', 'her', 'its', 'we', 'they', 'have', 'has', 'had', 
-            'do', 'does', 'did', 'can', 'could', 'will', 'would', 'should', 'not', 
-            'no', 'yes', 'so', 'as', 'if', 'when', 'where', 'why', 'how', 'all', 
-            'any', 'some', 'very', 'good', 'bad', 'great', 'product', 'use', 'one', 
-            'just', 'get', 'from', 'out', 'up', 'down', 'about', 'than', 'then', 
-            'now', 'only', 'well', 'much', 'more', 'other', 'which', 'what', 
-            'who', 'whom', 'whose', 'cable', 'charging', 'phone',
-            'been', 'being', 'am', 'before', 'by', 'into', 'during', 'until', 
-            'against', 'among', 'through', 'over', 'between', 'since', 'without', 
-            'under', 'within', 'along', 'across', 'behind', 'beyond', 'around', 
-            'above', 'near', 'off', 'go', 'going', 'gone', 'went', 'make', 'made', 
-            'making', 'know', 'take', 'see', 'come', 'think', 'look', 'want', 
-            'give', 'used', 'using', 'find', 'tell', 'ask', 'work', 'worked', 
-            'working', 'seem', 'feel', 'try', 'leave', 'call', 'he', 'him', 'she', 
-            'us', 'our', 'them', 'their', 'these', 'those', 'even', 'still', 'way', 
-            'too', 'really', 'usb', 'type', 'fast', 'data', 'sync', 'compatible'
-        }
-        words = jieba.cut(text)
-        result = []
-        for word in words:
-            word = word.strip().lower()
-            if len(word) > 1 and word not in stop_words and not word.isdigit() and not re.match(r'^[^\w\s]+$', word):
-                result.append(word)
-        return result
-    
-    # 预先计算词频
-    all_words = []
-    for comment in filtered_df['comment']:
-        all_words.extend(process_text(comment))
-    word_counts = Counter(all_words)
-    top_words = word_counts.most_common(20)
-    top_words_df = pd.DataFrame(top_words, columns=['词汇', '频次'])
-    
-    # 预先计算情感关键词
-    positive_comments = filtered_df[filtered_df['sentiment'] == 'positive']['comment']
-    positive_words = []
-    for comment in positive_comments:
-        unique_words = set(process_text(comment))
-        positive_words.extend(unique_words)
-    positive_word_counts = Counter(positive_words).most_common(10)
-    positive_words_df = pd.DataFrame(positive_word_counts, columns=['词汇', '频次'])
-
-    negative_comments = filtered_df[filtered_df['sentiment'] == 'negative']['comment']
-    negative_words = []
-    for comment in negative_comments:
-        unique_words = set(process_text(comment))
-        negative_words.extend(unique_words)
-    negative_word_counts = Counter(negative_words).most_common(10)
-    negative_words_df = pd.DataFrame(negative_word_counts, columns=['词汇', '频次'])
+    def get_word_data():
+        """返回 (高频词, 正面关键词, 负面关键词) 三个 DataFrame"""
+        if 'words' in lazy_data:
+            return lazy_data['words']
+        # 未筛选时使用缓存的整体词频
+        labels = None if len(filtered_df) == doc_term.shape[0] else filtered_df.index
+        top_words = doc_term.most_common(20, labels)
+        
+        # 情感关键词 (每条评论只计一次)
+        sentiment = filtered_df['sentiment'].to_numpy()
+        positive_word_counts = doc_term.most_common(10, filtered_df.index[sentiment == 'positive'], unique_per_row=True)
+        negative_word_counts = doc_term.most_common(10, filtered_df.index[sentiment == 'negative'], unique_per_row=True)
+        
+        lazy_data['words'] = (
+            pd.DataFrame(top_words, columns=['词汇', '频次']),
+            pd.DataFrame(positive_word_counts, columns=['词汇', '频次']),
+            pd.DataFrame(negative_word_counts, columns=['词汇', '频次'])
+        )
+        return lazy_data['words']
 
     def render_word_freq_bar():
+        top_words_df = get_word_data()[0]
         if not top_words_df.empty:
             fig_words = px.bar(
                 top_words_df,
@@ -989,6 +748,7 @@ def show_comment_analysis(backend_url=None):
 
     def render_sentiment_butterfly():
         # Top 10 Pos vs Top 10 Neg
+        _, positive_words_df, negative_words_df = get_word_data()
         pos = positive_words_df.copy()
         pos['Type'] = '正面'
         neg = negative_words_df.copy()
@@ -1022,6 +782,7 @@ def show_comment_analysis(backend_url=None):
         return fig
 
     def render_top_words_treemap():
+        top_words_df = get_word_data()[0]
         if not top_words_df.empty:
             fig = px.treemap(
                 top_words_df,
@@ -1047,62 +808,216 @@ def show_comment_analysis(backend_url=None):
         else:
             return None
 
+    return {
+        'pie_chart': render_sentiment_pie,
+        'bar_chart': render_rating_bar,
+        'summary_plot': render_sentiment_summary_bubble,
+        'cat_count_bar': render_category_count_bar,
+        'cat_sentiment_bar': render_category_sentiment_bar,
+        'cat_treemap': render_category_treemap,
+        'rating_line': render_rating_trend_line,
+        'sentiment_line': render_sentiment_trend_line,
+        'monthly_plot': render_monthly_kpi_card,
+        'word_bar': render_word_freq_bar,
+        'word_treemap': render_top_words_treemap,
+        'sentiment_bar': render_sentiment_butterfly
+    }
+
+
+def show_comment_analysis(backend_url=None):
+    """
+    显示评论分析页面 (内容区域)
+    """
+    render_header("评论分析", "深度挖掘用户评论中的情感与观点")
+    
+    # 检查是否处于"查看历史"模式
+    is_viewing_history = st.session_state.get('viewing_history', False)
+    
+    if is_viewing_history:
+        if st.button("🔙 退出历史查看", type="primary"):
+            if 'custom_comment_data' in st.session_state:
+                del st.session_state['custom_comment_data']
+            st.session_state['viewing_history'] = False
+            # 设置为 False 以便 render_sidebar 中的自动加载逻辑生效，重新加载 default history file
+            st.session_state['data_cleared'] = False
+            st.rerun()
+
+    # 从 Session State 获取筛选后的数据
+    filtered_df = st.session_state.get('ca_filtered_df', None)
+    
+    if filtered_df is None:
+        st.info("👋 欢迎使用评论分析！\n\n请在左侧侧边栏上传您的 CSV/XLSX 评论数据文件以开始分析。")
+        return
+    
+    # 显示数据概览
+    st.markdown("### 数据概览")
+    
+    # 添加简洁居中样式
+    st.markdown("""
+    <style>
+    .dashboard-container {
+        display: grid;
+        grid-template-columns: repeat(4, 1fr);
+        gap: 1rem;
+        margin-bottom: 2rem;
+    }
+    
+    .dashboard-card {
+        background: white;
+        border: 1px solid #e5e7eb;
+        border-radius: 8px;
+        padding: 2rem 1rem;
+        text-align: center;
+        color: #1f2937;
+        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
+        transition: all 0.3s ease;
+        min-height: 140px;
+        display: flex;
+        flex-direction: column;
+        justify-content: center;
+        align-items: center;
+    }
+    
+    .dashboard-card:hover {
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        border-color: #3b82f6;
+    }
+    
+    .card-number {
+        font-size: 2rem;
+        font-weight: 600;
+        margin-bottom: 0.5rem;
+        color: #1f2937;
+    }
+    
+    .card-label {
+        font-size: 0.9rem;
+        font-weight: 500;
+        color: #6b7280;
+    }
+    
+    /* 动画效果 */
+    @keyframes fadeInUp {
+        from {
+            opacity: 0;
+            transform: translateY(20px);
+        }
+        to {
+            opacity: 1;
+            transform: translateY(0);
+        }
+    }
+    
+    .dashboard-card {
+        animation: fadeInUp 0.4s ease-out;
+    }
+    
+    .dashboard-card:nth-child(1) { animation-delay: 0.1s; }
+    .dashboard-card:nth-child(2) { animation-delay: 0.2s; }
+    .dashboard-card:nth-child(3) { animation-delay: 0.3s; }
+    .dashboard-card:nth-child(4) { animation-delay: 0.4s; }
+    </style>
+    """, unsafe_allow_html=True)
+    
+    # 图表和指标均由聚合立方体回答 (耗时与评论行数无关)；关键词由文档-词矩阵统计
+    cube = st.session_state['ca_cube']
+    
+    # 计算数据
+    total_comments = cube.total
+    avg_rating = cube.avg_rating()
+    positive_pct = cube.share('positive')
+    negative_pct = cube.share('negative')
+    
+    # 创建简洁的仪表盘卡片
+    st.markdown(f"""
+    <div class="dashboard-container">
+        <div class="dashboard-card">
+            <div class="card-number">{total_comments:,}</div>
+            <div class="card-label">总评论数</div>
+        </div>
+        <div class="dashboard-card">
+            <div class="card-number">{avg_rating:.2f}</div>
+            <div class="card-label">平均评分</div>
+        </div>
+        <div class="dashboard-card">
+            <div class="card-number">{positive_pct:.1f}%</div>
+            <div class="card-label">正面评论比例</div>
+        </div>
+        <div class="dashboard-card">
+            <div class="card-number">{negative_pct:.1f}%</div>
+            <div class="card-label">负面评论比例</div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    
 # ---------------- 评论搜索与智能应对 ----------------
     st.markdown('<div class="css-card">', unsafe_allow_html=True)
     st.markdown("### 评论搜索与智能应对")
     
     col_search, col_action = st.columns([4, 1])
     with col_search:
-        search_keyword = st.text_input("输入关键词搜索评论...", placeholder="输入关键词搜索评论，例如：正面、负面、中性...", key="comment_search_input", label_visibility="collapsed")
+        search_keyword = st.text_input("输入关键词搜索评论...", placeholder="输入关键词搜索评论，例如：负面、电池 -退货、充电 OR 电池、\"fast charging\"、情感:负面 分类:Cable", key="comment_search_input", label_visibility="collapsed")
     with col_action:
         do_search = st.button("搜索", use_container_width=True)
         
     if search_keyword:
-        # Enhanced Filter Logic: Support Sentiment Keywords
-        sentiment_map_search = {
-             '正面': 'positive', 'positive': 'positive',
-             '负面': 'negative', 'negative': 'negative',
-             '中性': 'neutral', '中立': 'neutral', 'neutral': 'neutral'
-        }
-        
-        lower_keyword = search_keyword.strip().lower()
-        search_target_sentiment = sentiment_map_search.get(lower_keyword)
-        
-        if search_target_sentiment:
-             search_results = filtered_df[filtered_df['sentiment'] == search_target_sentiment]
-             match_msg = f"情感为 '{search_keyword}'"
+        # 倒排索引检索: 支持 AND/OR/NOT、短语、情感/分类约束，按 BM25 排序
+        query = parse_query(search_keyword)
+        if query.terms() or query.excluded:
+            match_msg = f"匹配 '{search_keyword}'"
         else:
-             search_results = filtered_df[filtered_df['comment'].str.contains(search_keyword, case=False, na=False)]
-             match_msg = f"包含 '{search_keyword}'"
+            match_msg = f"满足条件 '{search_keyword}'"
         
-        if not search_results.empty:
-            st.success(f"找到 {len(search_results)} 条{match_msg}的评论")
+        search_index = get_search_index(build_ui_frame(st.session_state['custom_comment_data']))
+        doc_mask = None if len(filtered_df) == search_index.n_docs else search_index.mask_for(filtered_df.index)
+        result_labels, _ = search_index.search(query, doc_mask=doc_mask)
+        total_hits = len(result_labels)
+        
+        if total_hits:
+            st.success(f"找到 {total_hits} 条{match_msg}的评论 (按相关度排序)")
+            
+            # 服务端分页: 只物化和渲染当前页，查询或过滤条件变化时回到第一页
+            col_size, col_page, col_info = st.columns([1, 1, 2])
+            with col_size:
+                page_size = st.selectbox("每页条数", SEARCH_PAGE_SIZES, index=1, key="ca_search_page_size")
+            total_pages = max(1, -(-total_hits // page_size))
+            search_state = (search_keyword, total_hits, page_size)
+            if st.session_state.get('ca_search_state') != search_state:
+                st.session_state['ca_search_state'] = search_state
+                st.session_state['ca_search_page'] = 1
+            with col_page:
+                page = st.number_input("页码", min_value=1, max_value=total_pages, step=1, key="ca_search_page")
+            page_start = (int(page) - 1) * page_size
+            page_end = min(page_start + page_size, total_hits)
+            with col_info:
+                st.caption(f"第 {page} / {total_pages} 页，显示第 {page_start + 1}-{page_end} 条，共 {total_hits} 条")
             
-            # 使用 container(height=...) 创建可滚动的列表视图
-            # 设置合适的高度以展示约 10 条数据 (假设每条约 100px)
+            # 只取当前页的行 (命中很多时不物化全部结果)
+            page_df = filtered_df.loc[result_labels[page_start:page_end]]
             search_container = st.container(height=600, border=True)
             
             with search_container:
-                # Iterate all results (Container handles scrolling)
-                for idx, row in search_results.iterrows():
-                    # Emotion color
-                    sentiment_color = "#00CC96" if row['sentiment'] == 'positive' else "#EF553B" if row['sentiment'] == 'negative' else "#636EFA"
-                    sentiment_bg = "rgba(0, 204, 150, 0.1)" if row['sentiment'] == 'positive' else "rgba(239, 85, 59, 0.1)" if row['sentiment'] == 'negative' else "rgba(99, 110, 250, 0.1)"
-                    sentiment_cn = "正面" if row['sentiment'] == 'positive' else "负面" if row['sentiment'] == 'negative' else "中性"
+                # 按列取出当前页数据，避免 iterrows 逐行构造 Series
+                for idx, comment, sentiment, category, rating in zip(
+                        page_df.index, page_df['comment'].to_numpy(), page_df['sentiment'].to_numpy(),
+                        page_df['category'].to_numpy(), page_df['rating'].to_numpy()):
+                    sentiment_color, sentiment_bg, sentiment_cn = SENTIMENT_STYLES.get(sentiment, SENTIMENT_STYLES['neutral'])
                     
                     with st.container():
                         st.markdown(f"""
                         <div style="background-color: {sentiment_bg}; padding: 12px; border-radius: 8px; margin-bottom: 12px; border-left: 5px solid {sentiment_color};">
                             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 6px;">
                                 <span style="font-weight: bold; font-size: 0.9em; color: {sentiment_color}; background: white; padding: 2px 8px; border-radius: 4px;">{sentiment_cn}</span>
-                                <span style="font-size: 0.85em; color: #666;">分类: {row['category']} | 评分: {row['rating']}</span>
+                                <span style="font-size: 0.85em; color: #666;">分类: {category} | 评分: {rating}</span>
                             </div>
-                            <div style="font-size: 1em; color: #333; line-height: 1.5;">{row['comment']}</div>
+                            <div style="font-size: 1em; color: #333; line-height: 1.5;">{comment}</div>
                         </div>
                         """, unsafe_allow_html=True)
                         
                         # AI Suggestion (Only for Negative)
-                        if row['sentiment'] == 'negative':
+                        if sentiment == 'negative':
                             if st.button(f"🤖 生成智能应对建议", key=f"ai_sugg_{idx}"):
                                 if QwenModel:
                                     with st.spinner("AI 正在分析并生成应对策略..."):
@@ -1110,7 +1025,7 @@ def show_comment_analysis(backend_url=None):
                                             api_key = os.getenv("DASHSCOPE_API_KEY")
                                             if api_key:
                                                 model = QwenModel(api_key=api_key)
-                                                prompt = f"针对以下电商评论生成具体的应对措施和回复建议。评论：'{row['comment']}'。分类：{row['category']}。情感：{sentiment_cn}。请给出：1.潜在问题分析 2.建议回复话术 3.改进措施。"
+                                                prompt = f"针对以下电商评论生成具体的应对措施和回复建议。评论：'{comment}'。分类：{category}。情感：{sentiment_cn}。请给出：1.潜在问题分析 2.建议回复话术 3.改进措施。"
                                                 response = model.predict(prompt)
                                                 if response.get("status") == "success":
                                                     st.info(response.get("text"))
@@ -1125,7 +1040,7 @@ def show_comment_analysis(backend_url=None):
                         
                         st.markdown("---") # Separator
         else:
-            st.warning(f"未找到包含 '{search_keyword}' 的评论")
+            st.warning(f"未找到{match_msg}的评论")
             
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -1135,20 +1050,9 @@ def show_comment_analysis(backend_url=None):
 
     render_interactive_layout(
         section_id="keyword_analysis",
-        component_map={
-            'pie_chart': render_sentiment_pie,
-            'bar_chart': render_rating_bar,
-            'summary_plot': render_sentiment_summary_bubble,
-            'cat_count_bar': render_category_count_bar,
-            'cat_sentiment_bar': render_category_sentiment_bar,
-            'cat_treemap': render_category_treemap,
-            'rating_line': render_rating_trend_line,
-            'sentiment_line': render_sentiment_trend_line,
-            'monthly_plot': render_monthly_kpi_card,
-            'word_bar': render_word_freq_bar,
-            'word_treemap': render_top_words_treemap,
-            'sentiment_bar': render_sentiment_butterfly
-        },
-        initial_order=['pie_chart', 'bar_chart', 'summary_plot', 'cat_count_bar', 'cat_sentiment_bar', 'cat_treemap' ,'summary_plot', 'cat_count_bar', 'cat_sentiment_bar', 'cat_treemap', 'rating_line', 'sentiment_line', 'monthly_plot', 'word_bar', 'word_treemap', 'sentiment_bar']
+        component_map=build_chart_map(filtered_df, cube, st.session_state['ca_doc_term'][1]),
+        initial_order=CHART_ORDER,
+        cache_key=(st.session_state.get('ca_fingerprint'), st.session_state.get('ca_filter_state')),
+        titles=CHART_TITLES
     )
     st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
@@ -1,5 +1,8 @@
 import streamlit as st
 import requests
+import json
+import time
+import hashlib
 from PIL import Image
 import io
 import sys
@@ -11,11 +14,99 @@ utils_dir = os.path.join(os.path.dirname(current_dir), 'utils')
 if utils_dir not in sys.path:
     sys.path.append(utils_dir)
 
+# 图像预处理与后端模型共用同一策略 (models/image/image_utils.py)
+image_model_dir = os.path.join(os.path.dirname(current_dir), 'models', 'image')
+if image_model_dir not in sys.path:
+    sys.path.append(image_model_dir)
+
 try:
     from layout import render_header
 except ImportError:
     def render_header(title, subtitle=None): st.title(title)
 
+try:
+    from image_utils import normalize_image
+except ImportError:
+    normalize_image = None
+
+# 每个上传文件的分析结果按文件哈希缓存 (分析 / OCR 按钮共用)，最多保留的文件数
+RESULT_CACHE_SIZE = 16
+# 按钮 -> 未命中缓存时请求的任务: 完整分析的提示词本身包含文字提取，OCR 只请求文字
+REQUEST_TASKS = {"analysis": ["analysis", "ocr"], "ocr": ["ocr"]}
+
+# 批量分析: 结果网格列数、请求的并发数 (服务端另有上限)
+BATCH_GRID_COLUMNS = 4
+BATCH_CONCURRENCY = 4
+# (连接超时, 读取超时): 流式结果逐行到达，读取超时按单张图像计
+BATCH_TIMEOUT = (3, 300)
+
+def _normalize_upload(name, data, mime_type):
+    """按策略缩小并重新编码图像，返回 (文件名, 图像字节, MIME 类型, 统计信息)"""
+    if normalize_image is None:
+        return (name, data, mime_type, None)
+    try:
+        image_bytes, stats = normalize_image(data)
+        if image_bytes is not data:
+            return (os.path.splitext(name)[0] + ".jpg", image_bytes, "image/jpeg", stats)
+        return (name, data, mime_type, stats)
+    except Exception as e:
+        print(f"Image preprocessing failed, uploading original: {e}")
+        return (name, data, mime_type, None)
+
+def prepare_upload(uploaded_file):
+    """
+    上传前按策略缩小并重新编码图像 (缓存在 session 中，同一文件只处理一次)
+    返回 (文件名, 图像字节, MIME 类型, 统计信息)
+    """
+    data = uploaded_file.getvalue()
+    cache_key = (uploaded_file.name, len(data), hash(data))
+    cached = st.session_state.get('image_upload_cache')
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+    prepared = _normalize_upload(uploaded_file.name, data, uploaded_file.type)
+    st.session_state['image_upload_cache'] = (cache_key, prepared)
+    return prepared
+
+def cached_result(file_hash, task):
+    """返回覆盖 task 的缓存结果 (没有则为 None)"""
+    entry = st.session_state.get('image_analysis_results', {}).get(file_hash)
+    if entry is not None and task in entry["tasks"]:
+        return entry
+    return None
+
+def remember_result(file_hash, result):
+    """
+    合并保存结果 (先 OCR 后完整分析时以新结果为准)，超出数量时丢弃最早的文件
+    模型调用失败后的后备结果 (带 fallback_reason) 不缓存，下次点击仍会重新请求
+    """
+    if result.get("fallback_reason"):
+        return result
+    results = st.session_state.setdefault('image_analysis_results', {})
+    entry = results.pop(file_hash, {"tasks": []})
+    merged = dict(entry, **result)
+    merged["tasks"] = sorted(set(entry["tasks"]) | set(result.get("tasks", REQUEST_TASKS["analysis"])))
+    results[file_hash] = merged
+    while len(results) > RESULT_CACHE_SIZE:
+        results.pop(next(iter(results)))
+    return merged
+
+def format_request_stats(upload_stats, upload_ms, result):
+    """上传 / 模型调用的字节数与耗时说明"""
+    parts = []
+    if upload_stats:
+        parts.append(
+            f"上传 {upload_stats['bytes'] / 1024:.0f} KB (原图 {upload_stats['original_bytes'] / 1024:.0f} KB, "
+            f"{upload_stats['original_size'][0]}×{upload_stats['original_size'][1]} → "
+            f"{upload_stats['size'][0]}×{upload_stats['size'][1]}, 预处理 {upload_stats['elapsed_ms']:.0f} ms)"
+        )
+    parts.append(f"请求耗时 {upload_ms:.0f} ms")
+    request_stats = result.get("request_stats")
+    if request_stats:
+        parts.append(
+            f"模型请求 {request_stats['payload_bytes'] / 1024:.0f} KB, 模型耗时 {request_stats['api_latency_ms']:.0f} ms"
+        )
+    return " · ".join(parts)
+
 def show_image_analysis(backend_url):
     """
     显示图像分析页面
@@ -52,16 +143,27 @@ def show_image_analysis(backend_url):
             if target_task:
                 with st.spinner("正在进行智能分析..." if target_task == "analysis" else "正在提取文字..."):
                     try:
-                        # 准备文件上传
-                        files = {"image": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-                        
-                        # 调用API (注意：分析API不在/api/v1下，而是在根路径下的/analyze)
-                        response = requests.post(f"{backend_url}/analyze/image", files=files)
-                        
-                        
-                        if response.status_code == 200:
-                            result = response.json()
+                        file_hash = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+                        result = cached_result(file_hash, target_task)
+                        if result is not None:
+                            status_code = 200
+                            stats_caption = "结果来自缓存 (同一图像不重复请求)"
+                        else:
+                            # 准备文件上传 (缩小并重新编码后再上传)
+                            file_name, file_bytes, file_type, upload_stats = prepare_upload(uploaded_file)
+                            files = {"image": (file_name, file_bytes, file_type)}
+                            options = json.dumps({"tasks": REQUEST_TASKS[target_task]})
                             
+                            # 调用API (注意：分析API不在/api/v1下，而是在根路径下的/analyze)
+                            request_start = time.perf_counter()
+                            response = requests.post(f"{backend_url}/analyze/image", files=files, data={"options": options})
+                            upload_ms = (time.perf_counter() - request_start) * 1000
+                            status_code = response.status_code
+                            if status_code == 200:
+                                result = remember_result(file_hash, response.json())
+                                stats_caption = format_request_stats(upload_stats, upload_ms, result)
+                        
+                        if status_code == 200:
                             # 保存上下文供 AI 助手使用
                             st.session_state['image_analysis_context'] = {
                                 'type': target_task,
@@ -70,6 +172,13 @@ def show_image_analysis(backend_url):
                             }
                             
                             st.success("处理完成！")
+                            st.caption(stats_caption)
+                            near_duplicate = result.get("near_duplicate")
+                            if near_duplicate:
+                                st.info(
+                                    f"与之前分析过的图像近似重复 (汉明距离 {near_duplicate['distance']})，"
+                                    "已直接复用其分析结果"
+                                )
                             
                             if target_task == "analysis":
                                 # 第一部分：视觉智能分析 (对象、场景、分类)
@@ -127,3 +236,123 @@ def show_image_analysis(backend_url):
                         st.error(f"请求错误: {str(e)}")
         
         st.markdown('</div>', unsafe_allow_html=True)
+
+    st.markdown("---")
+    show_batch_analysis(backend_url)
+
+def stream_batch_analysis(backend_url, files, concurrency=BATCH_CONCURRENCY):
+    """
+    调用 POST /analyze/image/batch，逐行产出 NDJSON 结果 (每张图像分析完成即返回一行)
+    files 为 [(文件名, 字节, MIME 类型)]，zip 压缩包由后端解压
+    """
+    response = requests.post(
+        f"{backend_url}/analyze/image/batch",
+        files=[("images", f) for f in files],
+        data={"options": json.dumps({"concurrency": concurrency})},
+        stream=True,
+        timeout=BATCH_TIMEOUT
+    )
+    with response:
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def render_batch_cell(line, thumbnail=None):
+    """结果网格中的单张图像"""
+    if thumbnail is not None:
+        st.image(thumbnail, use_container_width=True)
+    st.markdown(f"**{os.path.basename(line['filename'])}**")
+    if line["status"] != "ok":
+        st.error(line.get("error", "分析失败"))
+        return
+    result = line["result"]
+    st.caption(result.get("scene", ""))
+    objects = result.get("objects", [])
+    if objects:
+        st.markdown(" ".join(f"`{obj['name']}`" for obj in objects[:5]))
+    if result.get("near_duplicate"):
+        st.caption(f"近似重复 (距离 {result['near_duplicate']['distance']})，复用已有结果")
+    if line.get("elapsed_ms") is not None:
+        st.caption(f"{line['elapsed_ms']:.0f} ms")
+
+def show_batch_analysis(backend_url):
+    """
+    批量图像分析: 多个图像文件或 zip 压缩包，结果按完成顺序逐张显示
+    """
+    st.markdown("### 🗂️ 批量分析")
+    uploaded_files = st.file_uploader(
+        "上传多张图像或 zip 压缩包", type=["jpg", "jpeg", "png", "webp", "zip"],
+        accept_multiple_files=True, key="batch_image_files"
+    )
+    if not uploaded_files:
+        return
+
+    # 缩略图: 直接上传的图像用预处理后的字节 (zip 内的图像不显示缩略图)
+    # 预处理结果按 (文件名, 大小, 哈希) 缓存，页面重新运行时不再重复解码、编码
+    cache = st.session_state.get('image_batch_upload_cache', {})
+    current = {}
+    thumbnails = {}
+    files = []
+    for uploaded in uploaded_files:
+        raw = uploaded.getvalue()
+        if uploaded.name.lower().endswith(".zip"):
+            files.append((uploaded.name, raw, "application/zip"))
+            continue
+        cache_key = (uploaded.name, len(raw), hash(raw))
+        prepared = cache.get(cache_key)
+        if prepared is None:
+            prepared = _normalize_upload(uploaded.name, raw, uploaded.type)
+        current[cache_key] = prepared
+        name, data, mime_type, _ = prepared
+        files.append((name, data, mime_type))
+        thumbnails[name] = data
+    # 只保留当前上传的文件
+    st.session_state['image_batch_upload_cache'] = current
+
+    batch_key = tuple((name, len(data)) for name, data, _ in files)
+    previous = st.session_state.get('image_batch_results')
+    start_click = st.button("🚀 开始批量分析", type="primary", use_container_width=True)
+
+    status = st.empty()
+    grid = st.container()
+    lines = []
+    summary = None
+    if start_click:
+        row = None
+        try:
+            for line in stream_batch_analysis(backend_url, files):
+                if line.get("done"):
+                    summary = line
+                    break
+                if len(lines) % BATCH_GRID_COLUMNS == 0:
+                    row = grid.columns(BATCH_GRID_COLUMNS)
+                with row[len(lines) % BATCH_GRID_COLUMNS]:
+                    render_batch_cell(line, thumbnails.get(line["filename"]))
+                lines.append(line)
+                status.info(f"已完成 {len(lines)} 张...")
+        except Exception as e:
+            st.error(f"批量分析失败: {str(e)}")
+        st.session_state['image_batch_results'] = (batch_key, lines, summary)
+    elif previous is not None and previous[0] == batch_key:
+        # 页面重新运行时直接显示上次的结果
+        _, lines, summary = previous
+        for start in range(0, len(lines), BATCH_GRID_COLUMNS):
+            row = grid.columns(BATCH_GRID_COLUMNS)
+            for column, line in zip(row, lines[start:start + BATCH_GRID_COLUMNS]):
+                with column:
+                    render_batch_cell(line, thumbnails.get(line["filename"]))
+
+    if summary:
+        status.success(
+            f"批量分析完成: 共 {summary['total']} 张，成功 {summary['succeeded']} 张，"
+            f"失败 {summary['failed']} 张，耗时 {summary['elapsed_ms'] / 1000:.1f} s"
+        )
+    if lines:
+        st.download_button(
+            label="下载结果 (NDJSON)",
+            data="\n".join(json.dumps(line, ensure_ascii=False) for line in lines),
+            file_name="batch_analysis.ndjson",
+            mime="application/x-ndjson"
+        )
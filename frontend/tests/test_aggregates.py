@@ -0,0 +1,29 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.aggregates import DatasetAggregates
+
+
+def _frame():
+    return pd.DataFrame({
+        'sentiment': ['positive', 'negative', 'positive', 'neutral'],
+        'rating': [5, 1, 4, 3],
+        'score': np.array([0.9, 0.1, 0.8, 0.5], dtype=np.float32),
+        'category': pd.Categorical(['cable', 'cable', 'charger', 'charger'], categories=['cable', 'charger', 'case']),
+        'date': pd.to_datetime(['2024-01-03', '2024-01-20', '2024-02-01', None]),
+    })
+
+
+def test_by_drops_empty_groups_without_warnings():
+    cube = DatasetAggregates.from_frame(_frame()).cube
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        result = cube.by('category')
+    assert result['category'].astype(str).tolist() == ['cable', 'charger']
+    assert result['count'].tolist() == [2, 2]
+    assert result['avg_rating'].tolist() == [3.0, 3.5]
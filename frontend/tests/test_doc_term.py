@@ -0,0 +1,64 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.doc_term import DocTermMatrix
+from utils.tokenizer import TokenCache
+
+BATCH_1 = ["电池续航很好", "充电速度很快", "battery drains quickly"]
+BATCH_2 = ["屏幕显示清晰", "电池续航一般", "screen scratches easily"]
+
+
+def _hashes(start, n):
+    return np.arange(start, start + n, dtype=np.uint64)
+
+
+def _assert_same(a, b):
+    assert a.shape == b.shape
+    assert a.words == b.words
+    assert (a.counts != b.counts).nnz == 0
+    assert (a.presence != b.presence).nnz == 0
+
+
+def test_extend_appends_rows_and_new_columns():
+    cache = TokenCache(workers=1)
+    first = _hashes(1, 3)
+    cache.add(first, BATCH_1)
+    doc_term = DocTermMatrix.from_token_cache(cache, first)
+
+    both = np.concatenate([first, _hashes(10, 3)])
+    cache.add(both, BATCH_1 + BATCH_2)
+    assert cache.vocab_size > doc_term.shape[1]
+    extended = doc_term.extend(cache, both)
+
+    _assert_same(extended, DocTermMatrix.from_token_cache(cache, both))
+    counts = extended.word_counts([0, 4])
+    assert counts['电池'] == 2 and counts['一般'] == 1
+
+
+def test_extend_rebuilds_when_rows_are_not_a_prefix():
+    cache = TokenCache(workers=1)
+    first = _hashes(1, 3)
+    cache.add(first, BATCH_1)
+    doc_term = DocTermMatrix.from_token_cache(cache, first)
+
+    other = _hashes(10, 3)
+    cache.add(other, BATCH_2)
+    extended = doc_term.extend(cache, other)
+    _assert_same(extended, DocTermMatrix.from_token_cache(cache, other))
+
+
+def test_extend_after_vocab_compaction():
+    cache = TokenCache(workers=1)
+    both = _hashes(1, 6)
+    cache.add(both, BATCH_1 + BATCH_2)
+    doc_term = DocTermMatrix.from_token_cache(cache, both)
+
+    # 切换到只含第二批的数据集: 词表被压缩、重新编号
+    second = both[3:]
+    cache.retain(second)
+    extended = doc_term.extend(cache, second)
+    _assert_same(extended, DocTermMatrix.from_token_cache(cache, second))
+    assert set(extended.word_counts()) <= set(cache.words)
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.search_index import SearchIndex
+from utils.tokenizer import TokenCache
+
+COMMENTS = [
+    "USB-C cable charges my laptop fast",
+    "The Wi-Fi adapter keeps dropping",
+    "Don't buy this, it broke in a week",
+    "Great 3.5mm headphone jack adapter",
+    "Perfect for the café, quiet fan",
+    "usb c port is loose",
+    "wifi works fine",
+    "充电线质量很好，Type-C 接口很稳",
+]
+
+
+def _index(comments=COMMENTS):
+    df = pd.DataFrame({
+        'comment': comments,
+        'sentiment': 'neutral',
+        'category': 'cable',
+        'row_hash': pd.Series(range(1, len(comments) + 1), dtype='uint64'),
+    })
+    cache = TokenCache(workers=1)
+    cache.add(df['row_hash'], df['comment'])
+    return SearchIndex(df, cache)
+
+
+def _hits(index, query):
+    labels, _ = index.search(query)
+    return sorted(labels.tolist())
+
+
+def test_terms_with_punctuation_and_accents():
+    index = _index()
+    assert _hits(index, 'usb-c') == [0]
+    assert _hits(index, 'wi-fi') == [1]
+    assert _hits(index, "don't") == [2]
+    assert _hits(index, '3.5mm') == [3]
+    assert _hits(index, 'café') == [4]
+    assert _hits(index, 'CAFÉ') == [4]
+    assert _hits(index, 'type-c') == [7]
+
+
+def test_punctuated_terms_combine_with_other_clauses():
+    index = _index()
+    assert _hits(index, 'usb-c OR wi-fi') == [0, 1]
+    assert _hits(index, 'adapter -wi-fi') == [3]
+    assert _hits(index, '"3.5mm headphone"') == [3]
+
+
+def test_plain_words_still_expand():
+    index = _index()
+    assert _hits(index, 'usb') == [0, 5]
+    assert _hits(index, 'adapt') == [1, 3]
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import jieba
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.tokenizer import TokenCache, process_text, _keep
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'tokenizer_samples.txt')
+
+with open(FIXTURE, encoding='utf-8') as f:
+    SAMPLES = [line.rstrip('\n') for line in f if line.strip()]
+
+
+def _reference(text):
+    """原实现: 对整段文本调用 jieba.cut 后过滤"""
+    return [word for word in (w.strip().lower() for w in jieba.cut(text)) if _keep(word)]
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_process_text_matches_jieba(text):
+    assert process_text(text) == _reference(text)
+
+
+def test_non_string_input():
+    assert process_text(None) == []
+    assert process_text(float('nan')) == []
+
+
+def test_retain_compacts_vocab():
+    cache = TokenCache(workers=1)
+    hashes = np.arange(1, 4, dtype=np.uint64)
+    cache.add(hashes, ["电池续航很好", "屏幕显示清晰", "电池充电很快"])
+    kept = [cache.tokens(p) for p in cache.positions(hashes[[0, 2]])]
+
+    cache.retain(hashes[[2, 0]])
+    assert len(cache) == 2
+    assert sorted(cache.words) == sorted(set(kept[0] + kept[1]))
+    assert cache.vocab == {word: i for i, word in enumerate(cache.words)}
+    assert [cache.tokens(p) for p in cache.positions(hashes[[0, 2]])] == kept
+
+    # 压缩后新增的行继续使用新词表
+    cache.add(hashes[1:2], ["屏幕显示清晰"])
+    assert cache.tokens(cache.positions(hashes[1:2])[0]) == process_text("屏幕显示清晰")
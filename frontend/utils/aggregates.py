@@ -0,0 +1,155 @@
+import pandas as pd
+
+class AggregateCube:
+    """
+    情感 × 分类 × 评分 × 月份 的聚合立方体 (每个单元格保存 count / rating_sum / score_sum)
+    单元格数量只取决于维度取值的组合数，与评论行数无关；
+    页面上的筛选和图表都通过切片、汇总立方体得到。
+    """
+
+    DIMENSIONS = ['sentiment', 'category', 'rating', 'month']
+    MEASURES = ['count', 'rating_sum', 'score_sum']
+
+    def __init__(self, cells=None):
+        if cells is None:
+            cells = pd.DataFrame({
+                'sentiment': pd.Series(dtype='category'),
+                'category': pd.Series(dtype='category'),
+                'rating': pd.Series(dtype='float64'),
+                'month': pd.Series(dtype='period[M]'),
+                'count': pd.Series(dtype='int64'),
+                'rating_sum': pd.Series(dtype='float64'),
+                'score_sum': pd.Series(dtype='float64')
+            })
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, ui_df):
+        return cls(cls._build_cells(ui_df))
+
+    @classmethod
+    def _build_cells(cls, ui_df):
+        rating = ui_df['rating'].astype('float64')
+        score = ui_df['score'].astype('float64') if 'score' in ui_df.columns else 0.0
+        rows = pd.DataFrame({
+            'sentiment': ui_df['sentiment'],
+            'category': ui_df['category'].astype('category'),
+            'rating': rating,
+            'month': ui_df['date'].dt.to_period('M'),
+            'count': 1,
+            'rating_sum': rating,
+            'score_sum': score
+        }, index=ui_df.index)
+        return cls._group(rows, cls.DIMENSIONS)
+
+    @classmethod
+    def _group(cls, cells, dims):
+        if cells.empty:
+            return cells[dims + cls.MEASURES].reset_index(drop=True)
+        # dropna=False: 日期无法解析 (NaT) 或分类缺失的评论也计入总数
+        grouped = cells.groupby(dims, observed=True, sort=True, dropna=False)[cls.MEASURES].sum()
+        return grouped.reset_index()
+
+    def update(self, ui_df):
+        """合并一批新增行 (只对新行分组，再与现有单元格合并)"""
+        if ui_df is None or ui_df.empty:
+            return self
+        batch = self._build_cells(ui_df)
+        if self.cells.empty:
+            self.cells = batch
+            return self
+        cells = pd.concat([self.cells, batch], ignore_index=True)
+        # 合并后的分类列可能退化为 object，重新转换为 category 以保持分组效率
+        for dim in ('sentiment', 'category'):
+            cells[dim] = cells[dim].astype('category')
+        self.cells = self._group(cells, self.DIMENSIONS)
+        return self
+
+    def slice(self, sentiments=None, rating_range=None, categories=None):
+        """按筛选条件切片，返回新的立方体 (不修改自身)"""
+        mask = pd.Series(True, index=self.cells.index)
+        if sentiments is not None:
+            mask &= self.cells['sentiment'].isin(list(sentiments))
+        if rating_range is not None:
+            mask &= self.cells['rating'].between(rating_range[0], rating_range[1])
+        if categories is not None:
+            mask &= self.cells['category'].isin(list(categories))
+        if mask.all():
+            return self
+        return AggregateCube(self.cells[mask])
+
+    @property
+    def total(self):
+        return int(self.cells['count'].sum())
+
+    def avg_rating(self):
+        total = self.total
+        return float(self.cells['rating_sum'].sum() / total) if total else float('nan')
+
+    def share(self, sentiment):
+        """某种情感的评论占比 (%)"""
+        total = self.total
+        if not total:
+            return 0.0
+        return float(self.cells.loc[self.cells['sentiment'] == sentiment, 'count'].sum() / total * 100)
+
+    def by(self, dims):
+        """
+        按给定维度汇总，返回包含 count / rating_sum / score_sum / avg_rating / avg_score 的 DataFrame
+        """
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        result = self._group(self.cells, dims)
+        result = result[result['count'] > 0].copy()
+        result['avg_rating'] = result['rating_sum'] / result['count']
+        result['avg_score'] = result['score_sum'] / result['count']
+        return result.reset_index(drop=True)
+
+    def counts(self, dim):
+        """按单个维度计数 (Series，index 为维度取值)"""
+        result = self.by(dim)
+        counts = pd.Series(result['count'].to_numpy(), index=result[dim].astype(object).to_numpy(), name='count')
+        counts.index.name = dim
+        return counts
+
+    def monthly_trend(self):
+        """月度趋势 (与页面原有 monthly_data 结构一致: month / rating / sentiment / count)"""
+        monthly = self.by('month').set_index('month')
+        # 没有日期的评论计入总数，但无法放到趋势图的某个月份上
+        monthly = monthly[monthly.index.notna()]
+        positive = self.cells.loc[self.cells['sentiment'] == 'positive'].groupby('month')['count'].sum()
+        positive = positive.reindex(monthly.index, fill_value=0)
+        return pd.DataFrame({
+            'month': monthly.index.to_timestamp() if len(monthly) else pd.DatetimeIndex([]),
+            'rating': monthly['avg_rating'].to_numpy(),
+            'sentiment': (positive / monthly['count'] * 100).to_numpy(),
+            'count': monthly['count'].astype('int64').to_numpy()
+        })
+
+
+class DatasetAggregates:
+    """
+    可增量更新的数据集聚合结果 (聚合立方体)
+    输入为 UI 视图 (包含 sentiment / rating / category / date / score 列)，
+    追加新批次时只需对新增行调用 update，无需从头重建。
+    关键词统计见 doc_term.DocTermMatrix。
+    """
+
+    def __init__(self):
+        self.cube = AggregateCube()
+
+    @classmethod
+    def from_frame(cls, ui_df):
+        aggregates = cls()
+        aggregates.update(ui_df)
+        return aggregates
+
+    @property
+    def total(self):
+        return self.cube.total
+
+    def update(self, ui_df):
+        """把一批新增行合并进聚合结果"""
+        if ui_df is None or ui_df.empty:
+            return self
+        self.cube.update(ui_df)
+        return self
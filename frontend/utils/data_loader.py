@@ -0,0 +1,70 @@
+import pandas as pd
+import hashlib
+import io
+import os
+import tempfile
+
+# 优先使用 calamine (Rust 实现) 解析 Excel，未安装时回退到 openpyxl
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+# 列式缓存目录: (frontend/utils) -> (frontend) -> (frontend/data/cache)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(os.path.dirname(current_dir), 'data', 'cache')
+
+def file_digest(data):
+    """计算文件内容的哈希值 (用作缓存键)"""
+    return hashlib.sha256(data).hexdigest()
+
+def read_excel_fast(source):
+    """使用最快的可用引擎读取 Excel，失败时回退到 openpyxl"""
+    if EXCEL_ENGINE != "openpyxl":
+        try:
+            return pd.read_excel(source, engine=EXCEL_ENGINE)
+        except Exception as e:
+            print(f"{EXCEL_ENGINE} failed, falling back to openpyxl: {e}")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+    return pd.read_excel(source, engine="openpyxl")
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.parquet")
+
+def read_uploaded_file(uploaded_file):
+    """
+    读取上传的 CSV/XLSX 文件。
+    每个文件按内容哈希只解析一次并转存为 Parquet，重复上传直接读取列式缓存。
+    """
+    data = uploaded_file.getvalue()
+    digest = file_digest(data)
+    cache_path = _cache_path(digest)
+
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception as e:
+            print(f"Failed to read cache {cache_path}: {e}")
+
+    if uploaded_file.name.lower().endswith('.csv'):
+        df = pd.read_csv(io.BytesIO(data))
+    else:
+        df = read_excel_fast(io.BytesIO(data))
+
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # 先写唯一的临时文件再替换，避免并发读取到半个文件
+        # (同一文件被多个会话同时上传时各写各的临时文件，互不覆盖)
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, prefix=digest, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+        df.to_parquet(tmp_path, index=False, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Failed to write cache {cache_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return df
@@ -1,6 +1,8 @@
 import pandas as pd
+import numpy as np
 import re
 import os
+import hashlib
 import sys
 import streamlit as st
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
@@ -114,7 +116,8 @@ def generate_response(sentiment_label, review_text, category):
                     f"评论内容：{review_text}"
                 )
                 
-                response = model.predict(prompt)
+                # 逐行批量生成，限流时让位于对话等交互请求
+                response = model.predict(prompt, priority="bulk")
                 
                 if response.get("status") == "success":
                     return f"🤖 【AI 智能建议】\n{response.get('text')}"
@@ -130,9 +133,8 @@ def generate_response(sentiment_label, review_text, category):
         "(提示：配置 API Key 后可启用 AI 智能生成具体的应对措施)"
     )
 
-def process_uploaded_data(df):
-    """处理上传的 DataFrame"""
-    # 1. 确保列名存在
+def normalize_columns(df):
+    """统一列名并检查必要列是否存在"""
     required_cols = ['product_name', 'rating', 'review_content']
     missing_cols = [col for col in required_cols if col not in df.columns]
     
@@ -154,11 +156,40 @@ def process_uploaded_data(df):
         missing_cols = [col for col in required_cols if col not in df.columns]
         if missing_cols:
             raise ValueError(f"上传的文件缺少必要列: {', '.join(missing_cols)}。请确保包含 product_name, rating, review_content (或类似名称)。")
+    
+    return df
+
+def compute_row_hashes(df):
+    """
+    按 (product_name, rating, review_content) 计算每行的 64 位哈希，用于识别重复评论。
+    先统一成字符串再哈希，保证压缩前后 (object/Arrow 字符串、int8/float) 结果一致。
+    """
+    rating = pd.to_numeric(df['rating'], errors='coerce').fillna(0).astype('float64').round(4).astype(str)
+    keys = (
+        df['product_name'].fillna('Unknown').astype(str) + '\x1f' +
+        rating + '\x1f' +
+        df['review_content'].fillna('').astype(str)
+    )
+    return pd.util.hash_array(keys.to_numpy(dtype=object))
+
+def dataset_fingerprint(df):
+    """数据集指纹 (所有行哈希的摘要)，用于判断缓存是否仍然有效"""
+    if 'row_hash' in df.columns:
+        hashes = df['row_hash'].to_numpy(dtype=np.uint64)
+    else:
+        hashes = compute_row_hashes(df)
+    return hashlib.md5(np.ascontiguousarray(hashes).tobytes()).hexdigest()
+
+def process_uploaded_data(df):
+    """处理上传的 DataFrame"""
+    # 1. 确保列名存在
+    df = normalize_columns(df)
 
     # 2. 填充缺失值
     df['review_content'] = df['review_content'].fillna('')
     df['product_name'] = df['product_name'].fillna('Unknown')
     df['rating'] = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
+    df['row_hash'] = compute_row_hashes(df)
 
     # 3. 情感分析
     df['sentiment_score'] = df['review_content'].apply(get_sentiment_score)
@@ -181,3 +212,82 @@ def process_uploaded_data(df):
     )
     
     return df
+
+def append_uploaded_data(existing_df, raw_df):
+    """
+    增量追加新批次: 按行哈希跳过已存在 (或批次内重复) 的评论，
+    只对真正新增的行做情感打分、分类和应对方案生成。
+    返回: (合并后的 DataFrame, 新增行的 DataFrame)
+    """
+    raw_df = normalize_columns(raw_df)
+    hashes = compute_row_hashes(raw_df)
+    
+    if 'row_hash' in existing_df.columns:
+        known = existing_df['row_hash'].to_numpy(dtype=np.uint64)
+    else:
+        known = compute_row_hashes(existing_df)
+    
+    is_new = ~np.isin(hashes, known) & ~pd.Index(hashes).duplicated()
+    new_rows = raw_df[is_new]
+    if new_rows.empty:
+        return existing_df, new_rows
+    
+    new_rows = process_uploaded_data(new_rows.reset_index(drop=True))
+    if 'date' in existing_df.columns:
+        if 'date' in new_rows.columns:
+            new_rows['date'] = pd.to_datetime(new_rows['date'], errors='coerce')
+        else:
+            # 新批次没有日期时按到达时间记录
+            new_rows['date'] = pd.Timestamp.now()
+    
+    combined = pd.concat([existing_df, new_rows], ignore_index=True)
+    return combined, new_rows
+
+
+# 低基数列使用 category，长文本使用 Arrow 字符串
+CATEGORICAL_COLUMNS = ['sentiment_label', 'product_category']
+TEXT_COLUMNS = ['review_content', 'solution', 'product_name', 'product_id']
+
+def frame_memory(df):
+    """DataFrame 实际占用的字节数 (包含字符串内容)"""
+    if df is None:
+        return 0
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def optimize_dtypes(df):
+    """
+    压缩分析结果的内存占用 (原地转换列类型并返回 df):
+    低基数列转为 category，文本列转为 Arrow 字符串，评分转为小整数 (含小数时为 float32)，
+    日期只解析一次。
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in TEXT_COLUMNS:
+        if col in df.columns and df[col].dtype != 'string[pyarrow]':
+            df[col] = df[col].astype('string[pyarrow]')
+
+    if 'rating' in df.columns:
+        rating = pd.to_numeric(df['rating'], errors='coerce').fillna(0)
+        if (rating % 1 == 0).all() and rating.between(-128, 127).all():
+            df['rating'] = rating.astype(np.int8)
+        else:
+            df['rating'] = rating.astype(np.float32)
+
+    if 'sentiment_score' in df.columns:
+        df['sentiment_score'] = df['sentiment_score'].astype(np.float32)
+
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+
+    return df
+
+def compact_frame(df):
+    """
+    压缩 DataFrame 并返回 (df, 内存报告)
+    报告格式: {'before': 字节数, 'after': 字节数}
+    """
+    before = frame_memory(df)
+    df = optimize_dtypes(df)
+    return df, {'before': before, 'after': frame_memory(df)}
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from collections import Counter
+from scipy import sparse
+
+class DocTermMatrix:
+    """
+    数据集的稀疏文档-词矩阵 (CSR，行顺序与数据集一致，列为分词缓存的词表)
+    任意筛选 (情感、分类、月份、搜索结果) 都表示为行集合，
+    其关键词统计只需一次稀疏矩阵-向量乘法。
+    追加数据时用 extend 只为新增行构建矩阵。
+    """
+
+    def __init__(self, counts, words, index, row_hashes=None):
+        self.counts = counts                   # 词频矩阵 (行=评论, 列=词)
+        self.presence = counts.copy()          # 0/1 矩阵 (每条评论每个词只计一次)
+        self.presence.data[:] = 1
+        self.words = words
+        self.index = index
+        self.row_hashes = row_hashes           # 构建时的行哈希 (用于判断能否增量追加)
+        self._totals = {}
+        self._columns = None
+
+    @classmethod
+    def from_token_cache(cls, token_cache, row_hashes, index=None):
+        """按 row_hashes 的顺序从分词缓存构建矩阵 (未缓存的行视为空行)"""
+        row_hashes = np.asarray(row_hashes, dtype=np.uint64)
+        counts = cls._count_rows(token_cache, token_cache.positions(row_hashes))
+        if index is None:
+            index = pd.RangeIndex(len(row_hashes))
+        return cls(counts, list(token_cache.words), index, row_hashes)
+
+    @staticmethod
+    def _count_rows(token_cache, positions):
+        rows, ids = token_cache.gather(positions)
+        shape = (len(positions), token_cache.vocab_size)
+        counts = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.int32), (rows, ids)), shape=shape
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def extend(self, token_cache, row_hashes, index=None):
+        """
+        按新的 row_hashes 更新矩阵，返回新的 DocTermMatrix
+        已有行是 row_hashes 的前缀、且分词缓存的词表只在末尾追加时 (追加数据)，
+        只为新增行构建 CSR 并 vstack 到已有矩阵下方，新词作为新列追加；否则整体重建
+        """
+        row_hashes = np.asarray(row_hashes, dtype=np.uint64)
+        n_rows, n_words = self.shape
+        if (self.row_hashes is None or len(row_hashes) < n_rows
+                or not np.array_equal(row_hashes[:n_rows], self.row_hashes)
+                or token_cache.words[:n_words] != self.words):
+            return self.from_token_cache(token_cache, row_hashes, index)
+        # 已有行的列号不变，只需扩大列数
+        widened = sparse.csr_matrix(
+            (self.counts.data, self.counts.indices, self.counts.indptr),
+            shape=(n_rows, token_cache.vocab_size)
+        )
+        added = self._count_rows(token_cache, token_cache.positions(row_hashes[n_rows:]))
+        counts = sparse.vstack([widened, added], format='csr')
+        if index is None:
+            index = pd.RangeIndex(len(row_hashes))
+        return type(self)(counts, list(token_cache.words), index, row_hashes)
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    def _matrix(self, unique_per_row):
+        return self.presence if unique_per_row else self.counts
+
+    def row_positions(self, labels):
+        """行标签 -> 矩阵行号"""
+        positions = self.index.get_indexer(labels)
+        return positions[positions >= 0]
+
+    def term_ids(self, words):
+        """词 -> 列号 (不在词表中的词为 -1)"""
+        if self._columns is None:
+            self._columns = {word: i for i, word in enumerate(self.words)}
+        return np.array([self._columns.get(word, -1) for word in words], dtype=np.int64)
+
+    def term_counts(self, labels=None, unique_per_row=False):
+        """
+        统计若干行的词频向量 (长度为词表大小)
+        labels: 行标签 (与构建时的 index 对应)，None 表示全部行
+        """
+        matrix = self._matrix(unique_per_row)
+        if labels is None:
+            if unique_per_row not in self._totals:
+                self._totals[unique_per_row] = np.asarray(matrix.sum(axis=0)).ravel()
+            return self._totals[unique_per_row]
+        weights = np.zeros(matrix.shape[0], dtype=np.int32)
+        weights[self.row_positions(labels)] = 1
+        return matrix.T.dot(weights)
+
+    def group_counts(self, codes, n_groups, unique_per_row=False):
+        """
+        按分组统计词频: codes 为每行的组号 (-1 表示不参与)，返回 (组数 × 词表) 的 CSR 矩阵
+        """
+        codes = np.asarray(codes)
+        valid = np.flatnonzero(codes >= 0)
+        indicator = sparse.csr_matrix(
+            (np.ones(len(valid), dtype=np.int32), (codes[valid], valid)),
+            shape=(n_groups, self.shape[0])
+        )
+        return indicator @ self._matrix(unique_per_row)
+
+    def top_terms(self, counts, n):
+        """词频向量中最高的 n 个词: [(词, 次数), ...] (次数相同按词表顺序)"""
+        counts = np.asarray(counts)
+        if n < len(counts):
+            top = np.argpartition(-counts, n)[:n]
+        else:
+            top = np.arange(len(counts))
+        top = top[np.lexsort((top, -counts[top]))]
+        return [(self.words[i], int(counts[i])) for i in top if counts[i] > 0]
+
+    def most_common(self, n, labels=None, unique_per_row=False):
+        """若干行中出现最多的 n 个词"""
+        return self.top_terms(self.term_counts(labels, unique_per_row), n)
+
+    def word_counts(self, labels=None, unique_per_row=False):
+        """若干行的词频 Counter (用于词云等需要完整词频的场景)"""
+        counts = self.term_counts(labels, unique_per_row)
+        nonzero = np.flatnonzero(counts)
+        return Counter({self.words[i]: int(counts[i]) for i in nonzero})
@@ -0,0 +1,163 @@
+import pandas as pd
+import datetime
+import json
+import os
+
+# 历史数据目录: (frontend/utils) -> (frontend) -> (frontend/data)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(current_dir), 'data')
+HISTORY_DIR = os.path.join(DATA_DIR, 'history')
+MANIFEST_PATH = os.path.join(HISTORY_DIR, 'manifest.json')
+
+# 当前工作数据 (页面刷新后自动加载)
+CURRENT_PATH = os.path.join(DATA_DIR, 'user_upload_history.parquet')
+LEGACY_CURRENT_PATH = os.path.join(DATA_DIR, 'user_upload_history.csv')
+
+# manifest 中记录旧版 CSV 已迁移的标记 (以下划线开头的键不是快照)
+MIGRATED_KEY = "_legacy_csv_migrated"
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+PARQUET_COMPRESSION = "zstd"
+
+def _ensure_dirs():
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+
+def _write_parquet(df, path):
+    """原子写入 Parquet (先写临时文件再替换)"""
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False, compression=PARQUET_COMPRESSION)
+    os.replace(tmp_path, path)
+
+def summarize(df):
+    """生成快照摘要: 行数、情感分布、平均评分和列类型"""
+    summary = {
+        "rows": int(len(df)),
+        "sentiment_distribution": {},
+        "avg_rating": None,
+        "schema": {col: str(dtype) for col, dtype in df.dtypes.items()}
+    }
+    if 'sentiment_label' in df.columns:
+        counts = df['sentiment_label'].value_counts()
+        summary["sentiment_distribution"] = {str(k): int(v) for k, v in counts.items()}
+    if 'rating' in df.columns and len(df) > 0:
+        avg = pd.to_numeric(df['rating'], errors='coerce').mean()
+        summary["avg_rating"] = None if pd.isna(avg) else round(float(avg), 4)
+    return summary
+
+# -----------------------------------------------------------------------------
+# 当前工作数据
+# -----------------------------------------------------------------------------
+def save_current(df):
+    """保存当前工作数据"""
+    _ensure_dirs()
+    _write_parquet(df, CURRENT_PATH)
+    if os.path.exists(LEGACY_CURRENT_PATH):
+        os.remove(LEGACY_CURRENT_PATH)
+
+def load_current():
+    """加载当前工作数据，不存在时返回 None (旧版 CSV 会被转换为 Parquet)"""
+    if os.path.exists(CURRENT_PATH):
+        return pd.read_parquet(CURRENT_PATH)
+    if os.path.exists(LEGACY_CURRENT_PATH):
+        df = pd.read_csv(LEGACY_CURRENT_PATH)
+        try:
+            save_current(df)
+        except Exception as e:
+            print(f"Failed to migrate {LEGACY_CURRENT_PATH}: {e}")
+        return df
+    return None
+
+def clear_current():
+    """删除当前工作数据"""
+    for path in (CURRENT_PATH, LEGACY_CURRENT_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+# -----------------------------------------------------------------------------
+# 历史快照 (Parquet + manifest.json)
+# -----------------------------------------------------------------------------
+def _read_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Failed to read history manifest: {e}")
+        return {}
+
+def _write_manifest(manifest):
+    _ensure_dirs()
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def _add_snapshot(manifest, snapshot_id, df, created):
+    file_name = f"{snapshot_id}.parquet"
+    _write_parquet(df, os.path.join(HISTORY_DIR, file_name))
+    entry = summarize(df)
+    entry["file"] = file_name
+    entry["created"] = created.isoformat(timespec="seconds")
+    manifest[snapshot_id] = entry
+    return entry
+
+def _snapshots(manifest):
+    return {key: entry for key, entry in manifest.items() if not key.startswith("_")}
+
+def _migrate_legacy_csv(manifest):
+    """
+    将旧版 analysis_*.csv 转换为 Parquet 并登记到 manifest (只执行一次，之后由标记跳过)
+    原 CSV 文件保留不删除
+    """
+    for f in os.listdir(HISTORY_DIR):
+        if not (f.startswith("analysis_") and f.endswith(".csv")):
+            continue
+        snapshot_id = f[:-len(".csv")]
+        if snapshot_id in manifest:
+            continue
+        try:
+            created = datetime.datetime.strptime(snapshot_id.replace("analysis_", ""), TIMESTAMP_FORMAT)
+            _add_snapshot(manifest, snapshot_id, pd.read_csv(os.path.join(HISTORY_DIR, f)), created)
+        except Exception as e:
+            print(f"Failed to migrate {f}: {e}")
+    manifest[MIGRATED_KEY] = True
+
+def archive_snapshot(df):
+    """将数据归档为一条历史快照，返回 manifest 条目"""
+    _ensure_dirs()
+    created = datetime.datetime.now()
+    snapshot_id = f"analysis_{created.strftime(TIMESTAMP_FORMAT)}"
+    manifest = _read_manifest()
+    entry = _add_snapshot(manifest, snapshot_id, df, created)
+    _write_manifest(manifest)
+    return entry
+
+def list_snapshots():
+    """
+    仅根据 manifest 列出历史快照 (按时间倒序)
+    返回: [(snapshot_id, entry), ...]
+    """
+    if not os.path.exists(HISTORY_DIR):
+        return []
+    manifest = _read_manifest()
+    if not manifest.get(MIGRATED_KEY):
+        _migrate_legacy_csv(manifest)
+        _write_manifest(manifest)
+    return sorted(_snapshots(manifest).items(), key=lambda item: item[1].get("created", ""), reverse=True)
+
+def load_snapshot(snapshot_id):
+    """读取一条历史快照"""
+    entry = _snapshots(_read_manifest()).get(snapshot_id)
+    if entry is None:
+        raise KeyError(f"历史记录不存在: {snapshot_id}")
+    return pd.read_parquet(os.path.join(HISTORY_DIR, entry["file"]))
+
+def clear_snapshots():
+    """删除所有历史快照 (manifest 只保留迁移标记，旧版 CSV 不会被重新导入)"""
+    for snapshot_id, entry in _snapshots(_read_manifest()).items():
+        try:
+            os.remove(os.path.join(HISTORY_DIR, entry["file"]))
+        except Exception as e:
+            print(f"Failed to delete {snapshot_id}: {e}")
+    _write_manifest({MIGRATED_KEY: True})
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import json
+import os
+
+import numpy as np
+
+try:
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+except ImportError:
+    get_plotlyjs = None
+    get_plotlyjs_version = None
+
+# -----------------------------------------------------------------------------
+# 本地 plotly.js (从已安装的 plotly 包中导出，离线环境无需访问 CDN)
+# -----------------------------------------------------------------------------
+def ensure_plotly_bundle(static_dir):
+    """
+    确保 static_dir/vendor 下存在与当前 plotly 包版本一致的 plotly.js，
+    返回相对 static_dir 的路径 (文件名带版本号，可被浏览器长期缓存)；不可用时返回 None
+    """
+    if get_plotlyjs is None:
+        return None
+    rel_path = f"vendor/plotly-{get_plotlyjs_version()}.min.js"
+    abs_path = os.path.join(static_dir, rel_path)
+    if not os.path.exists(abs_path):
+        try:
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            tmp_path = abs_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(get_plotlyjs())
+            os.replace(tmp_path, abs_path)
+        except Exception as e:
+            print(f"Failed to write plotly.js bundle: {e}")
+            return None
+    return rel_path
+
+# -----------------------------------------------------------------------------
+# 图表数据的二进制编码 (与 plotly.py 6+ 的 {dtype, bdata, shape} 格式一致)
+# -----------------------------------------------------------------------------
+# 整数按取值范围选用最小的类型
+INT_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+DTYPE_CODES = {
+    np.dtype(np.int8): "i1", np.dtype(np.uint8): "u1",
+    np.dtype(np.int16): "i2", np.dtype(np.uint16): "u2",
+    np.dtype(np.int32): "i4", np.dtype(np.uint32): "u4",
+    np.dtype(np.float32): "f4", np.dtype(np.float64): "f8"
+}
+# 短数组编码后反而更长，保持原样
+MIN_ENCODE_LENGTH = 8
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _numeric_array(values):
+    """数值列表 -> 紧凑的 numpy 数组；含非数值时返回 None"""
+    if not all(_is_number(v) for v in values):
+        return None
+    if all(isinstance(v, int) for v in values):
+        arr = np.asarray(values, dtype=np.int64)
+        lo, hi = arr.min(), arr.max()
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return arr.astype(dtype)
+        return arr.astype(np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+def _encode(values):
+    """数值列表 -> {dtype, bdata[, shape]}；不能编码或编码后不更短时返回 None"""
+    if len(values) < MIN_ENCODE_LENGTH:
+        return None
+    original = values
+    shape = None
+    if all(isinstance(row, list) for row in values):
+        # 二维数组 (如 heatmap 的 z): 每行等长时按行展开
+        widths = {len(row) for row in values}
+        if len(widths) != 1:
+            return None
+        shape = f"{len(values)}, {widths.pop()}"
+        values = [v for row in values for v in row]
+    arr = _numeric_array(values)
+    if arr is None:
+        return None
+    if arr.dtype == np.float64:
+        # 能无损表示为 float32 时减半
+        narrowed = arr.astype(np.float32)
+        if np.array_equal(narrowed.astype(np.float64), arr):
+            arr = narrowed
+    encoded = {"dtype": DTYPE_CODES[arr.dtype], "bdata": base64.b64encode(arr.tobytes()).decode("ascii")}
+    if shape:
+        encoded["shape"] = shape
+    # 位数较少的小数 (如 4.2) 用 JSON 文本反而更短
+    if payload_size(encoded) >= payload_size(original):
+        return None
+    return encoded
+
+def _decode(spec):
+    """{dtype, bdata[, shape]} -> 普通列表"""
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=np.dtype(spec["dtype"]))
+    if spec.get("shape"):
+        values = values.reshape([int(n) for n in str(spec["shape"]).split(",")])
+    return values.tolist()
+
+def _is_binary(value):
+    return isinstance(value, dict) and isinstance(value.get("bdata"), str) and "dtype" in value
+
+def encode_arrays(obj):
+    """
+    递归地把 trace 中的数值列表替换为 base64 二进制 (原地修改并返回 obj)
+    只在编码后更短时替换；字符串、日期等非数值数组保持不变
+    """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if _is_binary(value):
+                # plotly.py 6+ 已输出二进制: 在原编码、更窄的类型和 JSON 列表中取最短的
+                decoded = _decode(value)
+                candidates = [c for c in (value, _encode(decoded), decoded) if c is not None]
+                obj[key] = min(candidates, key=payload_size)
+            elif isinstance(value, list) and value:
+                encoded = _encode(value)
+                obj[key] = encoded if encoded is not None else encode_arrays(value)
+            elif isinstance(value, dict):
+                encode_arrays(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            if isinstance(item, (dict, list)):
+                encode_arrays(item)
+    return obj
+
+def payload_size(obj):
+    """序列化后的字节数"""
+    return len(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+# -----------------------------------------------------------------------------
+# 布局模板去重: 同一模板 (约 3-4 KB) 每次下发只发送一份
+# -----------------------------------------------------------------------------
+_TEMPLATES = {}
+
+def extract_template(fig_dict):
+    """把 layout.template 移出图表，替换为 fig_dict['template_ref']"""
+    template = fig_dict.get('layout', {}).pop('template', None)
+    if template is None:
+        return fig_dict
+    ref = hashlib.md5(json.dumps(template, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    _TEMPLATES.setdefault(ref, template)
+    fig_dict['template_ref'] = ref
+    return fig_dict
+
+def templates_for(figures):
+    """一批图表引用到的模板 {ref: template}"""
+    refs = {fig.get('template_ref') for fig in figures.values()}
+    return {ref: _TEMPLATES[ref] for ref in refs if ref in _TEMPLATES}
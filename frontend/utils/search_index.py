@@ -0,0 +1,332 @@
+import numpy as np
+import re
+import math
+
+# 中文字符 (用于二元组索引，保证中文子串也能命中)
+CJK_RUN_RE = re.compile(r'[\u4e00-\u9fff]+')
+CJK_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+QUERY_TOKEN_RE = re.compile(r'-?"[^"]*"|\S+')
+WORD_RE = re.compile(r'\w+')
+LATIN_WORD_RE = re.compile(r'[a-z0-9]+')
+
+# 查询中的情感关键词 / 字段前缀
+SENTIMENT_KEYWORDS = {
+    '正面': 'positive', 'positive': 'positive',
+    '负面': 'negative', 'negative': 'negative',
+    '中性': 'neutral', '中立': 'neutral', 'neutral': 'neutral'
+}
+SENTIMENT_FIELDS = ('sentiment:', '情感:', '情感：')
+CATEGORY_FIELDS = ('category:', '分类:', '分类：')
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _cjk_bigrams(text):
+    grams = []
+    for run in CJK_RUN_RE.findall(text):
+        grams.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+def _build_postings(term_ids, doc_ids, n_terms):
+    """
+    (词, 文档) 对 -> 按词分组的倒排表 (CSR 结构)
+    返回: offsets (长度 n_terms + 1), 文档号数组 (每个词内升序), 词频数组
+    """
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+    order = np.lexsort((doc_ids, term_ids))
+    term_ids, doc_ids = term_ids[order], doc_ids[order]
+    if len(term_ids):
+        boundary = np.ones(len(term_ids), dtype=bool)
+        boundary[1:] = (term_ids[1:] != term_ids[:-1]) | (doc_ids[1:] != doc_ids[:-1])
+        starts = np.flatnonzero(boundary)
+        tfs = np.diff(np.append(starts, len(term_ids)))
+        term_ids, doc_ids = term_ids[starts], doc_ids[starts]
+    else:
+        tfs = np.zeros(0, dtype=np.int64)
+    offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=n_terms))
+    return offsets, doc_ids.astype(np.int32), tfs.astype(np.int32)
+
+class Query:
+    """解析后的查询: 子句之间为 AND，子句内部为 OR"""
+
+    def __init__(self):
+        self.clauses = []      # [[term, ...], ...]
+        self.excluded = []     # NOT 条件
+        self.sentiments = set()
+        self.categories = set()
+
+    @property
+    def is_empty(self):
+        return not (self.clauses or self.excluded or self.sentiments or self.categories)
+
+    def terms(self):
+        return [term for clause in self.clauses for term in clause]
+
+def parse_query(text):
+    """
+    解析查询语法:
+      空格分隔       -> AND                 质量 电池
+      OR / |         -> OR                  充电 OR 电池
+      -词 / NOT 词   -> NOT                 质量 -退货
+      "..."          -> 短语               "fast charging"
+      情感:负面 / sentiment:negative / 分类:Cable / category:cable -> 字段约束
+    只输入一个情感词 (如 "负面") 时等价于 情感:负面。
+    """
+    query = Query()
+    text = (text or '').strip()
+    if not text:
+        return query
+    if text.lower() in SENTIMENT_KEYWORDS:
+        query.sentiments.add(SENTIMENT_KEYWORDS[text.lower()])
+        return query
+
+    join_next, negate_next = False, False
+    for raw in QUERY_TOKEN_RE.findall(text):
+        if raw in ('OR', '|'):
+            join_next = True
+            continue
+        if raw in ('AND', '&'):
+            continue
+        if raw == 'NOT':
+            negate_next = True
+            continue
+
+        negate = negate_next or (raw.startswith('-') and len(raw) > 1)
+        negate_next = False
+        token = raw[1:] if raw.startswith('-') and len(raw) > 1 else raw
+        lower = token.lower()
+
+        field_value = None
+        for prefix in SENTIMENT_FIELDS:
+            if lower.startswith(prefix):
+                field_value = ('sentiment', lower[len(prefix):])
+        for prefix in CATEGORY_FIELDS:
+            if lower.startswith(prefix):
+                field_value = ('category', lower[len(prefix):])
+        if field_value:
+            kind, value = field_value
+            if kind == 'sentiment' and value in SENTIMENT_KEYWORDS:
+                query.sentiments.add(SENTIMENT_KEYWORDS[value])
+            elif kind == 'category' and value:
+                query.categories.add(value)
+            join_next = False
+            continue
+
+        if token.startswith('"'):
+            term = ('phrase', token.strip('"').lower())
+            if not term[1].strip():
+                continue
+        else:
+            term = ('term', lower)
+
+        if negate:
+            query.excluded.append(term)
+        elif join_next and query.clauses:
+            query.clauses[-1].append(term)
+        else:
+            query.clauses.append([term])
+        join_next = False
+    return query
+
+class SearchIndex:
+    """
+    评论检索倒排索引
+    - 词索引: 直接复用分词缓存 (TokenCache) 中的 token id
+    - 中文二元组索引: 保证任意中文子串 (如 "电池续") 都能命中
+    - 英文单词索引: 包含分词时被过滤的停用词 (如 cable / phone)，并支持子串扩展
+    支持 AND / OR / NOT、短语、情感/分类约束，结果按 BM25 排序。
+    """
+
+    def __init__(self, ui_df, token_cache):
+        self.labels = ui_df.index
+        self.n_docs = len(ui_df)
+        self.texts = [text if isinstance(text, str) else '' for text in ui_df['comment']]
+        self.sentiments = ui_df['sentiment'].astype(str).to_numpy()
+        self.categories = ui_df['category'].astype(str).str.lower().to_numpy()
+
+        # 1. 词倒排表
+        self.vocab = token_cache.vocab
+        self.words = token_cache.words
+        docs, ids = token_cache.gather(token_cache.positions(ui_df['row_hash']))
+        self.term_offsets, self.term_docs, self.term_tfs = _build_postings(ids, docs, token_cache.vocab_size)
+        self.doc_lengths = np.bincount(docs, minlength=self.n_docs).astype(np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.n_docs else 0.0
+
+        # 2. 中文二元组 / 英文单词倒排表 (同一次遍历生成)
+        self.bigram_vocab, self.latin_vocab = {}, {}
+        bigram_ids, bigram_docs, latin_ids, latin_docs = [], [], [], []
+        for doc, text in enumerate(self.texts):
+            for gram in set(_cjk_bigrams(text)):
+                bigram_ids.append(self.bigram_vocab.setdefault(gram, len(self.bigram_vocab)))
+                bigram_docs.append(doc)
+            for word in LATIN_WORD_RE.findall(text.lower()):
+                latin_ids.append(self.latin_vocab.setdefault(word, len(self.latin_vocab)))
+                latin_docs.append(doc)
+        self.bigram_offsets, self.bigram_docs, _ = _build_postings(bigram_ids, bigram_docs, len(self.bigram_vocab))
+        self.latin_offsets, self.latin_docs, self.latin_tfs = _build_postings(latin_ids, latin_docs, len(self.latin_vocab))
+        # 所有英文单词拼接成一个字符串，子串扩展时用 str.find 代替逐词比较
+        latin_words = list(self.latin_vocab)
+        self._latin_blob = '\n'.join(latin_words)
+        self._latin_starts = np.cumsum([0] + [len(w) + 1 for w in latin_words[:-1]]) if latin_words else np.zeros(0, dtype=np.int64)
+        self._expansions = {}
+
+    # -------------------------------------------------------------------------
+    # 倒排表访问
+    # -------------------------------------------------------------------------
+    def _term_postings(self, term_id):
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.term_docs[start:end], self.term_tfs[start:end]
+
+    def _latin_postings(self, word_id):
+        start, end = self.latin_offsets[word_id], self.latin_offsets[word_id + 1]
+        return self.latin_docs[start:end], self.latin_tfs[start:end]
+
+    def _bigram_postings(self, gram):
+        gram_id = self.bigram_vocab.get(gram)
+        if gram_id is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.bigram_docs[self.bigram_offsets[gram_id]:self.bigram_offsets[gram_id + 1]]
+
+    def _verify(self, docs, needle):
+        """在候选文档中确认子串确实存在 (忽略大小写)"""
+        if len(docs) == 0:
+            return docs
+        keep = [needle in self.texts[d].lower() for d in docs]
+        return docs[np.asarray(keep, dtype=bool)]
+
+    def _substring_docs(self, needle):
+        """中文子串: 二元组求交得到候选，再逐条确认"""
+        grams = _cjk_bigrams(needle)
+        if grams:
+            candidates = None
+            for gram in set(grams):
+                postings = self._bigram_postings(gram)
+                candidates = postings if candidates is None else np.intersect1d(candidates, postings, assume_unique=True)
+                if len(candidates) == 0:
+                    return candidates
+        else:
+            candidates = np.arange(self.n_docs, dtype=np.int32)
+        return self._verify(candidates, needle)
+
+    def _match(self, term):
+        """
+        单个查询项 -> (命中文档, 打分用的 [(文档, 词频, 文档频率)])
+        """
+        kind, value = term
+        if kind == 'phrase':
+            words = WORD_RE.findall(value)
+            candidates, scoring = None, []
+            for word in words:
+                docs, parts = self._match(('term', word))
+                scoring.extend(parts)
+                candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+            if candidates is None:
+                return np.zeros(0, dtype=np.int32), []
+            phrase = ' '.join(value.split())
+            return self._verify(candidates, phrase), scoring
+
+        if CJK_CHAR_RE.search(value):
+            term_id = self.vocab.get(value)
+            substring_docs = self._substring_docs(value)
+            if term_id is not None and term_id < len(self.term_offsets) - 1:
+                # jieba 在不同上下文中可能切分不同，补充子串命中
+                docs, tfs = self._term_postings(term_id)
+                extra = np.setdiff1d(substring_docs, docs, assume_unique=True)
+                return np.union1d(docs, extra), [(docs, tfs, len(docs)), (extra, None, len(extra))]
+            return substring_docs, [(substring_docs, None, len(substring_docs))]
+
+        if not LATIN_WORD_RE.fullmatch(value):
+            # 含符号或非 ASCII 字母 (usb-c / don't / 3.5mm / café): 单词索引无法直接命中，
+            # 用其中的英文/数字片段求交得到候选 (没有片段时为全部文档)，再逐条确认子串
+            candidates = None
+            for word in LATIN_WORD_RE.findall(value):
+                docs, _ = self._match(('term', word))
+                candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+            if candidates is None:
+                candidates = np.arange(self.n_docs, dtype=np.int32)
+            docs = self._verify(candidates, value)
+            return docs, [(docs, None, len(docs))]
+
+        # 英文/数字: 匹配所有包含该子串的单词 (如 charg -> charger / charging)
+        matched = self._expansions.get(value)
+        if matched is None:
+            matched = self._expand_latin(value)
+            self._expansions[value] = matched
+        scoring = [(docs, tfs, len(docs)) for docs, tfs in map(self._latin_postings, matched)]
+        if not scoring:
+            return np.zeros(0, dtype=np.int32), scoring
+        return np.unique(np.concatenate([docs for docs, _, _ in scoring])), scoring
+
+    def _expand_latin(self, value):
+        """英文词表中包含 value 的所有单词 id"""
+        if not value or '\n' in value:
+            return []
+        hits = []
+        pos = self._latin_blob.find(value)
+        while pos >= 0:
+            hits.append(pos)
+            pos = self._latin_blob.find(value, pos + 1)
+        if not hits:
+            return []
+        return np.unique(np.searchsorted(self._latin_starts, hits, side='right') - 1).tolist()
+
+    # -------------------------------------------------------------------------
+    # 查询
+    # -------------------------------------------------------------------------
+    def _bm25(self, result, scoring):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for docs, tfs, df in scoring:
+            if df == 0:
+                continue
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            tf = np.ones(len(docs), dtype=np.float32) if tfs is None else tfs.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / max(self.avg_doc_length, 1e-6))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores[result]
+
+    def search(self, query, doc_mask=None):
+        """
+        执行查询
+        query: 查询字符串或 Query
+        doc_mask: 可选的布尔数组 (长度为文档数)，只在其中为 True 的文档里检索
+        返回: (按相关度排序的行标签, 对应分数)
+        """
+        if isinstance(query, str):
+            query = parse_query(query)
+
+        result, scoring = None, []
+        for clause in query.clauses:
+            clause_docs = np.zeros(0, dtype=np.int32)
+            for term in clause:
+                docs, parts = self._match(term)
+                clause_docs = np.union1d(clause_docs, docs)
+                scoring.extend(parts)
+            result = clause_docs if result is None else np.intersect1d(result, clause_docs, assume_unique=True)
+
+        if result is None:
+            result = np.arange(self.n_docs, dtype=np.int32)
+        for term in query.excluded:
+            result = np.setdiff1d(result, self._match(term)[0], assume_unique=True)
+
+        keep = np.ones(len(result), dtype=bool)
+        if query.sentiments:
+            keep &= np.isin(self.sentiments[result], list(query.sentiments))
+        if query.categories:
+            keep &= np.isin(self.categories[result], list(query.categories))
+        if doc_mask is not None:
+            keep &= np.asarray(doc_mask, dtype=bool)[result]
+        result = result[keep]
+
+        scores = self._bm25(result, scoring) if scoring else np.zeros(len(result), dtype=np.float32)
+        order = np.lexsort((result, -scores))
+        return self.labels[result[order]], scores[order]
+
+    def mask_for(self, labels):
+        """行标签 -> 文档布尔掩码 (用于限制在筛选后的数据内检索)"""
+        mask = np.zeros(self.n_docs, dtype=bool)
+        positions = self.labels.get_indexer(labels)
+        mask[positions[positions >= 0]] = True
+        return mask
@@ -0,0 +1,310 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# 模板: 按情感分组的中英文评论，以及追加在评论末尾的短语
+# -----------------------------------------------------------------------------
+SENTIMENTS = ['positive', 'negative', 'neutral']
+
+ZH_TEMPLATES = {
+    'positive': [
+        "这个产品真的很棒，质量非常好，使用体验很棒！",
+        "服务态度很好，解决问题很及时，非常满意。",
+        "界面设计简洁美观，操作简单，用户体验很好。",
+        "功能很实用，解决了我的问题，值得推荐。",
+        "性价比很高，比同类产品好很多，会继续支持。",
+        "客服响应速度快，专业水平高，解答问题很清楚。",
+        "产品更新很及时，每次都有新功能，越来越好了。",
+        "包装很精美，送人自用都很合适，品质有保障。",
+        "这个产品的设计很人性化，考虑到了用户的需求，使用起来非常方便。",
+        "客服团队非常专业，无论什么时候联系都能得到及时回复。",
+        "产品的质量超出预期，细节处理得很好，能感受到用心。",
+        "价格虽然不便宜，但考虑到质量和功能，性价比很高。",
+        "界面简洁大方，没有多余的功能，专注于核心体验，很喜欢。",
+        "使用过程中遇到了一些小问题，但客服很快就帮我解决了，很满意。",
+        "产品功能很全面，满足了我所有的需求，推荐给朋友。",
+        "包装很用心，产品保护得很好，开箱体验很棒。",
+        "产品的创新点很多，解决了传统产品的痛点，很惊喜。",
+        "客服团队训练有素，无论多复杂的问题都能耐心解答。",
+        "产品质量一流，每个细节都处理得很好，物超所值。",
+        "虽然价格不低，但考虑到品质和功能，完全值得这个价格。",
+        "界面设计简约而不简单，每个功能都恰到好处，使用体验极佳。",
+        "使用中遇到的问题都能快速得到解决，售后服务很到位。",
+        "产品功能强大且实用，大大提高了我的工作效率，强烈推荐。",
+        "从包装到产品本身都体现了高端品质，开箱就是一种享受。"
+    ],
+    'negative': [
+        "产品质量有问题，用了几天就坏了，很失望。",
+        "客服态度不好，问题解决不了，体验很差。",
+        "界面设计复杂，操作困难，用户体验不好。",
+        "功能不实用，有很多bug，使用起来很麻烦。",
+        "价格太高，性价比低，不值得购买。",
+        "物流太慢，等了很久才收到，包装也不好。",
+        "产品与描述不符，实际效果很差，不推荐。",
+        "售后服务差，有问题找不到人解决，很糟糕。",
+        "产品用了不到一周就出现问题了，质量有待提高。",
+        "客服回复很慢，等了两天才得到回复，体验很不好。",
+        "界面设计过于复杂，找功能很困难，需要简化。",
+        "功能虽然多，但很多都不实用，应该精简一下。",
+        "价格偏高，同类产品中有更便宜的选择，性价比不高。",
+        "物流包装破损，产品有划痕，很影响使用体验。",
+        "实际产品与图片描述有差异，感觉被误导了，不推荐。",
+        "售后服务态度差，问题一直得不到解决，很失望。",
+        "产品刚用两天就出现故障，质量控制明显有问题。",
+        "客服态度恶劣，不仅不解决问题，还推卸责任，非常失望。",
+        "界面设计混乱，功能分布不合理，使用起来非常困难。",
+        "功能华而不实，很多都是噱头，实际使用价值很低。",
+        "价格虚高，产品质量配不上这个价格，性价比极低。",
+        "物流包装简陋，产品在运输过程中受损，影响使用。",
+        "收到的产品与描述严重不符，感觉受到了欺骗，强烈不推荐。",
+        "售后服务形同虚设，投诉无门，问题永远得不到解决。"
+    ],
+    'neutral': [
+        "产品还可以，没有特别惊喜，但也没有太大问题。",
+        "服务一般，解决了基本问题，但还有改进空间。",
+        "界面设计普通，功能基本满足需求，使用起来还行。",
+        "价格适中，质量一般，性价比还可以接受。",
+        "物流速度正常，包装普通，整体体验一般。",
+        "产品功能基本满足需求，但有些地方可以优化。",
+        "服务态度还可以，解决问题效率一般，有待提高。",
+        "整体感觉一般，没有特别满意的地方，也没有特别不满。",
+        "产品中规中矩，没有特别突出的地方，但也没有明显缺点。",
+        "服务还可以，解决了问题，但过程有点曲折，有待改进。",
+        "界面设计一般，功能齐全但不够美观，还有提升空间。",
+        "价格合理，质量符合预期，整体体验还行。",
+        "物流速度正常，包装普通，产品完好无损。",
+        "功能基本满足需求，但有些地方不够人性化，需要优化。",
+        "服务态度一般，解决问题效率不高，需要提高专业性。",
+        "整体体验普通，没有特别满意的地方，但也没有不满。",
+        "产品表现平平，没有特别出彩的地方，但也没有明显缺陷。",
+        "服务态度一般，虽然解决了问题，但过程不够顺畅，有待改进。",
+        "界面设计中规中矩，功能齐全但缺乏亮点，还有提升空间。",
+        "价格适中，质量符合价位，整体体验符合预期。",
+        "物流速度正常，包装一般，产品完好，没有惊喜也没有失望。",
+        "功能基本满足需求，但用户体验不够流畅，需要进一步优化。",
+        "服务态度还可以，但专业性有待提高，解决问题的效率不高。"
+    ]
+}
+
+EN_TEMPLATES = {
+    'positive': [
+        "Great quality, charges fast and the cable feels very durable.",
+        "Works perfectly with my phone, highly recommend this product.",
+        "Excellent value for money, delivery was quick and packaging was neat.",
+        "Sound quality is amazing and the battery lasts all day.",
+        "Very easy to set up, the design is sleek and it works as described.",
+        "Customer service was helpful and solved my issue within a day.",
+        "Bought a second one for my family, they love it too.",
+        "The screen is bright and sharp, totally worth the price."
+    ],
+    'negative': [
+        "Stopped working after a week, very disappointed with the quality.",
+        "The cable is flimsy and charging is extremely slow.",
+        "Arrived damaged and the seller never replied to my messages.",
+        "Battery drains quickly and the device overheats while charging.",
+        "Not compatible with my laptop even though the listing said it was.",
+        "Sound keeps cutting out, returned it after two days.",
+        "Cheap materials, the connector broke on the first use.",
+        "Product does not match the description, would not buy again."
+    ],
+    'neutral': [
+        "It works, nothing special but does the job for the price.",
+        "Average quality, delivery took a bit longer than expected.",
+        "Okay product, the design could be better but it is usable.",
+        "Decent for occasional use, not sure how long it will last.",
+        "Does what it says, packaging was plain and simple.",
+        "Battery life is fine, charging speed is about average.",
+        "Some features are useful, others feel unnecessary.",
+        "Meets basic needs, there are better options at this price."
+    ]
+}
+
+ZH_EXTRAS = {
+    'positive': ["强烈推荐", "还会购买", "值得信赖", "体验很好", "非常满意", "功能强大", "设计精美"],
+    'negative': ["不太满意", "问题很多", "有待改进"],
+    'neutral': ["希望优化", "建议增加", "有待改进"]
+}
+
+EN_EXTRAS = {
+    'positive': ["Five stars!", "Would buy again.", "Love it."],
+    'negative': ["Returning it.", "Avoid.", "Very poor."],
+    'neutral': ["It is okay.", "Fair enough.", "Could be better."]
+}
+
+# 噪声: 追加在评论末尾的符号、表情、数字和多余空白
+NOISE_SUFFIXES = ["!!!", "???", "...", " 😊", " 😡", "~~", "  ", " #$%", " 12345", " ok", "。。。", "！！"]
+
+CATEGORIES = ['产品', '服务', '界面', '功能', '价格']
+
+# 各情感的评分 (1-5 星) 分布
+RATING_DISTRIBUTIONS = {
+    'positive': [0.0, 0.0, 0.05, 0.35, 0.60],
+    'negative': [0.45, 0.35, 0.15, 0.05, 0.0],
+    'neutral': [0.05, 0.15, 0.50, 0.25, 0.05]
+}
+
+# 按固定大小分块生成: 每块的随机数只由 (seed, 块序号) 决定，最后一块生成整块后截断，
+# 因此同一 seed 下较少行数的结果恰好是较多行数结果的前缀
+CHUNK_ROWS = 65536
+
+def _template_table(templates, extras):
+    """把按情感分组的模板展开为扁平数组 + 每种情感的 (起点, 数量)"""
+    flat, spans, extra_flat, extra_spans = [], [], [], []
+    for sentiment in SENTIMENTS:
+        spans.append((len(flat), len(templates[sentiment])))
+        flat.extend(templates[sentiment])
+        extra_spans.append((len(extra_flat), len(extras[sentiment])))
+        extra_flat.extend(extras[sentiment])
+    return (
+        np.asarray(flat, dtype=object), np.asarray(spans, dtype=np.int64),
+        np.asarray(extra_flat, dtype=object), np.asarray(extra_spans, dtype=np.int64)
+    )
+
+_TABLES = {
+    'zh': _template_table(ZH_TEMPLATES, ZH_EXTRAS),
+    'en': _template_table(EN_TEMPLATES, EN_EXTRAS)
+}
+
+def _pick(rng, spans, sentiment_codes):
+    """按情感在对应的模板区间内均匀抽取下标"""
+    starts = spans[sentiment_codes, 0]
+    counts = spans[sentiment_codes, 1]
+    return starts + (rng.random(len(sentiment_codes)) * counts).astype(np.int64)
+
+def _generate_chunk(rng, rows, start_id, options):
+    sentiment_codes = rng.choice(len(SENTIMENTS), size=rows, p=options['sentiment_weights'])
+
+    # 语言: 按英文比例逐行抽取
+    is_english = rng.random(rows) < options['english_share']
+    comments = np.empty(rows, dtype=object)
+    for language, rows_mask in (('zh', ~is_english), ('en', is_english)):
+        if not rows_mask.any():
+            continue
+        templates, spans, extras, extra_spans = _TABLES[language]
+        codes = sentiment_codes[rows_mask]
+        text = templates[_pick(rng, spans, codes)]
+        # 部分评论追加一个与情感一致的短语
+        with_extra = rng.random(len(codes)) < options['extra_rate']
+        if with_extra.any():
+            text[with_extra] = text[with_extra] + " " + extras[_pick(rng, extra_spans, codes[with_extra])]
+        comments[rows_mask] = text
+
+    # 噪声: 追加随机符号 / 表情 / 数字
+    noisy = np.flatnonzero(rng.random(rows) < options['noise_rate'])
+    if len(noisy):
+        suffixes = np.asarray(NOISE_SUFFIXES, dtype=object)
+        comments[noisy] = comments[noisy] + suffixes[rng.integers(0, len(suffixes), len(noisy))]
+
+    # 评分: 按情感对应的分布做逆 CDF 抽样
+    cdf = np.cumsum([RATING_DISTRIBUTIONS[s] for s in SENTIMENTS], axis=1)
+    ratings = (rng.random(rows)[:, None] > cdf[sentiment_codes]).sum(axis=1) + 1
+    ratings = np.minimum(ratings, 5)
+
+    categories = options['categories']
+    category_codes = rng.choice(len(categories), size=rows, p=options['category_weights'])
+
+    offsets = rng.integers(0, options['days'] * 86400, rows)
+    dates = options['start'] + pd.to_timedelta(offsets, unit='s')
+
+    # 重复评论: 部分行复制本块中另一行的内容 (模拟重复提交)
+    duplicates = np.flatnonzero(rng.random(rows) < options['duplicate_rate'])
+    if len(duplicates) and rows > 1:
+        sources = rng.integers(0, rows, len(duplicates))
+        comments[duplicates] = comments[sources]
+        sentiment_codes[duplicates] = sentiment_codes[sources]
+        ratings[duplicates] = ratings[sources]
+        category_codes[duplicates] = category_codes[sources]
+
+    return pd.DataFrame({
+        'id': np.arange(start_id, start_id + rows, dtype=np.int64),
+        'comment': comments,
+        'sentiment': pd.Categorical.from_codes(sentiment_codes, categories=SENTIMENTS),
+        'rating': ratings.astype(np.int8),
+        'date': dates,
+        'category': pd.Categorical.from_codes(category_codes, categories=categories)
+    })
+
+def _options(english_share=0.0, sentiment_weights=(0.5, 0.3, 0.2), categories=None, category_weights=None,
+             start='2023-01-01', days=365, extra_rate=0.3, noise_rate=0.05, duplicate_rate=0.02):
+    categories = list(categories or CATEGORIES)
+    if category_weights is None:
+        category_weights = np.full(len(categories), 1 / len(categories))
+    sentiment_weights = np.asarray(sentiment_weights, dtype=np.float64)
+    category_weights = np.asarray(category_weights, dtype=np.float64)
+    return {
+        'english_share': float(english_share),
+        'sentiment_weights': sentiment_weights / sentiment_weights.sum(),
+        'categories': categories,
+        'category_weights': category_weights / category_weights.sum(),
+        'start': pd.Timestamp(start),
+        'days': int(days),
+        'extra_rate': float(extra_rate),
+        'noise_rate': float(noise_rate),
+        'duplicate_rate': float(duplicate_rate)
+    }
+
+def iter_reviews(rows, seed=0, **options):
+    """
+    逐块生成合成评论 (每块最多 CHUNK_ROWS 行)，列: id / comment / sentiment / rating / date / category
+    options:
+      english_share     英文评论比例 (0 为全中文，1 为全英文)
+      sentiment_weights 正面 / 负面 / 中性 的比例
+      categories, category_weights  类别及其比例
+      start, days       日期范围 (起始日期与天数，均匀分布)
+      extra_rate        追加短语的比例
+      noise_rate        追加噪声 (符号、表情、数字) 的比例
+      duplicate_rate    复制块内其他评论的比例
+    """
+    opts = _options(**options)
+    for chunk_index, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        rng = np.random.default_rng(np.random.SeedSequence([seed, chunk_index]))
+        chunk = _generate_chunk(rng, CHUNK_ROWS, start + 1, opts)
+        yield chunk if start + CHUNK_ROWS <= rows else chunk.head(rows - start)
+
+def generate_reviews(rows, seed=0, **options):
+    """
+    生成合成评论 DataFrame，参数见 iter_reviews
+    同一 seed 和参数得到相同结果，且 generate_reviews(n) 是 generate_reviews(m) (m > n) 的前 n 行
+    """
+    chunks = list(iter_reviews(rows, seed, **options))
+    if not chunks:
+        return _generate_chunk(np.random.default_rng(seed), 0, 1, _options(**options))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+def write_parquet(path, rows, seed=0, compression="zstd", **options):
+    """
+    分块生成并写入 Parquet (内存占用与总行数无关)，返回写入的行数
+    需要 pyarrow
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("write_parquet requires pyarrow (pip install pyarrow)") from e
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    writer = None
+    written = 0
+    try:
+        for chunk in iter_reviews(rows, seed, **options):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression=compression)
+            writer.write_table(table)
+            written += len(chunk)
+    except BaseException:
+        # 生成或写入中途失败: 关闭并删除不完整的临时文件
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if writer is not None:
+        writer.close()
+        os.replace(tmp_path, path)
+    return written
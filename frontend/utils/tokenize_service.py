@@ -0,0 +1,122 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+import jieba
+
+# 少于该行数时进程池的启动和通信开销大于收益，直接在当前进程分词
+PARALLEL_THRESHOLD = 20000
+DEFAULT_CHUNK_SIZE = 2000
+
+def default_workers():
+    """默认进程数: CPU 核数 (最多 8 个)"""
+    return max(1, min(8, os.cpu_count() or 1))
+
+def _init_worker():
+    """进程池初始化: 每个进程只加载一次 jieba 词典"""
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+
+def _tokenize_chunk(args):
+    tokenizer, texts = args
+    return [tokenizer(text) for text in texts]
+
+def _chunks(texts, chunk_size):
+    iterator = iter(texts)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+class TokenizeService:
+    """
+    多进程分词服务: 按块把文本分发到进程池，按输入顺序逐块返回分词结果
+    tokenizer 必须是模块级函数 (可被子进程导入)，如 tokenizer.process_text
+    进程池在首次使用时创建，并在同一服务的多次调用间复用
+    """
+
+    def __init__(self, tokenizer, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.tokenizer = tokenizer
+        self.workers = workers or default_workers()
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: 避免在带有多个线程的进程 (如 Streamlit) 中 fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    def warm_up(self):
+        """提前创建进程池并等待各进程加载完词典"""
+        if self.workers <= 1:
+            _init_worker()
+        else:
+            list(self._pool().map(_tokenize_chunk, [(self.tokenizer, [])] * self.workers))
+
+    def iter_chunks(self, texts):
+        """逐块返回分词结果 (每块为 token 列表的列表，顺序与输入一致)"""
+        chunks = ((self.tokenizer, chunk) for chunk in _chunks(texts, self.chunk_size))
+        if self.workers <= 1:
+            for chunk in chunks:
+                yield _tokenize_chunk(chunk)
+            return
+        # map 按提交顺序产出结果，同时保持所有进程忙碌
+        yield from self._pool().map(_tokenize_chunk, chunks)
+
+    def tokenize(self, texts):
+        """分词全部文本，返回与输入等长的 token 列表"""
+        result = []
+        for chunk in self.iter_chunks(texts):
+            result.extend(chunk)
+        return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_services = {}
+
+def get_service(tokenizer, workers=None):
+    """按 (分词函数, 进程数) 复用进程池"""
+    key = (tokenizer, workers or default_workers())
+    if key not in _services:
+        _services[key] = TokenizeService(tokenizer, workers=key[1])
+    return _services[key]
+
+def iter_tokenized(texts, tokenizer, workers=None):
+    """
+    逐块分词: 文本较少或只有一个 CPU 时在当前进程分词，否则使用共享的进程池
+    (进程池出错时退回当前进程继续分词)
+    """
+    if not isinstance(texts, list):
+        texts = list(texts)
+    workers = workers or default_workers()
+    if workers <= 1 or len(texts) < PARALLEL_THRESHOLD:
+        yield [tokenizer(text) for text in texts]
+        return
+    done = 0
+    try:
+        for chunk in get_service(tokenizer, workers).iter_chunks(texts):
+            done += len(chunk)
+            yield chunk
+    except (BrokenProcessPool, OSError) as e:
+        # 进程池不可用 (如子进程被终止) 时丢弃该进程池，剩余文本在当前进程分词
+        print(f"Parallel tokenization failed, falling back to single process: {e}")
+        _services.pop((tokenizer, workers)).close()
+        yield [tokenizer(text) for text in texts[done:]]
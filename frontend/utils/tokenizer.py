@@ -0,0 +1,199 @@
+import jieba
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    from utils.tokenize_service import iter_tokenized
+except ImportError:
+    from tokenize_service import iter_tokenized
+
+# 评论分析使用的停用词 (中英文)
+STOP_WORDS = {
+    '我', '你', '他', '仅', 'i', 'you', 'also', 'be', 'after',
+    '的', '了', '在', '是', '有', '和', '就', '不', '人', '都', 
+    '一', '一个', '上', '也', '很', '到', '说', '要', '去', '会', 
+    '着', '没有', '看', '好', '自己', '这', '非常', '感觉', '觉得', 
+    '比较', '这个', '那个', '我们', '你们', '他们', '它', '只是', '但是',
+    'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 
+    'to', 'of', 'in', 'on', 'at', 'for', 'with', 'it', 'this', 'that', 
+    'my', 'your', 'his', 'her', 'its', 'we', 'they', 'have', 'has', 'had', 
+    'do', 'does', 'did', 'can', 'could', 'will', 'would', 'should', 'not', 
+    'no', 'yes', 'so', 'as', 'if', 'when', 'where', 'why', 'how', 'all', 
+    'any', 'some', 'very', 'good', 'bad', 'great', 'product', 'use', 'one', 
+    'just', 'get', 'from', 'out', 'up', 'down', 'about', 'than', 'then', 
+    'now', 'only', 'well', 'much', 'more', 'other', 'which', 'what', 
+    'who', 'whom', 'whose', 'cable', 'charging', 'phone',
+    'been', 'being', 'am', 'before', 'by', 'into', 'during', 'until', 
+    'against', 'among', 'through', 'over', 'between', 'since', 'without', 
+    'under', 'within', 'along', 'across', 'behind', 'beyond', 'around', 
+    'above', 'near', 'off', 'go', 'going', 'gone', 'went', 'make', 'made', 
+    'making', 'know', 'take', 'see', 'come', 'think', 'look', 'want', 
+    'give', 'used', 'using', 'find', 'tell', 'ask', 'work', 'worked', 
+    'working', 'seem', 'feel', 'try', 'leave', 'call', 'he', 'him', 'she', 
+    'us', 'our', 'them', 'their', 'these', 'those', 'even', 'still', 'way', 
+    'too', 'really', 'usb', 'type', 'fast', 'data', 'sync', 'compatible'
+}
+
+# jieba (默认模式) 按该字符集切分文本块: 不含中文的块只会被切成字母数字串和其间的符号串
+# 块外的字符逐个输出，过滤单字后只剩 'İ' (小写后为两个字符)，单独保留以与原结果一致
+HAN_BLOCK = re.compile(r'[\u4E00-\u9FD5a-zA-Z0-9+#&._%\-]+|\u0130')
+# 需要交给 jieba 的块: 含中文，或含 jieba 词典中英文词 (c++ / c# / AT&T) 用到的字符
+NEEDS_JIEBA = re.compile(r'[\u4E00-\u9FD5+#&]')
+# 与 jieba 对英文串的切分一致: 字母数字串 (可带小数和百分号)，或其间的符号串
+LATIN_TOKEN = re.compile(r'[a-zA-Z0-9]+(?:\.\d+)?%?|[._%\-]+|\u0130')
+PUNCT_ONLY = re.compile(r'^[^\w\s]+$')
+
+def _keep(word):
+    return len(word) > 1 and word not in STOP_WORDS and not word.isdigit() and not PUNCT_ONLY.match(word)
+
+def _latin_tokens(text):
+    """非中文文本: 一次正则切分，整体转小写后过滤"""
+    tokens = LATIN_TOKEN.findall(text)
+    if not tokens:
+        return []
+    return [word for word in '\n'.join(tokens).lower().split('\n') if _keep(word)]
+
+def _jieba_tokens(text):
+    return [word for word in (w.strip().lower() for w in jieba.cut(text)) if _keep(word)]
+
+def process_text(text):
+    """
+    分词并过滤停用词、单字、纯数字和纯符号
+    只有含中文的文本块才调用 jieba，英文块直接用正则切分 (结果与对整段文本调用 jieba.cut 一致)
+    """
+    if not isinstance(text, str):
+        return []
+    if NEEDS_JIEBA.search(text) is None:
+        return _latin_tokens(text)
+    result = []
+    for block in HAN_BLOCK.findall(text):
+        if NEEDS_JIEBA.search(block) is None:
+            result.extend(_latin_tokens(block))
+        else:
+            result.extend(_jieba_tokens(block))
+    return result
+
+# 词云页使用的停用词 (只保留中文后分词)
+WC_STOP_WORDS = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
+
+def chinese_word_cut(text):
+    """只保留中文字符后分词，过滤停用词和单字"""
+    text = re.sub(r'[^\u4e00-\u9fa5]', '', text)
+    return [word for word in jieba.cut(text) if len(word) > 1 and word not in WC_STOP_WORDS]
+
+class TokenCache:
+    """
+    按行哈希缓存的分词结果。
+    所有词映射为整数 id，每行的 token 以 int32 扁平数组 + 偏移量保存；
+    已分词的行不会重复分词，追加数据时只处理新增行。
+    tokenizer: 分词函数 (默认 process_text)
+    workers: 大批量分词时使用的进程数 (None 为 CPU 核数，1 为不使用进程池)
+    """
+
+    def __init__(self, tokenizer=process_text, workers=None):
+        self.tokenizer = tokenizer
+        self.workers = workers
+        self.vocab = {}                        # 词 -> id
+        self.words = []                        # id -> 词
+        self.row_lookup = pd.Index([], dtype='uint64')
+        self.ids = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.row_lookup)
+
+    @property
+    def vocab_size(self):
+        return len(self.words)
+
+    def _encode(self, tokens):
+        vocab = self.vocab
+        encoded = []
+        for word in tokens:
+            token_id = vocab.get(word)
+            if token_id is None:
+                token_id = len(self.words)
+                vocab[word] = token_id
+                self.words.append(word)
+            encoded.append(token_id)
+        return encoded
+
+    def add(self, row_hashes, texts):
+        """对尚未缓存的行分词，返回新分词的行数"""
+        row_hashes = np.asarray(row_hashes, dtype=np.uint64)
+        is_new = self.row_lookup.get_indexer(row_hashes) < 0
+        is_new &= ~pd.Index(row_hashes).duplicated()
+        if not is_new.any():
+            return 0
+
+        new_hashes = row_hashes[is_new]
+        new_texts = [text for text, flag in zip(texts, is_new) if flag]
+        ids, lengths = [], []
+        # 大批量时由进程池分块分词，结果按顺序逐块返回并在此编码
+        for chunk in iter_tokenized(new_texts, self.tokenizer, self.workers):
+            for tokens in chunk:
+                encoded = self._encode(tokens)
+                ids.extend(encoded)
+                lengths.append(len(encoded))
+
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int32)])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(lengths, dtype=np.int64)])
+        self.row_lookup = self.row_lookup.append(pd.Index(new_hashes, dtype='uint64'))
+        return len(new_hashes)
+
+    def positions(self, row_hashes):
+        """行哈希 -> 缓存中的行号 (未缓存的行为 -1)"""
+        return self.row_lookup.get_indexer(np.asarray(row_hashes, dtype=np.uint64))
+
+    @staticmethod
+    def _gather(flat, offsets, positions):
+        """取出若干行的 token id 并拼接 (向量化，无 Python 循环)，返回 (行序号, token id)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        starts = offsets[positions]
+        lengths = offsets[positions + 1] - starts
+        total = int(lengths.sum())
+        rows = np.repeat(np.arange(len(positions)), lengths)
+        if total == 0:
+            return rows, np.zeros(0, dtype=np.int32)
+        row_starts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return rows, flat[row_starts + np.arange(total)]
+
+    def gather(self, positions):
+        """
+        取出若干行的全部 token: 返回 (行序号, token id) 两个等长数组，
+        行序号为该行在 positions 中的下标 (未缓存的行视为空)
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        valid = np.flatnonzero(positions >= 0)
+        rows, ids = self._gather(self.ids, self.offsets, positions[valid])
+        return valid[rows], ids
+
+    def token_ids(self, position):
+        return self.ids[self.offsets[position]:self.offsets[position + 1]]
+
+    def tokens(self, position):
+        return [self.words[i] for i in self.token_ids(position)]
+
+    def retain(self, row_hashes):
+        """
+        只保留指定行的分词结果 (切换数据集时释放不再使用的行)
+        同时压缩词表: 删除不再出现的词并重新编号 (保持原有相对顺序)，
+        词表与 id 映射换成新对象，已基于旧词表构建的索引不受影响
+        """
+        positions = self.positions(row_hashes)
+        positions = np.unique(positions[positions >= 0])
+        if len(positions) == len(self):
+            return
+        lengths = self.offsets[positions + 1] - self.offsets[positions]
+        ids = self._gather(self.ids, self.offsets, positions)[1]
+        used = np.unique(ids)
+        if len(used) < self.vocab_size:
+            remap = np.full(self.vocab_size, -1, dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            ids = remap[ids]
+            self.words = [self.words[i] for i in used]
+            self.vocab = {word: i for i, word in enumerate(self.words)}
+        self.ids = ids
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.row_lookup = self.row_lookup[positions]
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# (连接超时, 读取超时): 后端不可用时尽快退回本地渲染
+REQUEST_TIMEOUT = (3, 30)
+MAX_CONCURRENT_REQUESTS = 8
+CLIENT_CACHE_SIZE = 64
+
+# 请求参数 -> (ETag, 图片字节)，再次请求时用 If-None-Match 校验
+_images = OrderedDict()
+# 已上传过词频表的 (后端地址, dataset_id)，之后只发送 id
+_uploaded = set()
+_lock = threading.Lock()
+
+def frequency_id(frequencies):
+    """词频表的内容哈希 (与后端 services/wordcloud_service.py 的计算方式一致)"""
+    items = sorted((word, float(count)) for word, count in frequencies.items())
+    canonical = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+def _post(url, body, etag=None):
+    headers = {"If-None-Match": f'"{etag}"'} if etag else {}
+    return requests.post(url, json=body, headers=headers, timeout=REQUEST_TIMEOUT)
+
+def fetch_cloud(backend_url, frequencies, shape="矩形", colormap="viridis", max_words=100,
+                size=(800, 600), contour=False, fmt="webp"):
+    """
+    请求后端渲染词云 (POST /analyze/wordcloud)，返回图片字节
+    词频表每个后端只上传一次；本地已有的图片通过 ETag 校验，未变化时后端返回 304
+    """
+    url = f"{backend_url}/analyze/wordcloud"
+    dataset_id = frequency_id(frequencies)
+    options = {
+        "shape": shape, "colormap": colormap, "max_words": int(max_words),
+        "width": int(size[0]), "height": int(size[1]), "contour": bool(contour), "format": fmt.lower()
+    }
+    key = (backend_url, dataset_id, tuple(sorted(options.items())))
+    with _lock:
+        cached = _images.get(key)
+        uploaded = (backend_url, dataset_id) in _uploaded
+
+    body = dict(options, dataset_id=dataset_id)
+    response = None
+    if uploaded:
+        response = _post(url, body, cached[0] if cached else None)
+    if response is None or response.status_code == 404:
+        # 后端尚未保存该词频表 (首次请求或后端已重启)
+        body["frequencies"] = {word: float(count) for word, count in frequencies.items()}
+        response = _post(url, body, cached[0] if cached else None)
+
+    if response.status_code == 304 and cached is not None:
+        return cached[1]
+    response.raise_for_status()
+    etag = response.headers.get("ETag", "").strip('"')
+    with _lock:
+        _uploaded.add((backend_url, dataset_id))
+        _images[key] = (etag, response.content)
+        _images.move_to_end(key)
+        while len(_images) > CLIENT_CACHE_SIZE:
+            _images.popitem(last=False)
+    return response.content
+
+def fetch_clouds(backend_url, jobs):
+    """
+    并发请求多个词云: jobs 为 {名称: fetch_cloud 的关键字参数}
+    返回 {名称: 图片字节或异常}，由调用方决定失败时的处理
+    """
+    results = {}
+    if not jobs:
+        return results
+    with ThreadPoolExecutor(max_workers=min(len(jobs), MAX_CONCURRENT_REQUESTS)) as executor:
+        futures = {name: executor.submit(fetch_cloud, backend_url, **job) for name, job in jobs.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+    return results
@@ -0,0 +1,76 @@
+import hashlib
+import io
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# 词云蒙版: 255 的位置不放置词语 (WordCloud 的约定)，0 的位置可放置
+MASK_SIZE = 800
+# 自定义图片中亮度高于该值的像素视为背景
+BACKGROUND_THRESHOLD = 240
+
+def _grid(size):
+    """以图像中心为原点的行/列坐标 (广播用的开放网格)"""
+    rows, cols = np.ogrid[:size, :size]
+    center = size // 2
+    return rows - center, cols - center
+
+def _circle_mask(size):
+    rows, cols = _grid(size)
+    radius = size * 350 // 800
+    return rows ** 2 + cols ** 2 > radius ** 2
+
+def _ellipse_mask(size):
+    # 纵向半轴为边长的一半，横向半轴为 250/800
+    rows, cols = _grid(size)
+    half_height = size / 2
+    half_width = size * 250 / 800
+    return (rows / half_height) ** 2 + (cols / half_width) ** 2 > 1
+
+MASK_SHAPES = {
+    "矩形": None,
+    "圆形": _circle_mask,
+    "椭圆": _ellipse_mask
+}
+
+def _freeze(outside):
+    mask = np.where(outside, 255, 0).astype(np.uint8)
+    # 缓存的数组在多次重绘间共享，禁止原地修改
+    mask.setflags(write=False)
+    return mask
+
+@lru_cache(maxsize=16)
+def shape_mask(shape, size=MASK_SIZE):
+    """内置形状的蒙版 (按形状和边长缓存)；矩形或未知形状返回 None"""
+    builder = MASK_SHAPES.get(shape)
+    if builder is None:
+        return None
+    return _freeze(builder(size))
+
+IMAGE_CACHE_SIZE = 8
+_image_cache = {}
+
+def _image_mask(image_bytes, size):
+    image = Image.open(io.BytesIO(image_bytes))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # 透明区域视为背景
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    gray = image.convert("L")
+    gray.thumbnail((size, size))
+    return _freeze(np.asarray(gray) > BACKGROUND_THRESHOLD)
+
+def image_mask(image_bytes, size=MASK_SIZE):
+    """
+    由自定义图片生成蒙版: 白色 (或透明) 背景以外的区域放置词语，
+    图片等比缩放到不超过 size × size，按 (图片内容哈希, 边长) 缓存
+    """
+    key = (hashlib.md5(image_bytes).hexdigest(), size)
+    if key not in _image_cache:
+        if len(_image_cache) >= IMAGE_CACHE_SIZE:
+            _image_cache.pop(next(iter(_image_cache)))
+        _image_cache[key] = _image_mask(image_bytes, size)
+    return _image_cache[key]
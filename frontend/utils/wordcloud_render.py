@@ -0,0 +1,166 @@
+import hashlib
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import features
+
+# 后端提供词云渲染时前端可不安装 wordcloud
+try:
+    from wordcloud import WordCloud
+except ImportError:
+    WordCloud = None
+
+try:
+    from utils.wordcloud_client import fetch_clouds
+except ImportError:
+    from wordcloud_client import fetch_clouds
+
+FONT_PATH = 'simhei.ttf'
+# 浏览器均支持 WebP，体积约为 PNG 的 1/3；Pillow 未编译 WebP 时退回 PNG
+IMAGE_FORMAT = "WEBP" if features.check("webp") else "PNG"
+WEBP_QUALITY = 90
+RENDER_CACHE_SIZE = 32
+# 后端支持的内置形状 (与 wordcloud_masks.MASK_SHAPES 一致)
+REMOTE_SHAPES = ("圆形", "椭圆")
+MAX_WORKERS = 8
+
+_render_cache = OrderedDict()
+_executor = None
+
+def frequency_hash(frequencies):
+    """词频表的内容哈希 (与插入顺序无关)"""
+    items = sorted(frequencies.items())
+    return hashlib.md5(repr(items).encode("utf-8")).hexdigest()
+
+def cloud_key(frequencies, mask_key=None, colormap="viridis", max_words=100, size=(800, 600), contour=False):
+    """渲染结果的缓存键: (词频哈希, 形状, 配色, 最大词数, 尺寸, 轮廓)"""
+    return (frequency_hash(frequencies), mask_key, colormap, max_words, tuple(size), contour)
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+def _render(frequencies, mask, colormap, max_words, size, contour, fmt):
+    if WordCloud is None:
+        raise ImportError("wordcloud is not installed and no backend is available")
+    width, height = size
+    cloud = WordCloud(
+        font_path=FONT_PATH,
+        background_color='white',
+        width=width,
+        height=height,
+        max_words=max_words,
+        mask=mask,
+        contour_width=1 if contour and mask is not None else 0,
+        contour_color='steelblue',
+        colormap=colormap
+    ).generate_from_frequencies(frequencies)
+    # 直接取 PIL 图像编码，不经过 matplotlib
+    return _encode(cloud.to_image(), fmt)
+
+def _remember(key, data):
+    _render_cache[key] = data
+    _render_cache.move_to_end(key)
+    while len(_render_cache) > RENDER_CACHE_SIZE:
+        _render_cache.popitem(last=False)
+
+def render_cloud(frequencies, mask=None, mask_key=None, colormap="viridis", max_words=100,
+                 size=(800, 600), contour=False, fmt=IMAGE_FORMAT):
+    """
+    渲染词云为图片字节 (按显示分辨率输出)，结果按 cloud_key 缓存
+    有蒙版时图片尺寸为蒙版尺寸，mask_key 用于区分不同蒙版 (如形状名或图片哈希)
+    """
+    key = cloud_key(frequencies, mask_key, colormap, max_words, size, contour) + (fmt,)
+    if key in _render_cache:
+        _render_cache.move_to_end(key)
+        return _render_cache[key]
+    data = _render(frequencies, mask, colormap, max_words, size, contour, fmt)
+    _remember(key, data)
+    return data
+
+def _pool():
+    """渲染用进程池 (词云布局是纯 Python 计算，线程无法并行)；首次使用时创建并复用"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=min(MAX_WORKERS, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def _job_key(job):
+    return cloud_key(
+        job["frequencies"], job.get("mask_key"), job.get("colormap", "viridis"), job.get("max_words", 100),
+        job.get("size", (800, 600)), job.get("contour", False)
+    ) + (job.get("fmt", IMAGE_FORMAT),)
+
+def _remote_job(job):
+    """转换为后端请求参数；自定义图片蒙版无法由后端生成，返回 None"""
+    mask = job.get("mask")
+    if mask is not None and job.get("mask_key") not in REMOTE_SHAPES:
+        return None
+    size = (mask.shape[1], mask.shape[0]) if mask is not None else job.get("size", (800, 600))
+    return {
+        "frequencies": job["frequencies"],
+        "shape": job.get("mask_key") if mask is not None else "矩形",
+        "colormap": job.get("colormap", "viridis"),
+        "max_words": job.get("max_words", 100),
+        "size": size,
+        "contour": job.get("contour", False),
+        "fmt": job.get("fmt", IMAGE_FORMAT)
+    }
+
+def render_clouds(jobs, backend_url=None):
+    """
+    并行渲染多个互不依赖的词云
+    jobs: {名称: render_cloud 的关键字参数}，返回 {名称: 图片字节} (词频为空时为 None)
+    已缓存的直接返回；指定 backend_url 时由后端渲染 (请求失败的退回本地渲染)；
+    本地渲染时多个未缓存且有多个 CPU 时分发到进程池，否则依次渲染
+    """
+    global _executor
+    results = {}
+    pending = {}
+    for name, job in jobs.items():
+        if not job.get("frequencies"):
+            results[name] = None
+            continue
+        key = _job_key(job)
+        if key in _render_cache:
+            _render_cache.move_to_end(key)
+            results[name] = _render_cache[key]
+        else:
+            pending[name] = job
+    if backend_url and pending:
+        remote = {name: _remote_job(job) for name, job in pending.items()}
+        remote = {name: job for name, job in remote.items() if job is not None}
+        for name, data in fetch_clouds(backend_url, remote).items():
+            if isinstance(data, Exception):
+                print(f"Backend word cloud rendering failed for {name}: {data}")
+                continue
+            # 后端结果同样写入本地缓存，页面重新运行时不再请求
+            _remember(_job_key(pending[name]), data)
+            results[name] = data
+            del pending[name]
+    if len(pending) > 1 and (os.cpu_count() or 1) > 1:
+        try:
+            futures = {name: _pool().submit(render_cloud, **job) for name, job in pending.items()}
+            for name, future in futures.items():
+                data = future.result()
+                # 子进程中的缓存不共享，结果写回当前进程的缓存
+                _remember(_job_key(pending[name]), data)
+                results[name] = data
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Parallel word cloud rendering failed, rendering sequentially: {e}")
+            _executor = None
+    for name, job in pending.items():
+        if name not in results:
+            results[name] = render_cloud(**job)
+    return {name: results[name] for name in jobs}